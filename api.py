@@ -1,11 +1,25 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from src.utils.model_setup import setup_model
-from src.agents.manager_agent import create_manager_agent
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+# The agents and the ML stack (smolagents, litellm, datasets, pandas, scikit-learn)
+# are imported where they are first used, or by the warm-up, so the server binds
+# and answers /health right away.
+from src.utils.job_queue import create_job_queue, current_job, QueueFullError
+from src.utils.run_events import RunContext, run_scope
+from src.utils.tracing import Tracer, trace_run
+from src.utils import upload_store
+from src.utils.sandbox import get_worker_pool, sandboxed_agents
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+import asyncio
+from importlib import import_module
+import json
 import os
-import uuid
-from typing import List
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
 import logging
 
 # Configure logging
@@ -19,10 +33,53 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Initialize components
+jobs = create_job_queue()
+started_at = time.time()
+warmed_up = threading.Event()
+
+# Imported by the warm-up, in this order, so the first request does not pay for them.
+WARM_UP_MODULES = ("src.agents.factory", "src.utils.ingest", "src.utils.serving")
+
+def warm_up(preload: List[str]) -> None:
+    """Import the agent and ML stack and load ``preload`` models; runs in the background after startup."""
+    started = time.time()
+    try:
+        for module in WARM_UP_MODULES:
+            import_module(module)
+        from src.utils.search import get_local_index
+        get_local_index()
+        if preload:
+            from src.utils.serving import get_model_server
+            get_model_server().preload(preload)
+        logger.info(f"Warm-up finished in {time.time() - started:.1f}s")
+    except Exception as e:
+        logger.warning(f"Warm-up failed, continuing cold: {str(e)}")
+    finally:
+        warmed_up.set()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Comma-separated registry names to load before the first /predict request.
+    preload = [name for name in os.getenv("ML_AGENT_PRELOAD_MODELS", "").split(",") if name]
+    if os.getenv("ML_AGENT_WARMUP", "1").lower() not in ("0", "off", "false") or preload:
+        threading.Thread(target=warm_up, args=(preload,), name="ml-agent-warm-up", daemon=True).start()
+    else:
+        warmed_up.set()  # nothing to warm up: modules are imported on first use
+    if sandboxed_agents():
+        get_worker_pool().warm()  # start the sandbox workers in the background
+    yield
+    if "src.utils.serving" in sys.modules:  # nothing to close if no model was ever served
+        sys.modules["src.utils.serving"].get_model_server().close()
+    if sandboxed_agents():
+        get_worker_pool().shutdown()
+    jobs.shutdown(wait=False)
+
 app = FastAPI(
     title="ML Agent API",
     description="API for ML agent operations",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -34,55 +91,285 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize components
-model = setup_model()
-manager_agent = create_manager_agent(model)
+async def load(module: str):
+    """Import ``module`` off the event loop; the ML stack takes seconds to import on first use."""
+    return await run_in_threadpool(import_module, module)
+
+@app.get("/health")
+async def health():
+    """Liveness and readiness for load balancers; never touches the agent or ML stack."""
+    return {
+        "status": "ok",
+        "uptime_seconds": round(time.time() - started_at, 3),
+        "warm": warmed_up.is_set(),
+        "jobs": jobs.stats(),
+    }
 
 class AgentRequest(BaseModel):
     prompt: str
 
-@app.post("/model")
+def publish_trace(run: RunContext, tracer: Tracer) -> None:
+    """Attach the run's tracing summary to its job and stream it as a ``trace`` event."""
+    summary = tracer.summary()
+    job = current_job()
+    if job is not None:
+        job.trace = summary
+    llm = summary["llm"]
+    logger.info(
+        f"Run trace {summary['trace_id']}: {summary['seconds']:.1f}s, {llm['calls']} LLM calls "
+        f"({llm['seconds']:.1f}s, {llm['input_tokens']} in / {llm['output_tokens']} out tokens, "
+        f"{llm['cached_input_tokens']} cached), code execution {summary['code_execution']['seconds']:.1f}s"
+    )
+    run.emit({"type": "trace", "summary": summary})
+
+def run_manager(prompt: str, run: Optional[RunContext] = None):
+    """Run a fresh manager agent on ``prompt``; executed on the job pool."""
+    from src.agents.factory import new_agent
+
+    run = run or RunContext()
+    tracer = None
+    with run_scope(run):
+        try:
+            with trace_run("run", **{"prompt.chars": len(prompt)}) as tracer:
+                run.raise_if_cancelled()
+                # Agents keep step memory between runs, so each job gets its own instance.
+                with new_agent("manager") as manager_agent:
+                    result = manager_agent.run(prompt)
+        except Exception as e:
+            if tracer is not None:
+                publish_trace(run, tracer)
+            run.emit({"type": "error", "error": str(e)})
+            raise
+    publish_trace(run, tracer)
+    logger.info(f"Agent result: {result}")
+    run.emit({"type": "final", "result": result})
+    return result
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+@app.post("/model", status_code=202)
 async def run_agent(request: AgentRequest):
     try:
         logger.info(f"Received request with prompt: {request.prompt}")
-        result = manager_agent.run(request.prompt)
-        logger.info(f"API Response: {result}")
-        return {"status": "success", "result": result}
+        job = jobs.submit("model", run_manager, request.prompt)
+        logger.info(f"Queued job {job.id}")
+        return {"status": "queued", "job_id": job.id}
+    except QueueFullError as e:
+        logger.error(f"Rejecting request: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/model/stream")
+async def stream_agent(request: AgentRequest, http_request: Request):
+    """Run the agent and stream every step as a server-sent event.
+
+    Emits one ``step``/``plan`` event per finished smolagents step (tagged with
+    the agent that ran it) followed by a ``final`` or ``error`` event. If the
+    client disconnects first, the run is cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    run = RunContext(on_event=lambda event: loop.call_soon_threadsafe(events.put_nowait, event))
+    try:
+        logger.info(f"Received streaming request with prompt: {request.prompt}")
+        job = jobs.submit("model", run_manager, request.prompt, run)
+    except QueueFullError as e:
+        logger.error(f"Rejecting request: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def event_stream():
+        finished = False
+        try:
+            yield format_sse({"type": "job", "job_id": job.id})
+            while not finished:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await http_request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                finished = event["type"] in ("final", "error")
+                yield format_sse(event)
+        finally:
+            if not finished:
+                logger.info(f"Client disconnected, cancelling job {job.id}")
+                run.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
+
+class PredictRequest(BaseModel):
+    model: str = "diabetes-readmission"
+    version: Optional[int] = None
+    instances: List[Dict[str, Any]]
+
+@app.post("/predict")
+async def predict(request: PredictRequest):
+    """Score rows with a registered model (the latest version unless one is given).
+
+    Each instance maps every feature of the model's schema to a value.
+    Concurrent requests for the same model are scored together in one batch.
+    """
+    registry = await load("src.utils.model_registry")
+    serving = await load("src.utils.serving")
+
+    try:
+        return await serving.get_model_server().predict(request.model, request.instances, request.version)
+    except registry.ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except serving.InvalidRequest as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error scoring with {request.model}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/models")
+async def list_models():
+    """Latest manifest of every registered model, and what the server holds warm."""
+    registry = await load("src.utils.model_registry")
+    serving = await load("src.utils.serving")
+
+    models = await run_in_threadpool(registry.get_model_registry().list)
+    return {"models": models, "serving": serving.get_model_server().stats()}
+
+class ScoreRequest(BaseModel):
+    model: str = "diabetes-readmission"
+    version: Optional[int] = None
+    input_path: str  # dataset (or file) under datasets/, e.g. "diabetes-readmission"
+    split: Optional[str] = "test"
+    output_path: Optional[str] = None  # directory under predictions/
+    id_columns: List[str] = []
+    format: str = "parquet"
+
+@app.post("/score", status_code=202)
+async def score(request: ScoreRequest):
+    """Queue a batch-scoring job; resubmitting an interrupted job resumes it.
+
+    Inputs are read from under ``datasets/`` and predictions written under
+    ``predictions/`` only; paths leading elsewhere are rejected.
+    """
+    batch_scoring = await load("src.utils.batch_scoring")
+
+    try:
+        input_path = batch_scoring.resolve_within(upload_store.DATASETS_ROOT, request.input_path)
+        output_path = (batch_scoring.resolve_within(batch_scoring.PREDICTIONS_ROOT, request.output_path)
+                       if request.output_path else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        job = jobs.submit(
+            "score", batch_scoring.score_dataset, request.model, input_path, output=output_path,
+            version=request.version, split=request.split, id_columns=request.id_columns, fmt=request.format,
+        )
+    except QueueFullError as e:
+        logger.error(f"Rejecting request: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    logger.info(f"Queued scoring job {job.id} for {request.input_path} with {request.model}")
+    return {"status": "queued", "job_id": job.id}
+
+def run_ingest(directory: str, target_column: Optional[str] = None) -> Dict[str, Any]:
+    from src.utils.ingest import ingest_upload  # imported on the job thread, not the event loop
+
+    return ingest_upload(directory, target_column=target_column)
+
+def submit_ingest(upload_dir: str, target_column: Optional[str] = None) -> str:
+    """Queue conversion of an upload directory into an Arrow DatasetDict."""
+    job = jobs.submit("ingest", run_ingest, os.path.join(upload_store.DATASETS_ROOT, upload_dir), target_column)
+    logger.info(f"Queued ingest job {job.id} for {upload_dir}")
+    return job.id
+
 @app.post("/upload")
-async def upload_files(files: List[UploadFile] = File(...)):
+async def upload_files(files: List[UploadFile] = File(...), target_column: Optional[str] = Form(None)):
     try:
-        # Create a unique directory name using UUID
-        upload_dir = str(uuid.uuid4())
-        full_path = os.path.join("datasets", upload_dir)
-        
-        logger.info(f"Processing file upload to directory: {upload_dir}")
-        
-        # Create the directory if it doesn't exist
-        os.makedirs(full_path, exist_ok=True)
-        
-        # Save each file
+        entries = []
+        uploaded = []
         for file in files:
-            file_path = os.path.join(full_path, file.filename)
-            logger.info(f"Saving file: {file.filename} to {file_path}")
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-        
+            filename = upload_store.safe_filename(file.filename)
+            if any(name == filename for name, _ in entries):
+                raise upload_store.UploadError(f"Duplicate file name: {filename}")
+            logger.info(f"Streaming file: {filename}")
+            digest, size = await upload_store.store_stream(upload_store.iter_upload_file(file))
+            entries.append((filename, digest))
+            uploaded.append({"filename": filename, "sha256": digest, "size": size})
+
+        # Identical files share one blob; an identical set of files reuses its directory.
+        upload_dir, reused = await run_in_threadpool(upload_store.link_upload, entries)
+        logger.info(f"Processed file upload to directory: {upload_dir} (deduplicated={reused})")
+
         response = {
             "status": "success",
             "directory": upload_dir,
+            "deduplicated": reused,
+            "files": uploaded,
+            "ingest_job_id": submit_ingest(upload_dir, target_column),
             "message": f"Files uploaded successfully to {upload_dir}"
         }
         logger.info(f"Upload response: {response}")
         return response
+    except upload_store.UploadError as e:
+        logger.error(f"Rejected file upload: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error during file upload: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class UploadSessionRequest(BaseModel):
+    filename: str
+    size: Optional[int] = None
+
+@app.post("/uploads")
+async def create_upload(request: UploadSessionRequest):
+    """Start a resumable upload; send the bytes with ``PUT /uploads/{id}``."""
+    try:
+        session = upload_store.create_session(request.filename, request.size)
+    except upload_store.UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Started resumable upload {session['upload_id']} for {session['filename']}")
+    return session
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    try:
+        return upload_store.session_status(upload_id)
+    except upload_store.UploadError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.put("/uploads/{upload_id}")
+async def append_upload(upload_id: str, http_request: Request, offset: int = 0):
+    """Append the raw request body at ``offset`` (bytes already received)."""
+    try:
+        return await upload_store.append_chunk(upload_id, offset, http_request.stream())
+    except upload_store.UploadNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except upload_store.UploadError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, target_column: Optional[str] = None):
+    try:
+        result = await run_in_threadpool(upload_store.complete_session, upload_id)
+    except upload_store.UploadNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except upload_store.UploadError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    result["ingest_job_id"] = submit_ingest(result["directory"], target_column)
+    logger.info(f"Completed resumable upload {upload_id}: {result}")
+    return {"status": "success", **result}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
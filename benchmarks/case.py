@@ -0,0 +1,130 @@
+"""Run one benchmark case in this process: ``python -m benchmarks.case --raw <dataset> --out result.json``.
+
+Meant to be started by :mod:`benchmarks.run` in a fresh process and scratch
+working directory per case, so peak memory, caches and registry state of one
+case never leak into the next.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.resources import ResourceSampler
+from benchmarks.scripted_model import ScriptedModel
+from benchmarks.synthetic import TARGET
+from src.utils.tracing import Span, trace_run, span
+
+logger = logging.getLogger(__name__)
+
+TASK = "Train and evaluate models on {dataset}. The target column is '{target}'. Use AUC as the evaluation metric"
+
+
+def _agent(name: str) -> Callable[[Span], bool]:
+    return lambda s: s.name == "agent.run" and s.attributes.get("agent") == name
+
+
+def _modeling_step(step: int) -> Callable[[Span], bool]:
+    return lambda s: s.name == "agent.step" and s.attributes.get("agent") == "modeling" and s.attributes.get("step") == step
+
+
+# Each stage is the set of spans matching its predicate; the modeling script
+# does the final fit in its second step and saves the model in its third.
+STAGES: Dict[str, Callable[[Span], bool]] = {
+    "ingest": lambda s: s.name == "ingest",
+    "analysis": _agent("analysis"),
+    "context": _agent("context"),
+    "cv": lambda s: s.name == "tool.call" and s.attributes.get("tool") == "run_cv",
+    "final_fit": _modeling_step(2),
+    "save": _modeling_step(3),
+    "total": lambda s: s.parent_id is None,
+}
+
+
+def link_dataset(source: str, destination: str) -> None:
+    """Hard-link (or copy, across file systems) the raw files of a generated dataset into a fresh upload directory."""
+    import shutil
+
+    os.makedirs(destination, exist_ok=True)
+    for name in os.listdir(source):
+        if name.startswith("."):
+            continue
+        try:
+            os.link(os.path.join(source, name), os.path.join(destination, name))
+        except OSError:
+            shutil.copyfile(os.path.join(source, name), os.path.join(destination, name))
+
+
+def stage_metrics(spans: List[Span], sampler: ResourceSampler) -> Dict[str, Dict[str, float]]:
+    stages = {}
+    for stage, matches in STAGES.items():
+        found = [s for s in spans if matches(s) and s.end_ns is not None]
+        if not found:
+            continue
+        start = min(s.start_ns for s in found) / 1e9
+        end = max(s.end_ns for s in found) / 1e9
+        stages[stage] = {"seconds": round(sum(s.seconds for s in found), 3), **sampler.window(start, end)}
+    return stages
+
+
+def run_case(raw_dir: str, estimator: str = "LightGBM", latency: float = 0.0) -> Dict[str, Any]:
+    """Ingest a copy of the raw dataset and run the manager workflow on it with the scripted LLM.
+
+    Runs in the current working directory, which should be a scratch
+    directory: the dataset, analysis cache and model registry are written
+    under it.
+    """
+    from src.agents.factory import run_agent
+    from src.utils.ingest import ingest_upload
+    from src.utils.model_setup import get_model_pool
+    from src.utils.sandbox import get_worker_pool, sandboxed_agents
+
+    dataset = os.path.join("datasets", os.path.basename(os.path.normpath(raw_dir)))
+    link_dataset(raw_dir, dataset)
+    get_model_pool().factory = lambda: ScriptedModel(dataset, TARGET, estimator=estimator, latency=latency)
+    if sandboxed_agents():
+        get_worker_pool().wait_warm()  # the API warms its workers at startup, outside any run
+
+    answer: Any = None
+    with ResourceSampler() as sampler, trace_run("benchmark", dataset=dataset) as tracer:
+        with span("ingest"):
+            ingest_upload(dataset, target_column=TARGET)
+        answer = run_agent("manager", TASK.format(dataset=dataset, target=TARGET))
+
+    result = answer.get("result") if isinstance(answer, dict) else None
+    summary = tracer.summary()
+    return {
+        "stages": stage_metrics(tracer.spans, sampler),
+        "cpu_seconds": round(sampler.samples[-1][1] - sampler.samples[0][1], 3),
+        "peak_rss_mb": round(max(s[2] for s in sampler.samples) / (1 << 20), 1),
+        "llm": {k: summary["llm"][k] for k in ("calls", "input_tokens", "output_tokens")},
+        "scores": {
+            "cv_auc": result["cv_scores"]["auc"],
+            "test_auc": result["test_scores"]["auc"],
+        } if isinstance(result, dict) else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--raw", required=True, help="Directory of the generated raw dataset")
+    parser.add_argument("--estimator", default="LightGBM")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait per LLM call")
+    parser.add_argument("--out", required=True, help="Where to write the JSON result")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    started = time.time()
+    try:
+        result = {"status": "ok", **run_case(args.raw, args.estimator, args.latency)}
+    except Exception as e:
+        logger.exception("Benchmark case failed")
+        result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+    result["wall_seconds"] = round(time.time() - started, 3)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
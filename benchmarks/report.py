@@ -0,0 +1,165 @@
+"""Compare two benchmark runs from the history and flag regressions.
+
+    python -m benchmarks.report                       # latest run vs the run before it
+    python -m benchmarks.report --baseline <run_id>   # or a commit prefix
+    python -m benchmarks.report --json
+
+Exits with status 1 when any stage got slower, used more CPU or memory by
+more than ``--threshold`` (and by more than the noise floor of the metric),
+or when a case that used to pass now fails.
+"""
+import argparse
+import json
+import statistics
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.run import HISTORY_FILE
+
+DEFAULT_THRESHOLD = 0.10
+# Smaller absolute changes are timer and sampling noise whatever their ratio.
+NOISE_FLOOR = {"seconds": 0.1, "cpu_seconds": 0.1, "peak_rss_mb": 16.0}
+
+CaseKey = Tuple[int, int, int, str, float]
+
+
+def load_history(path: str = HISTORY_FILE) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def case_key(record: Dict[str, Any]) -> CaseKey:
+    case = record["case"]
+    return case["rows"], case["cols"], case["seed"], case["estimator"], case["latency"]
+
+
+def _runs(history: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    runs: Dict[str, List[Dict[str, Any]]] = {}
+    for record in history:
+        runs.setdefault(record["run_id"], []).append(record)
+    return runs
+
+
+def select_runs(history: List[Dict[str, Any]], candidate: Optional[str] = None,
+                baseline: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """The records of the candidate run (latest by default) and of its baseline.
+
+    ``candidate`` and ``baseline`` are run ids or commit prefixes. Without a
+    baseline, the latest earlier run on the same host and backend that shares
+    at least one measured case with the candidate is used.
+    """
+    runs = _runs(history)
+    order = list(runs)
+
+    def find(ref: str) -> str:
+        matches = [run_id for run_id in order if run_id == ref or (runs[run_id][0].get("commit") or "").startswith(ref)]
+        if not matches:
+            raise LookupError(f"No benchmark run matches '{ref}'")
+        return matches[-1]
+
+    if not order:
+        raise LookupError("The benchmark history is empty")
+    candidate_id = find(candidate) if candidate else order[-1]
+    current = runs[candidate_id]
+    if baseline:
+        return current, runs[find(baseline)]
+    measured = {case_key(r) for r in current if r["status"] != "skipped"}
+    for run_id in reversed(order[:order.index(candidate_id)]):
+        records = runs[run_id]
+        same_setup = (records[0].get("host"), records[0].get("backend")) == (current[0].get("host"), current[0].get("backend"))
+        if same_setup and measured & {case_key(r) for r in records if r["status"] != "skipped"}:
+            return current, records
+    raise LookupError(f"No earlier run on the same host shares a case with run {candidate_id}")
+
+
+def _metrics(records: List[Dict[str, Any]]) -> Dict[Tuple[str, str], float]:
+    """Median of every stage metric over the repeats of one case."""
+    values: Dict[Tuple[str, str], List[float]] = {}
+    for record in records:
+        for stage, figures in record.get("stages", {}).items():
+            for metric, value in figures.items():
+                values.setdefault((stage, metric), []).append(value)
+    return {key: statistics.median(v) for key, v in values.items()}
+
+
+def compare(baseline: List[Dict[str, Any]], candidate: List[Dict[str, Any]],
+            threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """One row per case, stage and metric measured in both runs, with the relative change."""
+    def by_case(records):
+        cases: Dict[CaseKey, List[Dict[str, Any]]] = {}
+        for record in records:
+            cases.setdefault(case_key(record), []).append(record)
+        return cases
+
+    before, after = by_case(baseline), by_case(candidate)
+    rows = []
+    for key in sorted(set(before) & set(after)):
+        statuses = ({r["status"] for r in before[key]}, {r["status"] for r in after[key]})
+        if "skipped" in statuses[0] | statuses[1]:
+            continue
+        if statuses[0] == {"ok"} and statuses[1] != {"ok"}:
+            rows.append({"case": key, "stage": "status", "metric": "status", "baseline": "ok",
+                         "candidate": ",".join(sorted(statuses[1])), "change": None, "changed": True, "regression": True})
+            continue
+        old = _metrics([r for r in before[key] if r["status"] == "ok"])
+        new = _metrics([r for r in after[key] if r["status"] == "ok"])
+        for stage, metric in sorted(set(old) & set(new)):
+            a, b = old[stage, metric], new[stage, metric]
+            change = (b - a) / a if a else None
+            changed = abs(b - a) > NOISE_FLOOR.get(metric, 0.0) and (change is None or abs(change) > threshold)
+            rows.append({"case": key, "stage": stage, "metric": metric, "baseline": a, "candidate": b,
+                         "change": change, "changed": changed, "regression": changed and b > a})
+    return rows
+
+
+def _describe(records: List[Dict[str, Any]]) -> str:
+    first = records[0]
+    commit = (first.get("commit") or "unknown")[:10] + ("+dirty" if first.get("dirty") else "")
+    return f"{first['run_id']} ({commit})"
+
+
+def format_table(rows: List[Dict[str, Any]], show_all: bool = False, threshold: float = DEFAULT_THRESHOLD) -> str:
+    lines = [f"{'case':<22}{'stage':<12}{'metric':<14}{'baseline':>10}{'candidate':>11}{'change':>9}"]
+    for row in rows:
+        if not (show_all or row["changed"]):
+            continue
+        rows_, cols, *_ = row["case"]
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "-"
+        baseline = row["baseline"] if isinstance(row["baseline"], str) else f"{row['baseline']:.2f}"
+        candidate = row["candidate"] if isinstance(row["candidate"], str) else f"{row['candidate']:.2f}"
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(f"{f'{rows_:,} x {cols:,}':<22}{row['stage']:<12}{row['metric']:<14}"
+                     f"{baseline:>10}{candidate:>11}{change:>9}{flag}")
+    if len(lines) == 1:
+        lines.append(f"(no change beyond {threshold:.0%})")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs and flag regressions.")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--run", help="Candidate run id or commit prefix (default: the latest run)")
+    parser.add_argument("--baseline", help="Baseline run id or commit prefix (default: the previous comparable run)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative change that counts")
+    parser.add_argument("--all", action="store_true", help="List every metric, not only the changed ones")
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args()
+
+    try:
+        candidate, baseline = select_runs(load_history(args.history), args.run, args.baseline)
+    except (OSError, LookupError) as e:
+        sys.exit(str(e))
+    rows = compare(baseline, candidate, args.threshold)
+    regressions = sum(row["regression"] for row in rows)
+    if args.json:
+        print(json.dumps({"baseline": baseline[0]["run_id"], "candidate": candidate[0]["run_id"],
+                          "threshold": args.threshold, "regressions": regressions, "rows": rows}, indent=2))
+    else:
+        print(f"candidate {_describe(candidate)} vs baseline {_describe(baseline)}")
+        print(format_table(rows, args.all, args.threshold))
+        print(f"{regressions} regression(s)")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
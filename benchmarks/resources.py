@@ -0,0 +1,138 @@
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_INTERVAL = 0.05
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _stat(pid: str) -> Optional[Tuple[int, float, float, int]]:
+    """(parent pid, own CPU seconds, CPU seconds of reaped children, RSS bytes) of a process, from ``/proc``."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    fields = stat[stat.rindex(")") + 2:].split()
+    own = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS  # utime, stime
+    reaped = (int(fields[13]) + int(fields[14])) / _CLOCK_TICKS  # cutime, cstime
+    return int(fields[1]), own, reaped, int(fields[21]) * _PAGE_SIZE
+
+
+class ProcessTreeUsage:
+    """Monotonic CPU seconds and current resident bytes of a process tree.
+
+    Each call walks ``/proc`` for ``root`` and all its descendants, including
+    forkserver workers, which are children of the forkserver rather than of
+    ``root``. CPU time is accumulated from per-process increments since the
+    previous call, so a process that exits or is reparented out of the tree
+    keeps the time it was last seen with. When an exited process is reaped,
+    its time shows up again in its parent's children counters, and that
+    amount is not counted twice. Processes that start and exit between two
+    calls are counted once their parent reaps them.
+    """
+
+    def __init__(self):
+        self.cpu = 0.0
+        self._seen: Dict[int, Tuple[int, float, float]] = {}
+        # Per parent: CPU seconds of exited children already counted, to skip when they are reaped.
+        self._credit: Dict[int, float] = {}
+
+    def _tree(self, root: int) -> Dict[int, Tuple[int, float, float, int]]:
+        stats = {}
+        for pid in os.listdir("/proc"):
+            if pid.isdigit():
+                stat = _stat(pid)
+                if stat is not None:
+                    stats[int(pid)] = stat
+        children: Dict[int, List[int]] = {}
+        for pid, stat in stats.items():
+            children.setdefault(stat[0], []).append(pid)
+        tree, pending = {}, [root]
+        while pending:
+            pid = pending.pop()
+            if pid in stats:
+                tree[pid] = stats[pid]
+            pending.extend(children.get(pid, ()))
+        return tree
+
+    def __call__(self, root: int) -> Tuple[float, int]:
+        tree = self._tree(root)
+        for pid in self._seen.keys() - tree.keys():
+            ppid, own, reaped = self._seen.pop(pid)
+            self._credit[ppid] = self._credit.get(ppid, 0.0) + own + reaped
+        rss = 0
+        for pid, (ppid, own, reaped, pid_rss) in tree.items():
+            rss += pid_rss
+            previous = self._seen.get(pid)
+            if previous is None:
+                self.cpu += own + reaped
+            else:
+                grown = max(0.0, reaped - previous[2])
+                known = min(grown, self._credit.get(pid, 0.0))
+                if known:
+                    self._credit[pid] -= known
+                self.cpu += max(0.0, own - previous[1]) + grown - known
+            self._seen[pid] = (ppid, own, reaped)
+        return self.cpu, rss
+
+
+def _self_usage(root: int) -> Tuple[float, int]:
+    # Without /proc only this process (and its reaped children) can be measured.
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    peak = usage[0].ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return sum(u.ru_utime + u.ru_stime for u in usage), peak
+
+
+class ResourceSampler:
+    """Background thread sampling the CPU time and memory of this process tree.
+
+    Samples are ``(time.time(), cpu_seconds, rss_bytes)``; :meth:`window`
+    turns them into the CPU seconds used and the peak RSS over any time
+    range, e.g. that of a traced span. CPU time is attributed by wall-clock
+    range, so stages that overlap (analysis and context research) share it.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, pid: Optional[int] = None):
+        self.interval = interval
+        self.pid = pid or os.getpid()
+        self.samples: List[Tuple[float, float, int]] = []
+        self._usage = ProcessTreeUsage() if os.path.isdir("/proc") else _self_usage
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> None:
+        cpu, rss = self._usage(self.pid)
+        self.samples.append((time.time(), cpu, rss))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self) -> "ResourceSampler":
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="benchmark-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def window(self, start: float, end: float) -> Dict[str, float]:
+        """CPU seconds and peak RSS (MiB) between two ``time.time()`` instants."""
+        # The samples just outside the range bound the CPU counter at its edges.
+        before = [s for s in self.samples if s[0] <= start]
+        after = [s for s in self.samples if s[0] >= end]
+        first = before[-1] if before else self.samples[0]
+        last = after[0] if after else self.samples[-1]
+        inside = [s[2] for s in self.samples if first[0] <= s[0] <= last[0]]
+        return {
+            "cpu_seconds": round(max(0.0, last[1] - first[1]), 3),
+            "peak_rss_mb": round(max(inside, default=0) / (1 << 20), 1),
+        }
@@ -0,0 +1,163 @@
+"""End-to-end benchmark of the agent pipeline on synthetic datasets.
+
+    python -m benchmarks.run --rows 10000,100000 --cols 10,100
+    python -m benchmarks.run --full --max-cells 0      # 10k..10M rows x 10..1,000 columns
+
+Every case runs ``main.py``'s workflow (manager -> analysis + context ->
+modeling) in a fresh process and scratch directory, with a scripted, offline
+LLM (see :mod:`benchmarks.scripted_model`), and appends one JSON line to the
+history file. Compare runs with ``python -m benchmarks.report``.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from benchmarks.synthetic import dataset_name, write_dataset
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE = os.path.join(REPO_ROOT, "benchmarks", "history.jsonl")
+WORK_DIR = os.path.join(REPO_ROOT, "benchmarks", "work")
+QUICK_ROWS = (10_000, 100_000)
+QUICK_COLS = (10, 100)
+FULL_ROWS = (10_000, 100_000, 1_000_000, 10_000_000)
+FULL_COLS = (10, 100, 1_000)
+DEFAULT_MAX_CELLS = 100_000_000
+STDERR_TAIL = 4000
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """Code version and machine a run was measured on; only runs on the same host compare fairly."""
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_case(raw_dir: str, scratch: str, estimator: str, latency: float, timeout: Optional[float]) -> Dict[str, Any]:
+    """Run one case in a child process and return its result."""
+    os.makedirs(scratch, exist_ok=True)
+    out = os.path.join(scratch, "result.json")
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])),
+        "ML_AGENT_LLM_CACHE": "off",
+        "ML_AGENT_TRACE_FILE": os.path.join(scratch, "traces.jsonl"),
+        # Workers are warmed before the run; replacing them between sub-agents would show up in the stages.
+        "ML_AGENT_SANDBOX_REWARM": "0",
+    }
+    command = [sys.executable, "-m", "benchmarks.case", "--raw", raw_dir, "--estimator", estimator,
+               "--latency", str(latency), "--out", out]
+    started = time.time()
+    try:
+        proc = subprocess.run(command, cwd=scratch, env=env, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"status": "timeout", "wall_seconds": round(time.time() - started, 3)}
+    try:
+        with open(out) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"status": "failed", "error": f"exit code {proc.returncode}: {proc.stderr[-STDERR_TAIL:]}",
+                "wall_seconds": round(time.time() - started, 3)}
+
+
+def sweep(rows: List[int], cols: List[int], seed: int = 0, estimator: str = "LightGBM", latency: float = 0.0,
+          max_cells: int = DEFAULT_MAX_CELLS, repeat: int = 1, history: str = HISTORY_FILE,
+          work_dir: str = WORK_DIR, timeout: Optional[float] = None, keep: bool = False) -> List[Dict[str, Any]]:
+    """Run every ``rows x cols`` case ``repeat`` times and append the results to ``history``.
+
+    Cases above ``max_cells`` cells (0 for no limit) are recorded as skipped.
+    Generated datasets are kept under ``work_dir/data`` and reused by later runs.
+    """
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:6]
+    env = environment()
+    records = []
+    for n_rows in rows:
+        for n_cols in cols:
+            for attempt in range(repeat):
+                case = {"rows": n_rows, "cols": n_cols, "seed": seed, "estimator": estimator, "latency": latency}
+                record = {"run_id": run_id, "timestamp": datetime.now(timezone.utc).isoformat(), **env,
+                          "backend": "scripted", "case": case, "attempt": attempt}
+                if max_cells and n_rows * n_cols > max_cells:
+                    record["status"] = "skipped"
+                else:
+                    name = dataset_name(n_rows, n_cols, seed)
+                    generated = write_dataset(os.path.join(work_dir, "data", name), n_rows, n_cols, seed)
+                    scratch = os.path.join(work_dir, run_id, f"{name}-{attempt}")
+                    record.update(run_case(generated["path"], scratch, estimator, latency, timeout))
+                    if not keep:
+                        shutil.rmtree(scratch, ignore_errors=True)
+                print(_line(record), flush=True)
+                records.append(record)
+                _append(history, record)
+    if not keep:
+        shutil.rmtree(os.path.join(work_dir, run_id), ignore_errors=True)
+    return records
+
+
+def _append(path: str, record: Dict[str, Any]) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
+
+def _line(record: Dict[str, Any]) -> str:
+    case = record["case"]
+    label = f"{case['rows']:>10,} x {case['cols']:<5,}"
+    if record["status"] != "ok":
+        return f"{label} {record['status']} {record.get('error', '')[:200]}"
+    stages = " ".join(f"{name}={stage['seconds']:.2f}s" for name, stage in record["stages"].items())
+    return f"{label} {stages} cpu={record['cpu_seconds']:.1f}s peak={record['peak_rss_mb']:.0f}MiB"
+
+
+def _sizes(value: str) -> List[int]:
+    return [int(float(v)) for v in value.split(",") if v]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the agent pipeline on synthetic datasets.")
+    parser.add_argument("--rows", type=_sizes, help=f"Comma-separated row counts (default {QUICK_ROWS})")
+    parser.add_argument("--cols", type=_sizes, help=f"Comma-separated feature counts (default {QUICK_COLS})")
+    parser.add_argument("--full", action="store_true", help=f"Sweep {FULL_ROWS} rows x {FULL_COLS} columns")
+    parser.add_argument("--max-cells", type=int, default=DEFAULT_MAX_CELLS, help="Skip larger cases (0: no limit)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--estimator", default="LightGBM")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--timeout", type=float, help="Seconds before a case is abandoned")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--keep", action="store_true", help="Keep each case's scratch directory")
+    args = parser.parse_args()
+
+    rows = args.rows or list(FULL_ROWS if args.full else QUICK_ROWS)
+    cols = args.cols or list(FULL_COLS if args.full else QUICK_COLS)
+    records = sweep(rows, cols, seed=args.seed, estimator=args.estimator, latency=args.latency,
+                    max_cells=args.max_cells, repeat=args.repeat, history=args.history,
+                    work_dir=os.path.abspath(args.work_dir), timeout=args.timeout, keep=args.keep)
+    sys.exit(1 if any(r["status"] in ("failed", "timeout") for r in records) else 0)
+
+
+if __name__ == "__main__":
+    main()
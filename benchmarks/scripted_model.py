@@ -0,0 +1,173 @@
+import time
+from typing import Any, List
+
+from smolagents.models import ChatMessage, MessageRole, Model
+from smolagents.monitoring import TokenUsage
+
+from src.utils import tracing
+from src.utils.context_budget import estimate_tokens
+
+MODEL_ID = "scripted"
+
+# Agents are recognised by a tool only they are given (their tools are listed in the system prompt).
+AGENT_TOOLS = (
+    ("manager", "run_modeling"),
+    ("modeling", "run_tournament"),
+    ("analysis", "compute_dataset_profile"),
+    ("context", "web_search"),
+)
+
+MANAGER = [
+    """Thought: Fan out to analysis and research, then train.
+<code>
+dataset_path = '{dataset}'
+analysis_exists = analysis_present(analysis_path(dataset_path))
+domain = "synthetic tabular binary classification"
+{fanout}
+result = run_modeling("Train and evaluate a classifier on {dataset} (target '{target}'). Use AUC as the evaluation metric", dataset_path)
+final_answer({{"delegate": "modeling", "result": result, "context": context_result}})
+</code>""",
+]
+
+PARALLEL_FANOUT = """fanout = run_analysis_and_context("Analyse {dataset} (target '{target}')", "research machine learning approaches for this problem domain", dataset_path, domain)
+context_result = fanout["context"]"""
+
+SEQUENTIAL_FANOUT = """run_global_analysis("Analyse {dataset} (target '{target}')", dataset_path)
+context_result = run_context("research machine learning approaches for this problem domain", domain)"""
+
+ANALYSIS = [
+    """Thought: Profile the train split in one pass and save it.
+<code>
+set_seed(42)
+analysis_results = compute_dataset_profile(dataset_path, '{target}')
+final_answer(save_analysis_results(analysis_results, analysis_path(dataset_path)))
+</code>""",
+]
+
+CONTEXT = [
+    """Thought: Summarise the usual approach for tabular binary classification.
+<code>
+final_answer("Gradient boosted trees (LightGBM, XGBoost, CatBoost) are the strongest baselines for tabular binary classification; evaluate with stratified k-fold AUC.")
+</code>""",
+]
+
+# One step per benchmark stage: CV, final fit, save.
+MODELING = [
+    """Thought: Load the splits and cross-validate.
+<code>
+set_seed(42)
+analysis = read_analysis_results(analysis_path(dataset_path))
+train_df = load_split(dataset_path, 'train')
+test_df = load_split(dataset_path, 'test')
+X_train, y_train = train_df.drop(columns=['{target}']), train_df['{target}']
+X_test, y_test = test_df.drop(columns=['{target}']), test_df['{target}']
+config = {{"encode": "ordinal"}}
+params = {params}
+cv = run_cv(X_train, y_train, estimator='{estimator}', params=params, preprocess=config)
+print(cv['cv_scores'])
+</code>""",
+    """Thought: Fit on the full train split and score the test split.
+<code>
+import pandas as pd
+{estimator_import}
+from sklearn.metrics import accuracy_score, roc_auc_score
+enc = encode_features(X_train, config=config, X_test=X_test)
+X_fit = pd.DataFrame(enc['X'], columns=enc['feature_names'])
+X_eval = pd.DataFrame(enc['X_test'], columns=enc['feature_names'])
+final_model = {estimator_class}({kwargs}, random_state=42)
+final_model.fit(X_fit, y_train)
+scores = final_model.predict_proba(X_eval)[:, 1]
+test_scores = {{"accuracy": float(accuracy_score(y_test, scores > 0.5)), "auc": float(roc_auc_score(y_test, scores))}}
+print(test_scores)
+</code>""",
+    """Thought: Publish the model and report.
+<code>
+manifest = register_model(final_model, X_fit, metrics={{"cv_auc": cv['cv_scores']['auc'], "test_auc": test_scores['auc'], "test_accuracy": test_scores['accuracy']}}, name='benchmark', dataset_path=dataset_path)
+final_answer({{"model": '{estimator}', "cv_scores": cv['cv_scores'], "test_scores": test_scores, "notes": f"version {{manifest['version']}}"}})
+</code>""",
+]
+
+SCRIPTS = {"manager": MANAGER, "analysis": ANALYSIS, "context": CONTEXT, "modeling": MODELING}
+
+ESTIMATORS = {
+    "LightGBM": ("lightgbm.LGBMClassifier", {"n_estimators": 100, "verbose": -1}),
+    "XGBoost": ("xgboost.XGBClassifier", {"n_estimators": 100}),
+    "RandomForest": ("sklearn.ensemble.RandomForestClassifier", {"n_estimators": 100}),
+}
+
+
+class ScriptError(RuntimeError):
+    """Raised when a scripted step failed or an agent asks for more steps than its script has."""
+
+
+def _text(message: Any) -> str:
+    content = message.content if isinstance(message, ChatMessage) else message.get("content")
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return content or ""
+
+
+def _role(message: Any) -> str:
+    return message.role if isinstance(message, ChatMessage) else message.get("role")
+
+
+class ScriptedModel(Model):
+    """Offline stand-in for the LLM that plays a fixed script per agent.
+
+    Each agent (recognised from the tools in its system prompt) gets the code
+    action for its next step, in order, so a run drives exactly the same tool
+    calls every time without network access. The scripts call the real tools
+    (profiling, ``run_cv``, the final fit, ``register_model``) on ``dataset``,
+    so only the LLM's latency is missing; ``latency`` seconds per call can be
+    added back. Token usage is estimated from the prompt and answer sizes.
+    """
+
+    def __init__(self, dataset: str, target: str, estimator: str = "LightGBM", latency: float = 0.0, **kwargs):
+        super().__init__(model_id=MODEL_ID, **kwargs)
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"Unknown estimator '{estimator}', expected one of {sorted(ESTIMATORS)}")
+        self.latency = latency
+        estimator_path, params = ESTIMATORS[estimator]
+        module, name = estimator_path.rsplit(".", 1)
+        self.values = {
+            "dataset": dataset, "target": target, "estimator": estimator, "params": repr(params),
+            # Spelled out: the agents' interpreter cannot unpack ``**params``.
+            "kwargs": ", ".join(f"{key}={value!r}" for key, value in params.items()),
+            "estimator_import": f"from {module} import {name}", "estimator_class": name,
+        }
+
+    @staticmethod
+    def agent_of(messages: List[Any]) -> str:
+        system = _text(messages[0]) if messages else ""
+        for agent, tool in AGENT_TOOLS:
+            if f"def {tool}(" in system:
+                return agent
+        raise ScriptError("Could not tell which agent is asking from its system prompt")
+
+    def _action(self, agent: str, messages: List[Any]) -> str:
+        last = _text(messages[-1]) if messages else ""
+        if _role(messages[-1]) != MessageRole.SYSTEM and "Error:\n" in last:
+            raise ScriptError(f"Scripted {agent} step failed:\n{last}")
+        step = sum(_role(message) == MessageRole.ASSISTANT for message in messages)
+        script = SCRIPTS[agent]
+        if step >= len(script):
+            raise ScriptError(f"The {agent} script has {len(script)} steps, asked for step {step + 1}")
+        values = dict(self.values)
+        if agent == "manager":
+            fanout = PARALLEL_FANOUT if "def run_analysis_and_context(" in _text(messages[0]) else SEQUENTIAL_FANOUT
+            values["fanout"] = fanout.format(**values)
+        return script[step].format(**values)
+
+    def generate(self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs) -> ChatMessage:
+        with tracing.span("llm.request", kind=tracing.SPAN_KIND_CLIENT, **{"gen_ai.request.model": self.model_id}) as span:
+            if self.latency:
+                time.sleep(self.latency)
+            content = self._action(self.agent_of(messages), messages)
+            usage = TokenUsage(
+                input_tokens=sum(estimate_tokens(_text(message)) for message in messages),
+                output_tokens=estimate_tokens(content),
+            )
+            if span is not None:
+                span.set(**{"gen_ai.usage.input_tokens": usage.input_tokens,
+                            "gen_ai.usage.output_tokens": usage.output_tokens})
+        return ChatMessage(role=MessageRole.ASSISTANT, content=content, token_usage=usage)
@@ -0,0 +1,131 @@
+"""Import-time profile and time-to-healthy of the API.
+
+    python -m benchmarks.startup                 # import profile of api + time until /health answers
+    python -m benchmarks.startup --module main --top 30
+    python -m benchmarks.startup --json
+
+The import profile comes from ``python -X importtime`` in a fresh process, so
+nothing is cached in ``sys.modules``; modules are listed by cumulative time.
+The server check starts ``uvicorn api:app`` and polls ``/health`` until it
+answers, then until the background warm-up reports ``"warm": true``. Both run
+in a throwaway working directory, as :mod:`benchmarks.run` cases do, so the
+log, caches and traces they write stay out of the checkout.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+from benchmarks.run import REPO_ROOT
+
+DEFAULT_MODULES = ("api", "src.agents.factory")
+POLL_SECONDS = 0.02
+
+
+def _env() -> Dict[str, str]:
+    return {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))}
+
+
+def import_profile(module: str) -> Dict[str, Any]:
+    """Wall-clock seconds to import ``module`` in a fresh interpreter, and the cumulative time per imported module."""
+    command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    with tempfile.TemporaryDirectory(prefix="ml-agent-startup-") as scratch:
+        started = time.perf_counter()
+        proc = subprocess.run(command, cwd=scratch, env=_env(), capture_output=True, text=True)
+        seconds = time.perf_counter() - started
+    if proc.returncode:
+        raise RuntimeError(f"Importing {module} failed: {proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative) / 1e6
+    return {"module": module, "seconds": round(seconds, 3), "import_seconds": modules.get(module), "modules": modules}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _health(url: str) -> Optional[Dict[str, Any]]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return json.load(response)
+    except OSError:
+        return None
+
+
+def server_startup(timeout: float = 120.0) -> Dict[str, Any]:
+    """Seconds from starting the API server until ``/health`` answers, and until its warm-up is done."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    command = [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    scratch = tempfile.mkdtemp(prefix="ml-agent-startup-")
+    started = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=scratch, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    result: Dict[str, Any] = {"healthy_seconds": None, "warm_seconds": None}
+    try:
+        while time.perf_counter() - started < timeout and proc.poll() is None:
+            health = _health(url)
+            if health is not None:
+                elapsed = round(time.perf_counter() - started, 3)
+                if result["healthy_seconds"] is None:
+                    result["healthy_seconds"] = elapsed
+                if health.get("warm"):
+                    result["warm_seconds"] = elapsed
+                    break
+            time.sleep(POLL_SECONDS)
+        if proc.poll() is not None:
+            raise RuntimeError(f"The API server exited with code {proc.returncode}: {proc.stderr.read()[-2000:]}")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        shutil.rmtree(scratch, ignore_errors=True)
+    return result
+
+
+def format_profile(profile: Dict[str, Any], top: int) -> str:
+    lines = [f"import {profile['module']}: {profile['seconds']:.2f}s wall "
+             f"({profile['import_seconds'] or 0:.2f}s importing)"]
+    ranked = sorted(profile["modules"].items(), key=lambda item: item[1], reverse=True)
+    lines += [f"  {seconds:>7.3f}s  {name}" for name, seconds in ranked[1:top + 1]]
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import-time profile and time-to-healthy of the API.")
+    parser.add_argument("--module", action="append", help=f"Module to profile (repeatable, default {DEFAULT_MODULES})")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imported modules to list")
+    parser.add_argument("--no-server", action="store_true", help="Only profile imports")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    profiles: List[Dict[str, Any]] = [import_profile(module) for module in args.module or DEFAULT_MODULES]
+    server = None if args.no_server else server_startup(args.timeout)
+    if args.json:
+        print(json.dumps({"imports": profiles, "server": server}, indent=2))
+        return
+    for profile in profiles:
+        print(format_profile(profile, args.top))
+    if server is not None:
+        print(f"/health answered after {server['healthy_seconds']}s, warm after {server['warm_seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
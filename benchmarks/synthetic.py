@@ -0,0 +1,87 @@
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+TARGET = "target"
+TEST_FRACTION = 0.2
+CATEGORICAL_FRACTION = 0.2
+CATEGORY_LEVELS = 8
+MISSING_EVERY = 5  # every n-th numeric column has missing values
+MISSING_RATE = 0.05
+INFORMATIVE = 5
+CHUNK_CELLS = 1 << 22  # rows are generated and written this many cells at a time
+
+
+def dataset_name(rows: int, cols: int, seed: int) -> str:
+    return f"synthetic-{rows}x{cols}-s{seed}"
+
+
+def schema_of(cols: int) -> Dict[str, List[str]]:
+    """Feature names of a ``cols``-wide dataset, split into numeric and categorical."""
+    categorical = int(cols * CATEGORICAL_FRACTION)
+    return {
+        "numeric": [f"num_{i}" for i in range(cols - categorical)],
+        "categorical": [f"cat_{i}" for i in range(categorical)],
+    }
+
+
+def _chunk(rows: int, cols: int, seed: int, index: int, weights: np.ndarray) -> pa.Table:
+    rng = np.random.default_rng([seed, index])
+    names = schema_of(cols)
+    numeric = rng.standard_normal((rows, len(names["numeric"])), dtype=np.float32)
+    codes = rng.integers(0, CATEGORY_LEVELS, (rows, len(names["categorical"])))
+
+    logit = numeric[:, :INFORMATIVE] @ weights[:min(INFORMATIVE, numeric.shape[1])]
+    if codes.shape[1]:
+        logit += (codes[:, 0] - CATEGORY_LEVELS / 2) / CATEGORY_LEVELS
+    label = (rng.random(rows) < 1 / (1 + np.exp(-logit))).astype(np.int64)
+
+    columns: Dict[str, Any] = {}
+    for i, name in enumerate(names["numeric"]):
+        values = numeric[:, i]
+        mask = rng.random(rows) < MISSING_RATE if i % MISSING_EVERY == MISSING_EVERY - 1 else None
+        columns[name] = pa.array(values, mask=mask)
+    levels = pa.array([f"level_{i}" for i in range(CATEGORY_LEVELS)])
+    for i, name in enumerate(names["categorical"]):
+        columns[name] = levels.take(pa.array(codes[:, i]))
+    columns[TARGET] = pa.array(label)
+    return pa.table(columns)
+
+
+def write_dataset(directory: str, rows: int, cols: int, seed: int = 0) -> Dict[str, Any]:
+    """Write a synthetic binary classification dataset as ``train.parquet`` and ``test.parquet``.
+
+    ``cols`` features (about a fifth of them string categoricals, every fifth
+    numeric column with missing values) plus a ``target`` label that depends on
+    a few of them. Rows are generated in chunks of about ``CHUNK_CELLS`` cells,
+    each from its own seeded generator, so memory stays bounded and the files
+    are identical for the same ``(rows, cols, seed)``.
+    An existing, complete dataset is left as it is.
+    """
+    marker = os.path.join(directory, ".complete")
+    if os.path.exists(marker):
+        return {"path": directory, "rows": rows, "cols": cols, "generated": False}
+    os.makedirs(directory, exist_ok=True)
+    weights = np.random.default_rng(seed).normal(size=INFORMATIVE).astype(np.float32)
+    chunk_rows = max(1, CHUNK_CELLS // cols)
+    test_rows = int(rows * TEST_FRACTION)
+    splits = (("train", rows - test_rows), ("test", test_rows))
+    index = 0
+    for split, count in splits:
+        path = os.path.join(directory, f"{split}.parquet")
+        writer = None
+        try:
+            for start in range(0, count, chunk_rows):
+                table = _chunk(min(chunk_rows, count - start), cols, seed, index, weights)
+                index += 1
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    open(marker, "w").close()
+    return {"path": directory, "rows": rows, "cols": cols, "generated": True}
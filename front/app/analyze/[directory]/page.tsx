@@ -36,6 +36,8 @@ export default function AnalysisPage({ params }: AnalysisPageProps) {
         
         // Commented out API call, only for the demo because it takes too long to run, but it works well, you just have to remove the comment to use it
         /*
+        // POST /model only queues the run and answers with a job id; the
+        // result has to be polled from GET /jobs/{job_id} until it finishes.
         const response = await fetch('http://localhost:8000/model', {
           method: 'POST',
           headers: {
@@ -50,9 +52,30 @@ export default function AnalysisPage({ params }: AnalysisPageProps) {
           throw new Error('Analysis failed')
         }
 
-        console.log(response)
+        const { job_id } = await response.json()
 
-        const data = await response.json()
+        let job
+        while (true) {
+          const jobResponse = await fetch(`http://localhost:8000/jobs/${job_id}`)
+          if (!jobResponse.ok) {
+            throw new Error('Analysis failed')
+          }
+          job = await jobResponse.json()
+          console.log('Job status:', job.status)
+          if (job.status === "succeeded" || job.status === "failed") {
+            break
+          }
+          await new Promise(resolve => setTimeout(resolve, 5000))
+        }
+
+        if (job.status === "failed") {
+          throw new Error(job.error || 'Analysis failed')
+        }
+
+        const data = {
+          status: "success",
+          result: job.result
+        }
         */
         
         // Hardcoded data
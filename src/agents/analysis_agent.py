@@ -1,43 +1,53 @@
 from smolagents import CodeAgent
 from smolagents import LiteLLMModel
-from src.utils.file_tools import save_analysis_results, load_dataset, set_seed
+from src.utils.file_tools import save_analysis_results, load_dataset, load_split, set_seed, analysis_path
+from src.utils.profiling import compute_dataset_profile
 
 def create_analysis_agent(model: LiteLLMModel) -> CodeAgent:
     """Create and configure the dataset analysis agent."""
     return CodeAgent(
         name="global_analysis",
-        tools=[save_analysis_results, load_dataset, set_seed],
+        tools=[save_analysis_results, load_dataset, load_split, set_seed, analysis_path, compute_dataset_profile],
         model=model,
         additional_authorized_imports=[
             "time", "numpy", "pandas", "os", "datasets", "json", "matplotlib", "matplotlib.pyplot", "seaborn"
         ],
-        description="""Goal: generate an exploratory analysis for the `datasets/diabetes-readmission` dataset and save it as JSON.
+        description="""Goal: generate an exploratory analysis of the dataset at `dataset_path` and save it as JSON.
+`dataset_path` is given to you as a variable; use it for every path below and never hardcode another dataset.
 
 Action guidelines (do NOT echo):
 1. set_seed(42) for reproducibility.
-2. dataset_dict = load_dataset('datasets/diabetes-readmission')
-3. Work on the **train** split unless stated otherwise: `df = dataset_dict['train'].to_pandas()`
-4. Produce these insights (at minimum):
-   - num_samples, num_features
-   - list of features with dtype & % missing
-   - class distribution of `readmitted`
-   - basic stats for numeric cols (mean, std) and value counts for categoricals
-   - correlation matrix for numeric cols
-5. (Optional) create insightful plots and save them under `analysis_results/plots/` if matplotlib is available.
-6. Build a python `dict` called `analysis_results` with:
+2. target_column = 'readmitted'  # default; use the target named in the task
+   analysis_results = compute_dataset_profile(dataset_path, target_column)
+   - This built-in tool already computes, in one vectorised pass over the **train** split:
+     num_samples, num_features, features (name, dtype, pct_missing), class_distribution,
+     numeric_stats (mean, std, min, max), value_counts for categoricals and the numeric
+     correlation matrix, plus dataset_paths.
+   - Do NOT recompute these statistics with pandas; only interpret them.
+3. Inspect the profile (e.g. the most missing features, class imbalance ratio, the features most
+   correlated with the target) and add your conclusions as `analysis_results["insights"]`: a short list of strings.
+4. (Optional) for plots or checks the profile does not cover, use
+   `df = load_split(dataset_path, 'train')` (cached and shared; never call `.to_pandas()` yourself)
+   and save plots under `analysis_results/plots/` if matplotlib is available.
+5. `analysis_results` must keep this schema:
    {
      "num_samples": <int>,
+     "num_features": <int>,
      "features": [ {"name": str, "dtype": str, "pct_missing": float} ],
      "class_distribution": <dict>,
+     "numeric_stats": <dict>,
+     "value_counts": <dict>,
      "correlations": <dict>,
+     "insights": [str],
      "dataset_paths": {
-         "train": "datasets/diabetes-readmission/train",
-         "test":  "datasets/diabetes-readmission/test",
-         "base_path": "datasets/diabetes-readmission"
+         "train": "<dataset_path>/train",
+         "test":  "<dataset_path>/test",
+         "base_path": "<dataset_path>"
      }
    }
-7. save_analysis_results(analysis_results, 'analysis_results/dataset_analysis.json')
-8. Return: 'analysis_results/dataset_analysis.json'
+6. output_path = analysis_path(dataset_path)  # cache entry keyed by the dataset's content hash
+   save_analysis_results(analysis_results, output_path)
+7. Return: output_path
 
 If an error occurs, raise an Exception with a concise message so the manager can surface it.
 """
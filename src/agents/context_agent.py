@@ -1,12 +1,13 @@
 from smolagents import CodeAgent
 from smolagents import LiteLLMModel
-from smolagents import WebSearchTool
+
+from src.utils.search import SearchTool
 
 def create_context_agent(model: LiteLLMModel) -> CodeAgent:
     """Create and configure the context search agent."""
     return CodeAgent(
         name="context_search",
-        tools=[WebSearchTool()],
+        tools=[SearchTool()],
         model=model,
         additional_authorized_imports=[
             "json", "re", "urllib.parse"
@@ -21,7 +22,7 @@ Action guidelines (do NOT echo):
    - State-of-the-art methods for this problem type
    - Best practices and common challenges
    - Comparative studies of different approaches
-3. Use WebSearchTool to search for relevant content
+3. Use web_search to search for relevant content (it searches local research notes first, then the web)
 4. Focus searches on:
    - arXiv papers about the problem domain
    - Google Scholar results for methodological approaches
@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from smolagents import CodeAgent
+from src.agents.analysis_agent import create_analysis_agent
+from src.agents.context_agent import create_context_agent
+from src.agents.manager_agent import create_manager_agent
+from src.agents.modeling_agent import create_modeling_agent
+from src.utils.context_budget import memory_compactor
+from src.utils.model_setup import get_model_pool
+from src.utils.run_events import attach_to_current_run
+from src.utils.sandbox import sandboxed
+from src.utils.tracing import instrument_agent, span
+
+AGENT_BUILDERS = {
+    "manager": create_manager_agent,
+    "analysis": create_analysis_agent,
+    "context": create_context_agent,
+    "modeling": create_modeling_agent,
+}
+
+
+@contextmanager
+def new_agent(kind: str) -> Iterator[CodeAgent]:
+    """Build a fresh, isolated agent of ``kind`` on a pooled model.
+
+    Every call returns a new agent with empty step memory; the underlying
+    LLM client is leased from the process-wide pool and handed back when the
+    ``with`` block exits. Agents are attached to the current run, if any, so
+    their steps are streamed and they can be cancelled, and their step memory
+    is compacted once it outgrows ``ML_AGENT_CONTEXT_TOKENS``. Inside a traced
+    run the agent, its steps, LLM requests, tool calls and code execution
+    are recorded as spans. The code of the kinds listed in ``ML_AGENT_SANDBOX``
+    runs in a sandbox worker process leased for the block.
+    """
+    if kind not in AGENT_BUILDERS:
+        raise ValueError(f"Unknown agent kind: {kind}")
+    with get_model_pool().lease() as model, span("agent.run", agent=kind), \
+            sandboxed(AGENT_BUILDERS[kind](model), kind) as agent:
+        agent = instrument_agent(memory_compactor().attach(agent), kind)
+        yield attach_to_current_run(agent)
+
+
+def run_agent(kind: str, task: str, additional_args: Optional[Dict[str, Any]] = None) -> Any:
+    """Run ``task`` on a fresh agent of ``kind`` and return its final answer.
+
+    ``additional_args`` become variables of the agent's Python state (and are
+    listed in its task), e.g. the ``dataset_path`` a sub-agent works on.
+    """
+    with new_agent(kind) as agent:
+        return agent.run(task, additional_args=additional_args)
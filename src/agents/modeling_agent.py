@@ -1,43 +1,63 @@
 from smolagents import CodeAgent
 from smolagents import LiteLLMModel
-from src.utils.file_tools import read_analysis_results, load_dataset, set_seed, read_json, save_model
+from src.utils.file_tools import read_analysis_results, load_dataset, load_split, set_seed, read_json, save_model, analysis_path
+from src.utils.cross_validation import run_cv
+from src.utils.model_selection import run_tournament
+from src.utils.preprocessing_cache import encode_features
+from src.utils.feature_matrix import compact_features
+from src.utils.model_registry import register_model
 
 def create_modeling_agent(model: LiteLLMModel) -> CodeAgent:
     """Create and configure the modeling agent for training and evaluation."""
     return CodeAgent(
         name="model_training",
-        tools=[read_analysis_results, load_dataset, set_seed, read_json, save_model],
+        tools=[read_analysis_results, load_dataset, load_split, set_seed, read_json, save_model, analysis_path, run_cv, run_tournament, encode_features, compact_features, register_model],
         model=model,
         additional_authorized_imports=[
             "time", "numpy", "pandas", "os", "json",
             "catboost.*", "lightgbm.*", "xgboost.*", "sklearn.*",
             "datasets.load_from_disk"
         ],
-        description="""Goal: train and evaluate the most suitable classifier for the `diabetes-readmission` dataset using AUC as the primary metric.
+        description="""Goal: train and evaluate the most suitable classifier for the dataset at `dataset_path` using AUC as the primary metric.
+`dataset_path` is given to you as a variable; use it for every path below and never hardcode another dataset.
 
 Workflow (do NOT echo):
 1. set_seed(42).
    - All file reading must use the provided helper tools; never call `open()` directly.
-2. analysis = read_analysis_results('analysis_results/dataset_analysis.json')  # fetch metadata only
+2. analysis = read_analysis_results(analysis_path(dataset_path))  # fetch metadata only
    - Extract *only* the values you need (e.g., num_samples, features, class_distribution, feature types, missingness).
    - Do NOT re-analyse or pretty-print the whole JSON; just store required fields.
    - For any other JSON files, use `read_json(<path>)`.
-3. dataset = load_dataset(analysis['dataset_paths']['base_path'])
-   - train_df = dataset['train'].to_pandas()
-   - test_df  = dataset['test'].to_pandas()
-4. Decide on a model family based on:
-   - data size, feature types, missingness, imbalance (information in `analysis`).
-   - Available models: LogisticRegression, RandomForest, XGBoost, LightGBM, CatBoost, SVM, MLP.
-5. Pre-process:
-   - Impute / drop missing values as needed.
-   - Encode categoricals (unless using CatBoost).
-   - Scale numeric cols for linear/SVM/MLP models.
-   - If class imbalance > 1.5x, use class_weight="balanced" or sampling.
+3. train_df = load_split(dataset_path, 'train')
+   - test_df  = load_split(dataset_path, 'test')
+   - These frames are cached and shared: call `.copy()` before modifying values in place.
+4. Pre-process (shared by every candidate model):
+   - Prefer passing the raw X_train plus `preprocess={...}` (imputation, encoding; `{}` for defaults) to
+     run_tournament / run_cv: each fold is then encoded once and cached for every candidate, instead of
+     re-running imputation/one-hot per fold and per model. Use the same config everywhere.
+   - Otherwise impute / drop missing values and encode categoricals so X_train is numeric. run_tournament /
+     run_cv then compact it themselves (one-hot groups packed into categoricals, narrow dtypes) and reuse
+     each GBDT library's native dataset across folds and candidates; `compact_features(X)` does the same
+     compaction for the final fit and reports the memory saved.
+   - Do NOT scale by hand: linear/SVM/MLP candidates take "scale": True and standardise inside each fit.
+   - If class imbalance > 1.5x, use class_weight="balanced" in candidate params or sampling.
+5. Select the model family and config:
+   - race = run_tournament(X_train, y_train, budget_seconds=600, preprocess=...)  # or the budget the user asked for
+   - Available models: LogisticRegression, RandomForest, XGBoost, LightGBM, CatBoost, SVM, MLP; the default
+     candidates cover all of them. Pass `candidates` only to narrow or extend the grid based on data size,
+     feature types, missingness and imbalance (information in `analysis`).
+   - winner = race['winner']  # {"estimator", "params", "scale", ...}; cite race['leaderboard'] in `reasoning`.
 6. Evaluation protocol:
-   - 5-fold StratifiedKFold.
-   - For each fold, compute accuracy and AUC.
-   - Use `predict_proba` if available else `decision_function` to obtain scores for ROC-AUC.
-7. After CV, fit on full train and evaluate on test_df.
+   - cv = run_cv(X_train, y_train, estimator=winner['estimator'], params=winner['params'], scale=winner['scale'], preprocess=...)
+     runs 5-fold StratifiedKFold with the folds in parallel; X_train / y_train are the step-4 features and labels.
+   - Do NOT write your own fold loops or call `cross_val_score`; run_cv already reports per-fold
+     accuracy and AUC (`cv['folds']`), their means (`cv['cv_scores']`) and out-of-fold scores (`cv['oof_predictions']`).
+   - Leave n_jobs / thread_count unset so run_cv can divide the cores between folds.
+7. After CV, fit the winner on full train (inside `make_pipeline(StandardScaler(), ...)` if winner['scale']) and evaluate on test_df.
+   - Without `preprocess`, GBDT winners can fit on compact_features(X_train)['X'] (XGBoost with `enable_categorical=True`);
+     compact X_test the same way (pd.concat both, compact, split back) so the categories match.
+   - With `preprocess`, enc = encode_features(X_train, config=<same config>, X_test=X_test) gives the encoded
+     enc['X'] / enc['X_test'] and enc['feature_names'] for feature importance.
 8. Build `modeling_report` dict:
    {
      "model": str,
@@ -47,7 +67,10 @@ Workflow (do NOT echo):
      "feature_importance": <dict or list>,
      "notes": str
    }
-9. Save the best model to `models/best_model.pkl`
+9. dataset_name = os.path.basename(os.path.normpath(dataset_path))
+   Save the best model to `models/<dataset_name>/best_model.pkl`, and publish it for serving under the same name:
+   register_model(final_model, X_train_fit, metrics={"cv_auc": ..., "test_auc": ..., "test_accuracy": ...}, name=dataset_name, dataset_path=dataset_path)
+   where X_train_fit is the exact frame the model was fitted on; put the returned `version` in `notes`.
 10. Return `modeling_report`.
 
 
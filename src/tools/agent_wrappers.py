@@ -1,64 +1,139 @@
+import logging
+
 from smolagents import tool
 
+logger = logging.getLogger(__name__)
+
+
+def _stored_context(domain: str):
+    """The stored research summary for ``domain``, or ``None`` when the context agent has to run."""
+    from src.utils import tracing
+    from src.utils.context_store import get_context_store
+
+    store = get_context_store()
+    if not domain or store is None:
+        return None
+    with tracing.span("context_store.lookup", domain=domain) as span:
+        entry = store.get(domain)
+        if span is not None:
+            span.set(hit=entry is not None, **({"matched_domain": entry["domain"]} if entry else {}))
+    if entry is not None:
+        logger.info(f"Reusing the research summary for '{entry['domain']}' (similarity {entry['similarity']}) for '{domain}'")
+        return entry["summary"]
+    return None
+
+
+def _research(message: str, domain: str):
+    """Run the context agent and store its summary under ``domain``."""
+    from src.agents.factory import run_agent
+    from src.utils.context_store import get_context_store
+
+    summary = run_agent("context", message)
+    store = get_context_store()
+    if domain and store is not None and summary:
+        store.put(domain, summary, message)
+    return summary
+
+
 @tool
-def run_global_analysis(message: str) -> str:
-    """Run the global analysis agent and return its output.
+def run_global_analysis(message: str, dataset_path: str) -> str:
+    """Run the global analysis agent on one dataset and return its output.
 
     Args:
         message: The textual instruction or query from the user that should
             be forwarded to the analysis agent.
+        dataset_path: Directory of the dataset to analyse, e.g.
+            'datasets/diabetes-readmission'.
 
     Returns:
         The raw string (usually JSON or a path) produced by the analysis agent.
     """
     # Local import to avoid circular dependencies at module import time.
-    from src.utils.model_setup import setup_model
-    from src.agents.analysis_agent import create_analysis_agent
+    from src.agents.factory import run_agent
 
-    model = setup_model()
-    analysis_agent = create_analysis_agent(model)
-    return analysis_agent.run(message)
+    return run_agent("analysis", message, {"dataset_path": dataset_path})
 
 
 @tool
-def run_modeling(message: str) -> str:
-    """Run the modeling agent and return its output.
+def run_modeling(message: str, dataset_path: str) -> str:
+    """Run the modeling agent on one dataset and return its output.
 
     Args:
         message: The textual instruction or query from the user that should
             be forwarded to the modeling agent.
+        dataset_path: Directory of the dataset to model, the same one that
+            was analysed.
 
     Returns:
         The modeling report (as a JSON-serialisable string) produced by the
         modeling agent.
 
     Note:
-        The modeling agent assumes that a dataset analysis JSON already
-        exists at ``analysis_results/dataset_analysis.json``. If it does not,
-        callers should make sure to run ``run_global_analysis`` first.
+        The modeling agent assumes that an analysis of the dataset already
+        exists at ``analysis_path(dataset_path)``. If it does not, callers
+        should make sure to run ``run_global_analysis`` first.
     """
-    from src.utils.model_setup import setup_model
-    from src.agents.modeling_agent import create_modeling_agent
+    from src.agents.factory import run_agent
 
-    model = setup_model()
-    modeling_agent = create_modeling_agent(model)
-    return modeling_agent.run(message)
+    return run_agent("modeling", message, {"dataset_path": dataset_path})
 
 @tool
-def run_context(message: str) -> str:
+def run_context(message: str, domain: str = "") -> str:
     """Run the context search agent and return its output.
 
+    Research summaries are kept per problem domain: when one was stored for
+    the same or a close ``domain`` and has not gone stale, it is returned
+    without running the agent.
+
     Args:
         message: The textual instruction or query from the user that should
             be forwarded to the context search agent.
+        domain: Short description of the problem domain and task type, e.g.
+            "hospital readmission binary classification"; empty to always run
+            the agent.
 
     Returns:
         A structured summary of relevant research, papers, and methodological
         context related to the user's query.
     """
-    from src.utils.model_setup import setup_model
-    from src.agents.context_agent import create_context_agent
+    stored = _stored_context(domain)
+    return stored if stored is not None else _research(message, domain)
+
+@tool
+def run_analysis_and_context(analysis_message: str, context_message: str, dataset_path: str, domain: str = "") -> dict:
+    """Run the global analysis and context search agents concurrently.
+
+    The two agents do not depend on each other, so they are started together
+    and this call returns once both have finished; wall-clock time is that of
+    the slower one rather than their sum.
+
+    Args:
+        analysis_message: Instruction forwarded to the analysis agent.
+        context_message: Instruction forwarded to the context search agent.
+        dataset_path: Directory of the dataset to analyse.
+        domain: Short description of the problem domain and task type; a
+            stored research summary for it is reused, as in ``run_context``.
+
+    Returns:
+        A dict with the analysis agent's output under ``"analysis"`` and the
+        context agent's summary under ``"context"``.
+    """
+    import contextvars
+    from concurrent.futures import ThreadPoolExecutor
+    from src.agents.factory import run_agent
+
+    analysis_args = {"dataset_path": dataset_path}
+    stored = _stored_context(domain)
+    if stored is not None:
+        return {"analysis": run_agent("analysis", analysis_message, analysis_args), "context": stored}
 
-    model = setup_model()
-    context_agent = create_context_agent(model)
-    return context_agent.run(message)
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="ml-agent-fanout") as pool:
+        # Copy the caller's context so both sub-agents join the current run.
+        analysis = pool.submit(contextvars.copy_context().run, run_agent, "analysis", analysis_message, analysis_args)
+        context = pool.submit(contextvars.copy_context().run, _research, context_message, domain)
+        # Wait for both before surfacing an error from either.
+        errors = [f.exception() for f in (analysis, context)]
+    for error in errors:
+        if error is not None:
+            raise error
+    return {"analysis": analysis.result(), "context": context.result()}
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import threading
+from typing import Dict, List, Tuple
+
+ANALYSIS_ROOT = "analysis_results"
+ANALYSIS_FILENAME = "dataset_analysis.json"
+# Bump whenever the analysis_results schema changes so stale entries are ignored.
+ANALYSIS_SCHEMA_VERSION = 4
+
+_HASH_CHUNK_SIZE = 1 << 20
+_fingerprints: Dict[str, Tuple[tuple, str]] = {}
+_fingerprints_lock = threading.Lock()
+
+
+def _data_files(dataset_path: str) -> List[str]:
+    """Arrow files under ``dataset_path`` (every file if there are none), sorted."""
+    all_files = []
+    for root, dirs, files in os.walk(dataset_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if not name.startswith("."):
+                all_files.append(os.path.join(root, name))
+    arrow_files = [f for f in all_files if f.endswith(".arrow")]
+    return arrow_files or all_files
+
+
+def dataset_fingerprint(dataset_path: str) -> str:
+    """Content hash of the data files of the dataset stored at ``dataset_path``.
+
+    The digest covers each file's path relative to the dataset root and its
+    bytes, so it changes whenever the data does. Results are memoised per
+    process on file sizes and modification times to avoid re-reading large
+    files on every call.
+    """
+    abs_path = os.path.abspath(dataset_path)
+    if not os.path.isdir(abs_path):
+        raise FileNotFoundError(f"Dataset directory not found: {dataset_path}")
+
+    files = _data_files(abs_path)
+    signature = tuple(
+        (os.path.relpath(f, abs_path), os.stat(f).st_size, os.stat(f).st_mtime_ns) for f in files
+    )
+    with _fingerprints_lock:
+        cached = _fingerprints.get(abs_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(os.path.relpath(path, abs_path).encode())
+        digest.update(b"\0")
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    fingerprint = digest.hexdigest()
+
+    with _fingerprints_lock:
+        _fingerprints[abs_path] = (signature, fingerprint)
+    return fingerprint
+
+
+def analysis_store_path(dataset_path: str) -> str:
+    """Location of the cached analysis for the current contents of ``dataset_path``.
+
+    Entries live under ``analysis_results/<fingerprint>-v<schema>/`` so each
+    dataset (and each version of it) gets its own file.
+    """
+    key = f"{dataset_fingerprint(dataset_path)[:32]}-v{ANALYSIS_SCHEMA_VERSION}"
+    return os.path.join(ANALYSIS_ROOT, key, ANALYSIS_FILENAME)
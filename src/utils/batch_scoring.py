@@ -0,0 +1,370 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.utils.cross_validation import available_cores
+
+logger = logging.getLogger(__name__)
+
+PREDICTIONS_ROOT = "predictions"
+DEFAULT_BATCH_ROWS = 64 * 1024
+MANIFEST = "_manifest.json"
+OUTPUT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Memory-mapped input tables this worker process holds open at most at once.
+MAX_WORKER_TABLES = 2
+
+# Per-worker-process caches: memory-mapped input tables (with the size and
+# modification-time signature of their files) and loaded models.
+_worker_tables: "OrderedDict[Tuple[str, Optional[str]], Tuple[List[List[Any]], pa.Table]]" = OrderedDict()
+_worker_models: Dict[Tuple[str, int], Any] = {}
+
+
+@dataclass(frozen=True)
+class Part:
+    """A unit of work: a row range of a memory-mapped table, or one Parquet row group."""
+
+    index: int
+    path: str
+    kind: str  # "table" | "parquet"
+    start: int  # row offset for tables, row group for Parquet
+    rows: int
+
+
+def _is_dataset_dict(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "dataset_dict.json"))
+
+
+def _read_arrow(path: str) -> pa.Table:
+    """Zero-copy table over a memory-mapped Arrow IPC file or stream."""
+    source = pa.memory_map(path)
+    try:
+        return pa.ipc.open_file(source).read_all()
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return pa.ipc.open_stream(source).read_all()
+
+
+def _open_table(path: str, split: Optional[str], cache: bool = True) -> pa.Table:
+    """The table at ``path``; scoring workers keep the last few open, reopening any whose files changed."""
+    key, signature = (path, split), _input_signature(path)
+    cached = _worker_tables.get(key)
+    if cached is not None and cached[0] == signature:
+        _worker_tables.move_to_end(key)
+        return cached[1]
+    if _is_dataset_dict(path):
+        from src.utils.dataset_cache import get_dataset_cache
+
+        table = get_dataset_cache().get(path)[split].with_format("arrow")[:]
+    else:
+        table = _read_arrow(path)
+    if cache:
+        _worker_tables[key] = (signature, table)
+        while len(_worker_tables) > MAX_WORKER_TABLES:
+            _worker_tables.popitem(last=False)
+    return table
+
+
+def _input_files(path: str) -> List[str]:
+    if os.path.isfile(path):
+        return [path]
+    files = [os.path.join(path, name) for name in sorted(os.listdir(path))
+             if not name.startswith(("_", ".")) and os.path.splitext(name)[1].lower() in (".parquet", ".pq", ".arrow", ".feather", ".ipc")]
+    if not files:
+        raise ValueError(f"No Parquet or Arrow files found in {path}")
+    return files
+
+
+def plan_parts(path: str, split: Optional[str] = "test", batch_rows: int = DEFAULT_BATCH_ROWS) -> Tuple[List[Part], List[str]]:
+    """Split the input into parts and return them with the input's column names.
+
+    ``path`` is a saved ``DatasetDict`` (scored split ``split``), a Parquet or
+    Arrow file, or a directory of them. CSV must be ingested first
+    (``POST /upload`` converts it to a ``DatasetDict``).
+    """
+    path = os.path.abspath(path)
+    if os.path.splitext(path)[1].lower() == ".csv":
+        raise ValueError("CSV input is not splittable; upload it first so it is converted to Arrow")
+    parts: List[Part] = []
+    names: Optional[List[str]] = None
+    sources = [path] if _is_dataset_dict(path) else _input_files(path)
+    for source in sources:
+        if os.path.splitext(source)[1].lower() in (".parquet", ".pq"):
+            metadata = pq.ParquetFile(source).metadata
+            names = names or metadata.schema.to_arrow_schema().names
+            for group in range(metadata.num_row_groups):
+                rows = metadata.row_group(group).num_rows
+                if rows:
+                    parts.append(Part(len(parts), source, "parquet", group, rows))
+        else:
+            # Only the row count and columns are needed here, so the parent keeps nothing open.
+            table = _open_table(source, split if source == path and _is_dataset_dict(path) else None, cache=False)
+            names = names or table.column_names
+            for start in range(0, table.num_rows, batch_rows):
+                parts.append(Part(len(parts), source, "table", start, min(batch_rows, table.num_rows - start)))
+    return parts, names or []
+
+
+def _iter_part(job: Dict[str, Any], part: Part) -> Iterator[pa.Table]:
+    batch_rows = job["batch_rows"]
+    if part.kind == "parquet":
+        for batch in pq.ParquetFile(part.path).iter_batches(batch_size=batch_rows, row_groups=[part.start]):
+            yield pa.Table.from_batches([batch])
+    else:
+        split = job["split"] if part.path == job["input"] and _is_dataset_dict(part.path) else None
+        table = _open_table(part.path, split)
+        for offset in range(part.start, part.start + part.rows, batch_rows):
+            yield table.slice(offset, min(batch_rows, part.start + part.rows - offset))
+
+
+def _worker_model(name: str, version: int):
+    from src.utils.model_registry import get_model_registry
+    from src.utils.serving import load_served
+
+    key = (name, version)
+    if key not in _worker_models:
+        _worker_models.clear()  # one job's model at a time per worker
+        _worker_models[key] = load_served(get_model_registry(), name, version)
+    return _worker_models[key]
+
+
+def _predictions(table: pa.Table, proba: np.ndarray, classes: Optional[List[Any]], id_columns: List[str]) -> pa.Table:
+    columns = {name: table.column(name) for name in id_columns}
+    labels = proba.argmax(axis=1)
+    columns["prediction"] = pa.array(labels if classes is None else [classes[i] for i in labels])
+    for j in range(proba.shape[1]):
+        columns[f"proba_{j if classes is None else classes[j]}"] = pa.array(proba[:, j])
+    return pa.table(columns)
+
+
+def part_path(output: str, index: int, fmt: str) -> str:
+    return os.path.join(output, f"part-{index:05d}{OUTPUT_FORMATS[fmt]}")
+
+
+def _score_part(job: Dict[str, Any], part: Part) -> Dict[str, Any]:
+    """Score one part and publish its output file atomically (the checkpoint)."""
+    from threadpoolctl import threadpool_limits
+
+    started = time.perf_counter()
+    served = _worker_model(job["model"], job["version"])
+    target = part_path(job["output"], part.index, job["format"])
+    staging = f"{target}.{os.getpid()}.tmp"
+    writer, sink = None, None
+    try:
+        with threadpool_limits(limits=job["threads"]):
+            for table in _iter_part(job, part):
+                proba = served.predict_frame(served.frame_from_table(table))
+                out = _predictions(table, proba, served.classes, job["id_columns"])
+                if writer is None:
+                    if job["format"] == "parquet":
+                        writer = pq.ParquetWriter(staging, out.schema)
+                    else:
+                        sink = pa.OSFile(staging, "wb")
+                        writer = pa.ipc.new_file(sink, out.schema)
+                writer.write_table(out)
+        writer.close()
+        if sink is not None:
+            sink.close()
+        os.replace(staging, target)
+    except BaseException:
+        if os.path.exists(staging):
+            os.remove(staging)
+        raise
+    return {"part": part.index, "rows": part.rows, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def _score_part_in_worker(job: Dict[str, Any], part: Dict[str, Any]) -> Dict[str, Any]:
+    return _score_part(job, Part(**part))
+
+
+@lru_cache(maxsize=None)
+def get_scoring_pool() -> ProcessPoolExecutor:
+    """Process-wide pool of scoring workers, sized by ``ML_AGENT_SCORING_WORKERS``."""
+    workers = int(os.getenv("ML_AGENT_SCORING_WORKERS", available_cores()))
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["numpy", "pandas", "pyarrow", __name__])
+    return ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context)
+
+
+def _input_signature(path: str) -> List[List[Any]]:
+    """Sizes and modification times of the input files, so a resume never mixes inputs."""
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return [[os.path.basename(path), stat.st_size, stat.st_mtime_ns]]
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        for name in sorted(names):
+            stat = os.stat(os.path.join(root, name))
+            files.append([os.path.relpath(os.path.join(root, name), path), stat.st_size, stat.st_mtime_ns])
+    return files
+
+
+def _load_manifest(output: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(output, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(output: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(output, MANIFEST)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def resolve_within(root: str, path: str) -> str:
+    """``path`` with symlinks resolved, if it lies inside ``root``; otherwise ``ValueError``.
+
+    ``path`` may name an entry of ``root`` (``"diabetes-readmission"``) or be
+    given from the working directory (``"datasets/diabetes-readmission"``).
+    """
+    base = os.path.realpath(root)
+    for candidate in (os.path.realpath(path), os.path.realpath(os.path.join(base, path))):
+        if candidate != base and os.path.commonpath([base, candidate]) == base:
+            return candidate
+    raise ValueError(f"{path} is not inside {root}/")
+
+
+def default_output(model: str, version: int, input_path: str, split: Optional[str]) -> str:
+    stem = os.path.splitext(os.path.basename(os.path.abspath(input_path)))[0]
+    return os.path.join(PREDICTIONS_ROOT, f"{model}-v{version}-{stem}" + (f"-{split}" if split and _is_dataset_dict(input_path) else ""))
+
+
+def score_dataset(
+    model: str,
+    input_path: str,
+    output: Optional[str] = None,
+    version: Optional[int] = None,
+    split: Optional[str] = "test",
+    id_columns: Optional[List[str]] = None,
+    fmt: str = "parquet",
+    workers: Optional[int] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+) -> Dict[str, Any]:
+    """Stream ``input_path`` through a registered model and write one prediction file per part.
+
+    Parts are scored in the scoring worker pool with at most ``2 * workers``
+    in flight, each worker holding the model once and reading its rows from
+    the memory-mapped input, so memory does not grow with the input. Every
+    finished part is published atomically under ``output`` next to a
+    ``_manifest.json``; running the same job again skips the parts already
+    written, so an interrupted job resumes where it stopped.
+    """
+    from src.utils.model_registry import get_model_registry
+
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{fmt}'; use one of {sorted(OUTPUT_FORMATS)}")
+    version = get_model_registry().resolve(model, version)
+    output = output or default_output(model, version, input_path, split)
+    parts, names = plan_parts(input_path, split, batch_rows)
+    missing_ids = [c for c in id_columns or [] if c not in names]
+    if missing_ids:
+        raise ValueError(f"Unknown id columns: {missing_ids}")
+
+    manifest = {
+        "model": model,
+        "version": version,
+        "input": os.path.abspath(input_path),
+        "split": split,
+        "input_signature": _input_signature(os.path.abspath(input_path)),
+        "id_columns": list(id_columns or []),
+        "format": fmt,
+        "batch_rows": batch_rows,
+        "parts": len(parts),
+    }
+    previous = _load_manifest(output)
+    if previous is not None:
+        changed = [k for k in manifest if previous.get(k) != manifest[k]]
+        if changed:
+            raise ValueError(f"{output} holds a different scoring job (differs in {changed}); choose another output")
+    os.makedirs(output, exist_ok=True)
+    _write_manifest(output, {**manifest, "completed": False})
+
+    todo = [p for p in parts if not os.path.exists(part_path(output, p.index, fmt))]
+    workers = max(1, min(workers or available_cores(), len(todo) or 1))
+    job = {**manifest, "output": output, "threads": max(1, available_cores() // workers)}
+    logger.info(f"Scoring {len(todo)}/{len(parts)} parts of {input_path} with {model} v{version} on {workers} workers")
+
+    started = time.perf_counter()
+    done: List[Dict[str, Any]] = []
+    if workers == 1:
+        for part in todo:
+            done.append(_score_part(job, part))
+    else:
+        pool = get_scoring_pool()
+        pending = iter(todo)
+        running: Dict[Future, int] = {}
+        try:
+            while True:
+                # Bounded in-flight work keeps the parent's memory flat too.
+                while len(running) < 2 * workers:
+                    part = next(pending, None)
+                    if part is None:
+                        break
+                    running[pool.submit(_score_part_in_worker, job, asdict(part))] = part.index
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    running.pop(future)
+                    done.append(future.result())
+        finally:
+            for future in running:
+                future.cancel()
+    seconds = time.perf_counter() - started
+
+    rows = sum(p.rows for p in parts)
+    scored = sum(d["rows"] for d in done)
+    summary = {
+        **manifest,
+        "output": output,
+        "rows": rows,
+        "parts_scored": len(done),
+        "parts_resumed": len(parts) - len(todo),
+        "rows_scored": scored,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(scored / seconds, 1) if seconds > 0 else None,
+        "workers": workers,
+    }
+    del summary["input_signature"]
+    _write_manifest(output, {**manifest, "completed": True})
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Score a dataset with a registered model.")
+    parser.add_argument("model", help="Registry name of the model")
+    parser.add_argument("input", help="Saved DatasetDict directory, Parquet/Arrow file, or directory of them")
+    parser.add_argument("--output", help=f"Output directory (default: {PREDICTIONS_ROOT}/<model>-v<version>-<input>)")
+    parser.add_argument("--version", type=int, help="Model version (default: latest)")
+    parser.add_argument("--split", default="test", help="Split to score for a DatasetDict input")
+    parser.add_argument("--id-column", action="append", default=[], dest="id_columns", help="Input column to copy to the output (repeatable)")
+    parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default="parquet")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    summary = score_dataset(
+        args.model, args.input, output=args.output, version=args.version, split=args.split,
+        id_columns=args.id_columns, fmt=args.format, workers=args.workers, batch_rows=args.batch_rows,
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
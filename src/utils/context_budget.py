@@ -0,0 +1,184 @@
+import os
+from typing import Any, Dict, List
+
+from smolagents import ActionStep, LiteLLMModel
+
+CACHE_CONTROL = {"type": "ephemeral"}
+DEFAULT_CONTEXT_TOKENS = 12000
+KEEP_RECENT_STEPS = 2
+# Compaction brings the step memory down to this fraction of the budget, so
+# it happens in occasional jumps and the prompt prefix stays cacheable between them.
+LOW_WATER = 0.6
+# (head, tail) characters kept of an old step's observation and model output at
+# each compaction level; None leaves it as is. Level 2 is only reached when
+# excerpting the observations alone does not fit the budget.
+LEVELS = (
+    {"observations": (700, 300), "model_output": None},
+    {"observations": (150, 50), "model_output": (300, 100)},
+)
+ELIDED = "\n[... {count} characters elided to keep the context short ...]\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English and code)."""
+    return len(text) // 4
+
+
+def prompt_caching_enabled(model_id: str) -> bool:
+    """Anthropic models accept ``cache_control``; off when ``ML_AGENT_PROMPT_CACHE=0``."""
+    if os.getenv("ML_AGENT_PROMPT_CACHE", "1") == "0":
+        return False
+    return "claude" in model_id or model_id.startswith("anthropic/")
+
+
+def _with_breakpoint(message: Dict[str, Any]) -> Dict[str, Any]:
+    content = message.get("content")
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    if not content:
+        return message
+    # Copy the block: the message list shares its dicts with the agent's memory.
+    return {**message, "content": [*content[:-1], {**content[-1], "cache_control": CACHE_CONTROL}]}
+
+
+def mark_cache_breakpoints(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Mark the system prompt and the newest message as prompt-cache breakpoints.
+
+    The system prompt (with the tool descriptions) is the same for every call
+    of an agent; the breakpoint on the newest message lets the next step read
+    the whole conversation so far from the provider's cache and pay only for
+    what it appends.
+    """
+    if not messages:
+        return messages
+    marked = list(messages)
+    if marked[0].get("role") == "system":
+        marked[0] = _with_breakpoint(marked[0])
+    if len(marked) > 1:
+        marked[-1] = _with_breakpoint(marked[-1])
+    return marked
+
+
+def usage_attributes(response) -> Dict[str, Any]:
+    """Token, cache, retry and cost figures of a LiteLLM response, as span attributes."""
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    hidden = getattr(response, "_hidden_params", None) or {}
+    headers = hidden.get("additional_headers") or {}
+    return {
+        "gen_ai.usage.input_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "gen_ai.usage.output_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "llm.cached_input_tokens": (getattr(usage, "cache_read_input_tokens", None)
+                                    or getattr(details, "cached_tokens", None) or 0),
+        "llm.cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "llm.retries": int(headers.get("x-litellm-attempted-retries") or 0),
+        "llm.cost_usd": float(hidden.get("response_cost") or 0.0),
+    }
+
+
+class PromptCachingLiteLLMModel(LiteLLMModel):
+    """:class:`LiteLLMModel` that asks the provider to cache the stable prompt prefix.
+
+    Each request is also traced as an ``llm.request`` span with its token
+    counts (including cached input tokens), retries and cost. Requests are
+    sent through ``http_handler`` (a LiteLLM ``HTTPHandler``) when one is
+    given, so models can share its connection pool.
+    """
+
+    def __init__(self, *args, http_handler: Any = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.http_handler = http_handler
+
+    def generate(self, *args, **kwargs):
+        from src.utils import tracing
+
+        with tracing.span("llm.request", kind=tracing.SPAN_KIND_CLIENT, **{"gen_ai.request.model": self.model_id}) as span:
+            response = super().generate(*args, **kwargs)
+            if span is not None:
+                span.set(**usage_attributes(response.raw))
+            return response
+
+    def _prepare_completion_kwargs(self, *args, **kwargs) -> Dict[str, Any]:
+        completion_kwargs = super()._prepare_completion_kwargs(*args, **kwargs)
+        if prompt_caching_enabled(self.model_id):
+            completion_kwargs["messages"] = mark_cache_breakpoints(completion_kwargs["messages"])
+        if self.http_handler is not None:
+            completion_kwargs["client"] = self.http_handler
+        return completion_kwargs
+
+
+def excerpt(text: str, head: int, tail: int) -> str:
+    if len(text) <= head + tail + len(ELIDED):
+        return text
+    return text[:head] + ELIDED.format(count=len(text) - head - tail) + text[-tail:]
+
+
+class MemoryCompactor:
+    """Step callback that keeps an agent's step memory under a token budget.
+
+    Every step resends the memory of all previous steps, and observations
+    (search results, dataset dumps) dominate it. Once the memory of an agent
+    exceeds ``budget`` tokens, its oldest steps are cut down, oldest first,
+    until it is back under ``LOW_WATER`` of the budget: first their
+    observations are reduced to a head/tail excerpt, then, if that is not
+    enough, to a short stub along with their model output (see ``LEVELS``).
+    The newest ``keep_recent`` steps are never touched. A step is only cut
+    again at a deeper level, so the compacted prefix stays byte-identical
+    (and cacheable) between compactions.
+    """
+
+    def __init__(self, budget: int = DEFAULT_CONTEXT_TOKENS, keep_recent: int = KEEP_RECENT_STEPS):
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.compacted_steps = 0
+        self.elided_chars = 0
+        self._levels: Dict[int, int] = {}  # id(step) -> compaction level applied
+
+    def attach(self, agent):
+        agent.step_callbacks.register(ActionStep, self)
+        return agent
+
+    @staticmethod
+    def _tokens(step: ActionStep) -> int:
+        """Tokens the step adds to every later prompt, as rendered by ``ActionStep.to_messages``."""
+        text = (step.model_output or "") + (step.observations or "")
+        if step.tool_calls:
+            text += str([call.dict() for call in step.tool_calls])
+        if step.error is not None:
+            text += str(step.error)
+        return estimate_tokens(text)
+
+    def _compact(self, step: ActionStep, level: int) -> None:
+        for field, keep in LEVELS[level].items():
+            text = getattr(step, field)
+            if keep is not None and text:
+                cut = excerpt(text, *keep)
+                self.elided_chars += len(text) - len(cut)
+                setattr(step, field, cut)
+        self.compacted_steps += id(step) not in self._levels
+        self._levels[id(step)] = level
+
+    def __call__(self, step: ActionStep, agent=None) -> None:
+        if agent is None or self.budget <= 0:
+            return
+        steps = [s for s in agent.memory.steps if isinstance(s, ActionStep)]
+        if not any(s is step for s in steps):
+            steps.append(step)  # callbacks run before the step joins the memory
+        total = sum(self._tokens(s) for s in steps)
+        if total <= self.budget:
+            return
+        older = steps[:-self.keep_recent] if self.keep_recent else steps
+        for level in range(len(LEVELS)):
+            for old in older:
+                if total <= self.budget * LOW_WATER:
+                    return
+                if self._levels.get(id(old), -1) >= level:
+                    continue
+                before = self._tokens(old)
+                self._compact(old, level)
+                total -= before - self._tokens(old)
+
+
+def memory_compactor() -> MemoryCompactor:
+    """A compactor sized by ``ML_AGENT_CONTEXT_TOKENS`` (``0`` disables compaction)."""
+    return MemoryCompactor(budget=int(os.getenv("ML_AGENT_CONTEXT_TOKENS", DEFAULT_CONTEXT_TOKENS)))
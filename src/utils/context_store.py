@@ -0,0 +1,114 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from src.utils.search import normalize_query
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_STORE_ROOT = "context_store"
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MIN_SIMILARITY = 0.75
+
+
+def domain_key(domain: str) -> str:
+    """Normalized key of a problem domain and task type (see :func:`normalize_query`)."""
+    return normalize_query(domain)
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard overlap of the words of two domain keys."""
+    left, right = set(a.split()), set(b.split())
+    return len(left & right) / len(left | right) if left | right else 0.0
+
+
+class ContextStore:
+    """Research summaries of the context agent, kept per problem domain.
+
+    Each summary is a JSON file under ``<root>/<hash of the domain key>.json``,
+    written atomically. A lookup returns the summary of the same domain key,
+    or failing that of the closest stored domain whose words overlap the
+    requested one by at least ``min_similarity``. Summaries older than
+    ``ttl`` seconds are stale: they are never returned and get replaced by
+    the next run of the context agent.
+    """
+
+    def __init__(self, root: str = CONTEXT_STORE_ROOT, ttl: float = DEFAULT_TTL_SECONDS,
+                 min_similarity: float = DEFAULT_MIN_SIMILARITY):
+        self.root = root
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{hashlib.sha256(key.encode()).hexdigest()[:32]}.json")
+
+    def _fresh(self, entry: Dict[str, Any]) -> bool:
+        return not self.ttl or time.time() - entry.get("created_at", 0) <= self.ttl
+
+    def _entries(self):
+        try:
+            names = sorted(os.listdir(self.root))
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".json") and not name.startswith("."):
+                try:
+                    with open(os.path.join(self.root, name)) as f:
+                        yield json.load(f)
+                except (OSError, ValueError):
+                    continue
+
+    def get(self, domain: str) -> Optional[Dict[str, Any]]:
+        """The freshest matching entry (``domain``, ``key``, ``summary``, ``created_at``, ``similarity``), if any."""
+        key = domain_key(domain)
+        if not key:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+            if self._fresh(entry):
+                return {**entry, "similarity": 1.0}
+        except (OSError, ValueError):
+            pass
+        scored = [(similarity(key, entry.get("key", "")), entry) for entry in self._entries() if self._fresh(entry)]
+        score, entry = max(scored, key=lambda item: item[0], default=(0.0, None))
+        return {**entry, "similarity": round(score, 3)} if entry is not None and score >= self.min_similarity else None
+
+    def put(self, domain: str, summary: Any, message: str = "") -> None:
+        key = domain_key(domain)
+        if not key:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        data = json.dumps({"domain": domain, "key": key, "message": message, "summary": summary,
+                           "created_at": time.time()}, default=str)
+        path = self._path(key)
+        fd, staging = tempfile.mkstemp(prefix=".", dir=self.root)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            os.replace(staging, path)
+        except BaseException:
+            try:
+                os.remove(staging)
+            except OSError:
+                pass
+            raise
+
+
+@lru_cache(maxsize=None)
+def get_context_store() -> Optional[ContextStore]:
+    """The process-wide store under ``ML_AGENT_CONTEXT_STORE_DIR``, or ``None`` if
+    ``ML_AGENT_CONTEXT_STORE`` is ``off``; staleness is ``ML_AGENT_CONTEXT_STORE_TTL``
+    seconds and closeness ``ML_AGENT_CONTEXT_STORE_SIMILARITY`` (1 for exact matches only)."""
+    if os.getenv("ML_AGENT_CONTEXT_STORE", "on").lower() in ("0", "off", "false"):
+        return None
+    return ContextStore(
+        root=os.getenv("ML_AGENT_CONTEXT_STORE_DIR", CONTEXT_STORE_ROOT),
+        ttl=float(os.getenv("ML_AGENT_CONTEXT_STORE_TTL", DEFAULT_TTL_SECONDS)),
+        min_similarity=float(os.getenv("ML_AGENT_CONTEXT_STORE_SIMILARITY", DEFAULT_MIN_SIMILARITY)),
+    )
@@ -0,0 +1,460 @@
+import importlib
+import inspect
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from smolagents import tool
+
+TARGET_COLUMN = "__cv_target__"
+
+# Model families named in the modeling prompt: import path, the constructor
+# argument that sets the estimator's own thread count, and quiet defaults (no
+# training logs written to disk).
+ESTIMATORS: Dict[str, Tuple[str, Optional[str], Dict[str, Any]]] = {
+    "LogisticRegression": ("sklearn.linear_model.LogisticRegression", None, {"max_iter": 1000}),
+    "RandomForest": ("sklearn.ensemble.RandomForestClassifier", "n_jobs", {}),
+    "XGBoost": ("xgboost.XGBClassifier", "n_jobs", {}),
+    "LightGBM": ("lightgbm.LGBMClassifier", "n_jobs", {"verbose": -1}),
+    "CatBoost": ("catboost.CatBoostClassifier", "thread_count", {"verbose": False, "allow_writing_files": False}),
+    "SVM": ("sklearn.svm.SVC", None, {}),
+    "MLP": ("sklearn.neural_network.MLPClassifier", None, {}),
+}
+ALLOWED_PREFIXES = ("sklearn.", "xgboost.", "lightgbm.", "catboost.")
+
+# Per-worker copy of the data of the current run, loaded once per process.
+_worker_data: Dict[str, Tuple[pd.DataFrame, pd.Series]] = {}
+# Memory-mapped preprocessed matrices (see preprocessing_cache) by entry path,
+# and one-hot expansions of compact frames by data key.
+_worker_features: Dict[Any, Any] = {}
+MAX_WORKER_FEATURES = 4
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def family_name(name: str) -> Optional[str]:
+    """Canonical :data:`ESTIMATORS` key for ``name``, or ``None`` for class paths."""
+    return next((family for family in ESTIMATORS if family.lower() == name.lower()), None)
+
+
+def resolve_estimator(name: str) -> Tuple[type, Optional[str], Dict[str, Any]]:
+    """Map a family name (e.g. ``'LightGBM'``) or dotted class path to its class."""
+    for family, spec in ESTIMATORS.items():
+        if name.lower() == family.lower():
+            path, thread_param, defaults = spec
+            break
+    else:
+        if not name.startswith(ALLOWED_PREFIXES):
+            raise ValueError(
+                f"Unknown estimator '{name}'. Use one of {sorted(ESTIMATORS)} "
+                f"or a class path under {ALLOWED_PREFIXES}"
+            )
+        path, thread_param, defaults = name, None, {}
+    module_name, _, class_name = path.rpartition(".")
+    cls = getattr(importlib.import_module(module_name), class_name)
+    if path == name and "n_jobs" in inspect.signature(cls).parameters:
+        thread_param = "n_jobs"
+    return cls, thread_param, defaults
+
+
+def estimator_params(estimator: str, params: Optional[Dict[str, Any]], seed: int) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Full constructor params (family defaults, then ``params``, then the seed) and the thread param."""
+    cls, thread_param, defaults = resolve_estimator(estimator)
+    params = {**defaults, **(params or {})}
+    if "random_state" in inspect.signature(cls).parameters:
+        params.setdefault("random_state", seed)
+    return params, thread_param
+
+
+def plan_parallelism(thread_param: Optional[str], params: Dict[str, Any], n_splits: int, cores: int) -> Tuple[int, int]:
+    """Split ``cores`` between concurrent folds and threads inside each fit.
+
+    An explicit thread count in ``params`` is respected (``-1`` meaning every
+    core) and fewer folds run at once; otherwise folds fan out first and any
+    leftover cores are handed to each fit. Returns ``(concurrent_folds,
+    threads_per_fold)``.
+    """
+    requested = params.get(thread_param) if thread_param else None
+    if requested is not None:
+        threads = cores if requested < 0 else max(1, int(requested))
+    else:
+        threads = max(1, cores // min(n_splits, cores))
+    return max(1, min(n_splits, cores // threads)), threads
+
+
+@lru_cache(maxsize=None)
+def get_cv_pool() -> ProcessPoolExecutor:
+    """Process-wide pool of CV workers, sized by ``ML_AGENT_CV_WORKERS``.
+
+    Workers come from a fork server, which is safe to use from the API's
+    threads, and stay alive between calls so imports are paid once.
+    """
+    workers = int(os.getenv("ML_AGENT_CV_WORKERS", available_cores()))
+    context = multiprocessing.get_context("forkserver")
+    # Imported once in the server; every worker forks with them already loaded.
+    context.set_forkserver_preload(["numpy", "pandas", "pyarrow", "sklearn.metrics", __name__])
+    return ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context)
+
+
+def _positive_scores(estimator, X: pd.DataFrame) -> np.ndarray:
+    if hasattr(estimator, "predict_proba"):
+        scores = estimator.predict_proba(X)
+    else:
+        scores = estimator.decision_function(X)
+    scores = np.asarray(scores, dtype=np.float64)
+    return scores[:, 1] if scores.ndim == 2 and scores.shape[1] == 2 else scores
+
+
+def _task_features(X: pd.DataFrame, task: Dict[str, Any]):
+    """The frame to fit on: raw, a cached preprocessed matrix, or a compact frame's one-hot expansion."""
+    if task.get("features") is not None:
+        key = task["features"]
+    elif task.get("expand"):
+        key = ("expanded", task["data_key"])
+    else:
+        return X
+    if key not in _worker_features:
+        if len(_worker_features) >= MAX_WORKER_FEATURES:
+            _worker_features.clear()
+        if task.get("features") is not None:
+            from src.utils.preprocessing_cache import load_entry
+
+            _worker_features[key] = load_entry(task["features"])[0]
+        else:
+            from src.utils.feature_matrix import expand_categoricals
+
+            _worker_features[key] = expand_categoricals(X)
+    return _worker_features[key]
+
+
+def _rows(X, idx: np.ndarray):
+    return X.iloc[idx] if isinstance(X, pd.DataFrame) else X[idx]
+
+
+def _fit_fold(X: pd.DataFrame, y: pd.Series, task: Dict[str, Any]) -> Dict[str, Any]:
+    from scipy.sparse import issparse
+    from sklearn.metrics import accuracy_score
+    from threadpoolctl import threadpool_limits
+
+    X = _task_features(X, task)
+    cls, _, _ = resolve_estimator(task["estimator"])
+    train_idx, valid_idx = task["train_idx"], task["valid_idx"]
+    started, cpu_started = time.perf_counter(), time.process_time()
+    # Caps BLAS/OpenMP pools too, so concurrent folds don't oversubscribe cores.
+    with threadpool_limits(limits=task["threads"]):
+        if task.get("native"):
+            from src.utils.feature_matrix import fit_predict_native
+
+            predictions, y_valid = fit_predict_native(
+                family_name(task["estimator"]), task["params"], X, y, train_idx, valid_idx, task["data_key"]
+            )
+            fit_seconds = time.perf_counter() - started
+            labels = predictions.argmax(axis=1) if predictions.ndim == 2 else (predictions >= 0.5).astype(int)
+            accuracy = accuracy_score(y_valid, labels)
+            return _fold_result(task, accuracy, y_valid, predictions, fit_seconds, time.process_time() - cpu_started)
+        estimator = cls(**task["params"])
+        if task.get("scale"):
+            from sklearn.pipeline import make_pipeline
+            from sklearn.preprocessing import StandardScaler
+
+            estimator = make_pipeline(StandardScaler(with_mean=not issparse(X)), estimator)
+        estimator.fit(_rows(X, train_idx), y.iloc[train_idx])
+        fit_seconds = time.perf_counter() - started
+        X_valid, y_valid = _rows(X, valid_idx), y.iloc[valid_idx]
+        predictions = _positive_scores(estimator, X_valid)
+        accuracy = accuracy_score(y_valid, estimator.predict(X_valid))
+    return _fold_result(task, accuracy, y_valid, predictions, fit_seconds, time.process_time() - cpu_started)
+
+
+def _fold_result(task, accuracy, y_valid, predictions: np.ndarray, fit_seconds: float, cpu_seconds: float) -> Dict[str, Any]:
+    from sklearn.metrics import roc_auc_score
+
+    try:
+        auc = roc_auc_score(y_valid, predictions, multi_class="ovr") if predictions.ndim == 2 else roc_auc_score(y_valid, predictions)
+    except ValueError:
+        auc = None  # e.g. a single class in the fold, or non-probability multiclass scores
+    return {
+        "id": task["id"],
+        "accuracy": float(accuracy),
+        "auc": None if auc is None else float(auc),
+        "fit_seconds": round(fit_seconds, 3),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "predictions": predictions,
+    }
+
+
+def _fit_fold_in_worker(data_path: str, task: Dict[str, Any]) -> Dict[str, Any]:
+    if data_path not in _worker_data:
+        # Memory-mapped and converted column by column: null-free numeric columns
+        # stay read-only views of the shared page cache, the rest are copied.
+        table = pa.ipc.open_file(pa.memory_map(data_path)).read_all()
+        frame = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
+        y = frame.pop(TARGET_COLUMN)
+        _worker_data.clear()
+        _worker_data[data_path] = (frame, y)
+    X, y = _worker_data[data_path]
+    return _fit_fold(X, y, task)
+
+
+def _write_shared(X: pd.DataFrame, y: pd.Series, directory: str) -> str:
+    path = os.path.join(directory, "data.arrow")
+    try:
+        table = pa.Table.from_pandas(X.assign(**{TARGET_COLUMN: y.to_numpy()}), preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise ValueError(f"X must have string column names and consistently typed columns: {str(e)}")
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path
+
+
+def cross_validate(
+    X: pd.DataFrame,
+    y: Any,
+    estimator: str,
+    params: Optional[Dict[str, Any]] = None,
+    n_splits: int = 5,
+    seed: int = 42,
+    scale: bool = False,
+    preprocess: Optional[Dict[str, Any]] = None,
+    compact: bool = True,
+) -> Dict[str, Any]:
+    """Stratified k-fold CV with the folds fitted concurrently in worker processes.
+
+    With ``preprocess`` (a :data:`preprocessing_cache.DEFAULT_PREPROCESSING`
+    override, ``{}`` for the defaults), each fold's transformers are fitted on
+    its training rows once and cached, and every later call on the same data
+    and folds reuses the encoded matrices instead of re-encoding. Otherwise,
+    with ``compact``, the frame is shrunk by :func:`compact_tasks` first.
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    X = X.reset_index(drop=True)
+    y = pd.Series(np.asarray(y)).reset_index(drop=True)
+    if len(X) != len(y):
+        raise ValueError(f"X has {len(X)} rows but y has {len(y)}")
+
+    params, thread_param = estimator_params(estimator, params, seed)
+    cores = available_cores()
+    concurrency, threads = plan_parallelism(thread_param, params, n_splits, cores)
+    if thread_param:
+        params[thread_param] = threads
+
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    tasks = [
+        {"id": i, "estimator": estimator, "params": params, "threads": threads, "scale": scale,
+         "train_idx": train_idx, "valid_idx": valid_idx}
+        for i, (train_idx, valid_idx) in enumerate(splitter.split(np.zeros(len(y)), y))
+    ]
+
+    started = time.perf_counter()
+    entries = report = None
+    if preprocess is None and compact:
+        X, report = compact_tasks(X, tasks)
+    if preprocess is not None:
+        from src.utils.preprocessing_cache import frame_fingerprint, get_preprocessing_cache
+
+        cache, fingerprint = get_preprocessing_cache(), frame_fingerprint(X)
+        entries = [
+            cache.get_or_fit(X, task["train_idx"], f"{n_splits}fold-seed{seed}-{task['id']}", preprocess, fingerprint)
+            for task in tasks
+        ]
+        for task, entry in zip(tasks, entries):
+            task["features"] = entry
+        X = X[[]]  # workers only need the labels now
+    with shared_data(X, y, concurrency) as data_path:
+        results = fit_tasks(X, y, tasks, concurrency, data_path)
+    wall_seconds = time.perf_counter() - started
+
+    folds = [{"fold": r.pop("id"), **r} for r in sorted(results, key=lambda r: r["id"])]
+    first = folds[0]["predictions"]
+    oof = np.zeros((len(y),) + first.shape[1:], dtype=np.float64)
+    for task, fold in zip(tasks, folds):
+        oof[task["valid_idx"]] = fold.pop("predictions")
+
+    def summarise(metric: str, reduce) -> Optional[float]:
+        values = [f[metric] for f in folds if f[metric] is not None]
+        return float(reduce(values)) if values else None
+
+    return {
+        "estimator": estimator,
+        "params": dict(params),
+        "scale": scale,
+        "n_splits": n_splits,
+        "folds": folds,
+        "cv_scores": {"accuracy": summarise("accuracy", np.mean), "auc": summarise("auc", np.mean)},
+        "cv_std": {"accuracy": summarise("accuracy", np.std), "auc": summarise("auc", np.std)},
+        "oof_predictions": oof,
+        "wall_seconds": round(wall_seconds, 3),
+        "parallelism": {"concurrent_folds": concurrency, "threads_per_fold": threads},
+        "preprocessing": None if entries is None else {"config": preprocess, "entries": entries},
+        "compaction": report,
+    }
+
+
+def compact_tasks(X: pd.DataFrame, tasks: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Compact ``X`` (see :func:`feature_matrix.compact_frame`) and route each task to use it.
+
+    GBDT families fit on row slices of their native dataset, built once per
+    process from the compact frame; everything else gets the compact frame with
+    packed categoricals expanded back to uint8 one-hot columns, also once per
+    process.
+    """
+    from src.utils.feature_matrix import NATIVE_BACKENDS, compact_frame
+    from src.utils.preprocessing_cache import frame_fingerprint
+
+    X, report = compact_frame(X)
+    data_key = frame_fingerprint(X)
+    for task in tasks:
+        task["data_key"] = data_key
+        if family_name(task["estimator"]) in NATIVE_BACKENDS:
+            task["native"] = True
+        else:
+            task["expand"] = True
+    return X, report
+
+
+@contextmanager
+def shared_data(X: pd.DataFrame, y: pd.Series, concurrency: int) -> Iterator[Optional[str]]:
+    """Publish ``X``/``y`` to worker processes for the duration of the block.
+
+    Yields the path of a temporary Arrow file, or ``None`` when everything will
+    run in this process anyway.
+    """
+    if concurrency == 1:
+        yield None
+        return
+    directory = tempfile.mkdtemp(prefix="ml-agent-cv-")
+    try:
+        yield _write_shared(X, y, directory)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def fit_tasks(
+    X: pd.DataFrame,
+    y: pd.Series,
+    tasks: List[Dict[str, Any]],
+    concurrency: int,
+    data_path: Optional[str] = None,
+    deadline: Optional[float] = None,
+    raise_errors: bool = True,
+) -> List[Dict[str, Any]]:
+    """Fit and score ``tasks`` with at most ``concurrency`` running at once.
+
+    Each task names an estimator, its params and thread count, and the row
+    indices to train and validate on. Tasks run in the CV worker pool when
+    ``data_path`` (from :func:`shared_data`) is given, otherwise in this
+    process. No new task starts after ``deadline`` (a ``time.perf_counter()``
+    value); those tasks, and failed ones when ``raise_errors`` is false, are
+    reported as ``{"id": ..., "error": ...}``. Results come back in completion order.
+    """
+    results: List[Dict[str, Any]] = []
+
+    def expired() -> bool:
+        return deadline is not None and time.perf_counter() >= deadline
+
+    def skip(task) -> None:
+        results.append({"id": task["id"], "error": "skipped: budget exhausted"})
+
+    if data_path is None:
+        for task in tasks:
+            if expired():
+                skip(task)
+                continue
+            try:
+                results.append(_fit_fold(X, y, task))
+            except Exception as e:
+                if raise_errors:
+                    raise
+                results.append({"id": task["id"], "error": str(e)})
+        return results
+
+    pool = get_cv_pool()
+    pending = iter(tasks)
+    running: Dict[Future, Any] = {}
+    try:
+        while True:
+            while len(running) < concurrency:
+                task = next(pending, None)
+                if task is None:
+                    break
+                if expired():
+                    skip(task)
+                    continue
+                running[pool.submit(_fit_fold_in_worker, data_path, task)] = task["id"]
+            if not running:
+                return results
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_id = running.pop(future)
+                try:
+                    results.append(future.result())
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    if raise_errors:
+                        raise
+                    results.append({"id": task_id, "error": str(e)})
+    except BrokenProcessPool:
+        get_cv_pool.cache_clear()
+        raise RuntimeError("A cross-validation worker died (out of memory?); the pool will be recreated")
+    finally:
+        for future in running:
+            future.cancel()
+
+
+@tool
+def run_cv(
+    X: pd.DataFrame,
+    y: Any,
+    estimator: str,
+    params: Optional[Dict[str, Any]] = None,
+    n_splits: int = 5,
+    seed: int = 42,
+    scale: bool = False,
+    preprocess: Optional[Dict[str, Any]] = None,
+    compact: bool = True,
+) -> Dict[str, Any]:
+    """Run stratified k-fold cross-validation with all folds trained in parallel.
+
+    Folds run in separate worker processes across all cores, and each fit's own
+    threads (n_jobs / thread_count) are sized so cores are not oversubscribed,
+    so a 5-fold run takes roughly as long as a single fit. Use this instead of
+    writing CV loops or `cross_val_score`.
+
+    Args:
+        X: Pre-processed feature frame (string column names), or the raw frame when `preprocess` is given. Categorical columns are fine for CatBoost/LightGBM if `params` declares them.
+        y: Target labels aligned with `X`.
+        estimator: Model family ('LogisticRegression', 'RandomForest', 'XGBoost', 'LightGBM', 'CatBoost', 'SVM', 'MLP') or a class path such as 'sklearn.ensemble.ExtraTreesClassifier'.
+        params: Constructor keyword arguments for the estimator.
+        n_splits: Number of StratifiedKFold folds. Defaults to 5.
+        seed: Seed for the fold shuffle and the estimator's `random_state`.
+        scale: Standardise features inside each fold before fitting (for LogisticRegression, SVM, MLP).
+        preprocess: Pass raw features and a preprocessing config (overrides for `encode_features`' defaults, `{}` for the defaults) to have imputation/encoding fitted per fold on its training rows and cached; later calls with other estimators reuse the encoded folds.
+        compact: Without `preprocess`, pack one-hot groups into categoricals and downcast dtypes first (see `compact_features`); XGBoost/LightGBM/CatBoost then fit on their native datasets, built once and sliced per fold. Defaults to True.
+
+    Returns:
+        A dict with `folds` (per-fold `accuracy`, `auc`, `fit_seconds`, `cpu_seconds`), mean `cv_scores`
+        and `cv_std` ({"accuracy", "auc"}), `oof_predictions` (out-of-fold positive-class
+        scores, aligned with the rows of `X`), the final `params`, `wall_seconds`, `parallelism`
+        and `compaction` (bytes and columns before/after, or None).
+    """
+    return cross_validate(
+        X, y, estimator, params=params, n_splits=n_splits, seed=seed, scale=scale, preprocess=preprocess, compact=compact
+    )
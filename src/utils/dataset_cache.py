@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict
+
+import pandas as pd
+from datasets import DatasetDict, load_from_disk
+
+DEFAULT_MAX_BYTES = 4 << 30
+
+
+@dataclass
+class _Entry:
+    signature: tuple
+    dataset: DatasetDict
+    frames: Dict[str, pd.DataFrame] = field(default_factory=dict)
+    nbytes: int = 0
+
+
+def _signature(path: str) -> tuple:
+    """Sizes and modification times of every file of a saved dataset."""
+    entries = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            entries.append((os.path.relpath(os.path.join(root, name), path), stat.st_size, stat.st_mtime_ns))
+    return tuple(entries)
+
+
+class DatasetCache:
+    """Process-wide LRU cache of memory-mapped ``DatasetDict`` handles.
+
+    Entries are keyed by absolute path and invalidated when any file under the
+    dataset directory changes size or modification time. Each entry also keeps
+    the pandas frame of every split that was asked for, so repeated
+    ``to_pandas()`` calls are paid once. The least recently used entries are
+    evicted once the cached Arrow data and frames exceed ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, path: str) -> DatasetDict:
+        return self._entry(path).dataset
+
+    def frame(self, path: str, split: str) -> pd.DataFrame:
+        """Return a pandas view of ``split``, materialised once per process.
+
+        The caller receives a shallow copy, so adding or dropping columns does
+        not leak into the cached frame; the underlying buffers are shared.
+        """
+        with self._lock:
+            entry = self._entry(path)
+            frame = entry.frames.get(split)
+            if frame is None:
+                if not isinstance(entry.dataset, DatasetDict) or split not in entry.dataset:
+                    raise KeyError(f"Unknown split '{split}' in {path}")
+                # Arrow-formatted slicing is zero-copy; split_blocks avoids
+                # consolidating columns into one big block.
+                table = entry.dataset[split].with_format("arrow")[:]
+                frame = table.to_pandas(split_blocks=True)
+                entry.frames[split] = frame
+                entry.nbytes += int(frame.memory_usage(index=True, deep=False).sum())
+                self._evict()
+            return frame.copy(deep=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": sum(e.nbytes for e in self._entries.values())}
+
+    def _entry(self, path: str) -> _Entry:
+        key = os.path.abspath(path)
+        signature = _signature(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                return entry
+            dataset = load_from_disk(key)
+            entry = _Entry(
+                signature=signature,
+                dataset=dataset,
+                nbytes=sum(
+                    split.data.nbytes
+                    for split in (dataset.values() if isinstance(dataset, DatasetDict) else [dataset])
+                ),
+            )
+            self._entries[key] = entry
+            self._evict()
+            return entry
+
+    def _evict(self) -> None:
+        total = sum(e.nbytes for e in self._entries.values())
+        # Always keep the most recently used entry, even if it alone is too big.
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            total -= evicted.nbytes
+
+
+@lru_cache(maxsize=None)
+def get_dataset_cache() -> DatasetCache:
+    """Return the process-wide cache, bounded by ``ML_AGENT_DATASET_CACHE_BYTES``."""
+    return DatasetCache(max_bytes=int(os.getenv("ML_AGENT_DATASET_CACHE_BYTES", DEFAULT_MAX_BYTES)))
@@ -0,0 +1,306 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from smolagents import tool
+
+# One-hot columns are named "<feature><sep><level>", e.g. "race_Caucasian" (pd.get_dummies).
+ONE_HOT_SEPARATORS = ("_", ":", "=")
+# Model families with a native binned dataset that can be built once and sliced per fold.
+NATIVE_BACKENDS = {"LightGBM": "lightgbm", "XGBoost": "xgboost", "CatBoost": "catboost"}
+MAX_NATIVE_DATASETS = 4
+
+
+def _is_binary(column: pd.Series) -> bool:
+    if pd.api.types.is_bool_dtype(column):
+        return True
+    if not pd.api.types.is_numeric_dtype(column):
+        return False
+    values = column.to_numpy()
+    return bool(np.isin(values[~pd.isna(values)], (0, 1)).all())
+
+
+def one_hot_groups(df: pd.DataFrame, separators: Sequence[str] = ONE_HOT_SEPARATORS) -> Dict[str, List[str]]:
+    """Groups of 0/1 columns sharing a ``<feature><sep>`` prefix with at most one hot per row.
+
+    Every separator position gives a candidate prefix ("admission_type_id_3"
+    -> "admission", "admission_type", "admission_type_id"); the longest prefix
+    whose columns are mutually exclusive wins. Packing mutually exclusive
+    columns is lossless, so a wrong guess only costs compactness.
+    """
+    candidates: Dict[str, List[str]] = {}
+    for name in df.columns:
+        name_str = str(name)
+        for i, char in enumerate(name_str[:-1]):
+            if i and char in separators:
+                candidates.setdefault(name_str[:i], []).append(name)
+    binary = {name: _is_binary(df[name]) and not df[name].hasnans for name in df.columns}
+    existing = {str(c) for c in df.columns}
+    taken = set()
+    groups = {}
+    for prefix in sorted(candidates, key=len, reverse=True):
+        columns = [c for c in candidates[prefix] if c not in taken and binary[c]]
+        if len(columns) < 2 or prefix in existing or prefix in groups:
+            continue
+        hot = df[columns].to_numpy(dtype=np.uint8).sum(axis=1)
+        if hot.max(initial=0) <= 1:
+            groups[prefix] = columns
+            taken.update(columns)
+    return groups
+
+
+def pack_one_hot(df: pd.DataFrame, groups: Dict[str, List[str]]) -> pd.DataFrame:
+    """Replace each one-hot group with one categorical column (NaN where no level is hot)."""
+    packed = {}
+    for prefix, columns in groups.items():
+        block = df[columns].to_numpy(dtype=np.uint8)
+        codes = np.where(block.any(axis=1), block.argmax(axis=1), -1)
+        levels = [str(c)[len(prefix) + 1:] for c in columns]
+        packed[prefix] = pd.Categorical.from_codes(codes, categories=levels)
+    grouped = {c for columns in groups.values() for c in columns}
+    # Keep each packed column where the first column of its group used to be.
+    first_of = {columns[0]: prefix for prefix, columns in groups.items()}
+    out = {}
+    for name in df.columns:
+        if name in first_of:
+            out[first_of[name]] = packed[first_of[name]]
+        elif name not in grouped:
+            out[name] = df[name]
+    return pd.DataFrame(out, index=df.index)
+
+
+def downcast(df: pd.DataFrame, float32: bool = True) -> pd.DataFrame:
+    """Narrowest dtype per numeric column: 0/1 -> uint8, integral -> smallest int, else float32."""
+    out = {}
+    for name, column in df.items():
+        if pd.api.types.is_bool_dtype(column) or (
+            pd.api.types.is_numeric_dtype(column) and not column.hasnans and _is_binary(column)
+        ):
+            out[name] = column.astype(np.uint8)
+        elif pd.api.types.is_integer_dtype(column):
+            out[name] = pd.to_numeric(column, downcast="integer")
+        elif pd.api.types.is_float_dtype(column):
+            values = column.to_numpy()
+            finite = values[np.isfinite(values)]
+            integral = finite.size == values.size and np.array_equal(finite, np.round(finite))
+            if integral and (finite.size == 0 or np.abs(finite).max() < 2 ** 53):
+                out[name] = pd.to_numeric(column.astype(np.int64), downcast="integer")
+            else:
+                out[name] = column.astype(np.float32) if float32 else column
+        else:
+            out[name] = column
+    return pd.DataFrame(out, index=df.index)
+
+
+def compact_frame(
+    df: pd.DataFrame, separators: Sequence[str] = ONE_HOT_SEPARATORS, float32: bool = True
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Pack one-hot groups into categoricals and downcast every other column.
+
+    Returns the compact frame and a report with the packed groups and the
+    memory use before and after.
+    """
+    before = int(df.memory_usage(index=False, deep=True).sum())
+    groups = one_hot_groups(df, separators)
+    compact = downcast(pack_one_hot(df, groups) if groups else df, float32=float32)
+    after = int(compact.memory_usage(index=False, deep=True).sum())
+    return compact, {
+        "packed_groups": {prefix: len(columns) for prefix, columns in groups.items()},
+        "columns_before": df.shape[1],
+        "columns_after": compact.shape[1],
+        "bytes_before": before,
+        "bytes_after": after,
+    }
+
+
+def expand_categoricals(df: pd.DataFrame) -> pd.DataFrame:
+    """One-hot categorical columns back out as uint8, for models without native categoricals."""
+    categorical = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return df
+    return pd.get_dummies(df, columns=categorical, dtype=np.uint8)
+
+
+def encode_labels(y: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    classes, codes = np.unique(np.asarray(y), return_inverse=True)
+    return codes.astype(np.int32), classes
+
+
+def label_fingerprint(y_codes: np.ndarray, classes: np.ndarray) -> str:
+    """Content hash of encoded labels and the class each code stands for."""
+    digest = hashlib.sha256()
+    digest.update(repr([str(c) for c in classes.tolist()]).encode())
+    digest.update(np.ascontiguousarray(y_codes, dtype=np.int32).tobytes())
+    return digest.hexdigest()
+
+
+def _catboost_frame(X: pd.DataFrame) -> Tuple[pd.DataFrame, List[int]]:
+    """CatBoost wants integer/string categories without NaN: use codes, -1 for missing."""
+    categorical = [i for i, c in enumerate(X.columns) if isinstance(X[c].dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return X, []
+    X = X.copy(deep=False)
+    for i in categorical:
+        name = X.columns[i]
+        X[name] = X[name].cat.codes.astype(np.int32)
+    return X, categorical
+
+
+def build_native(backend: str, X: pd.DataFrame, y_codes: np.ndarray):
+    """Build a library's own dataset over all rows; folds are taken as row slices of it."""
+    if backend == "lightgbm":
+        import lightgbm as lgb
+
+        # LightGBM fixes its bin edges here, from the feature values of every row,
+        # validation folds included. No labels are involved and the edges are
+        # quantiles, so CV scores barely move, but they are not strictly
+        # out-of-fold (the sklearn path, compact=False, bins per fold).
+        return lgb.Dataset(X, label=y_codes, free_raw_data=False, params={"verbose": -1}).construct()
+    if backend == "xgboost":
+        import xgboost as xgb
+
+        return xgb.DMatrix(X, label=y_codes, enable_categorical=True)
+    if backend == "catboost":
+        from catboost import Pool
+
+        frame, categorical = _catboost_frame(X)
+        return Pool(frame, label=y_codes, cat_features=categorical)
+    raise ValueError(f"No native dataset for backend '{backend}'")
+
+
+class NativeDatasetCache:
+    """Per-process LRU of native datasets, keyed by (data key, labels, backend).
+
+    Binning a dataset (LightGBM/XGBoost histograms, CatBoost quantisation) is
+    the expensive part of setting up a fit; caching the full-data object lets
+    every fold and candidate in this process reuse it through row slices.
+    """
+
+    def __init__(self, max_entries: int = MAX_NATIVE_DATASETS):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, data_key: str, backend: str, X: pd.DataFrame, y_codes: np.ndarray, classes: np.ndarray):
+        # The labels are baked into the dataset, so the same X with another y is another entry.
+        key = (data_key, label_fingerprint(y_codes, classes), backend)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            dataset = build_native(backend, X, y_codes)
+            self._entries[key] = dataset
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return dataset
+
+
+_native_datasets = NativeDatasetCache()
+
+
+def _native_params(backend: str, params: Dict[str, Any], n_classes: int) -> Tuple[Dict[str, Any], int]:
+    """Translate scikit-learn wrapper params to the library's training API."""
+    params = dict(params)
+    rounds = int(params.pop("n_estimators", 100))
+    threads = params.pop("n_jobs", None)
+    seed = params.pop("random_state", None)
+    params.pop("class_weight", None)  # applied as row weights, see _row_weights
+    params.pop("verbose", None)
+    if backend == "lightgbm":
+        params.update(verbosity=-1, objective="binary" if n_classes == 2 else "multiclass")
+        if n_classes > 2:
+            params["num_class"] = n_classes
+        if threads is not None:
+            params["num_threads"] = threads
+    else:
+        params["objective"] = "binary:logistic" if n_classes == 2 else "multi:softprob"
+        if n_classes > 2:
+            params["num_class"] = n_classes
+        if threads is not None:
+            params["nthread"] = threads
+    if seed is not None:
+        params["seed"] = seed
+    return params, rounds
+
+
+def _row_weights(class_weight: Any, y_codes: np.ndarray, classes: np.ndarray) -> np.ndarray:
+    """Per-row weights for a scikit-learn ``class_weight`` ("balanced" or {label: weight}) on training labels."""
+    counts = np.bincount(y_codes, minlength=len(classes))
+    if class_weight == "balanced":
+        weights = len(y_codes) / (len(classes) * np.maximum(counts, 1))
+    elif isinstance(class_weight, dict):
+        weights = np.array([class_weight.get(label, class_weight.get(str(label), 1.0)) for label in classes.tolist()])
+    else:
+        raise ValueError(f"Unsupported class_weight: {class_weight!r}")
+    return weights.astype(np.float64)[y_codes]
+
+
+def fit_predict_native(
+    estimator: str,
+    params: Dict[str, Any],
+    X: pd.DataFrame,
+    y: pd.Series,
+    train_idx: np.ndarray,
+    valid_idx: np.ndarray,
+    data_key: str,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Fit on row slices of the cached native dataset and score the validation rows.
+
+    Returns positive-class (or per-class) probabilities and the encoded
+    validation labels they should be compared with.
+    """
+    backend = NATIVE_BACKENDS[estimator]
+    y_codes, classes = encode_labels(y)
+    dataset = _native_datasets.get(data_key, backend, X, y_codes, classes)
+    train_idx, valid_idx = np.sort(train_idx), np.sort(valid_idx)
+
+    if backend == "catboost":
+        from catboost import CatBoostClassifier
+
+        # Packed one-hot groups were one-hot to begin with: keep them that way
+        # rather than paying for target statistics on every split.
+        model = CatBoostClassifier(**{"one_hot_max_size": 255, "allow_writing_files": False, **params})
+        model.fit(dataset.slice(train_idx))
+        proba = model.predict_proba(dataset.slice(valid_idx))
+    else:
+        native_params, rounds = _native_params(backend, params, len(classes))
+        train = dataset.subset(train_idx).construct() if backend == "lightgbm" else dataset.slice(train_idx)
+        if params.get("class_weight") is not None:
+            train.set_weight(_row_weights(params["class_weight"], y_codes[train_idx], classes))
+        if backend == "lightgbm":
+            import lightgbm as lgb
+
+            booster = lgb.train(native_params, train, num_boost_round=rounds)
+            proba = booster.predict(X.iloc[valid_idx])
+        else:
+            import xgboost as xgb
+
+            booster = xgb.train(native_params, train, num_boost_round=rounds)
+            proba = booster.predict(dataset.slice(valid_idx))
+    proba = np.asarray(proba, dtype=np.float64)
+    if proba.ndim == 2 and proba.shape[1] == 2:
+        proba = proba[:, 1]
+    return proba, y_codes[valid_idx]
+
+
+@tool
+def compact_features(X: pd.DataFrame) -> Dict[str, Any]:
+    """Shrink a feature frame: pack one-hot groups into categoricals and downcast dtypes.
+
+    Columns named "<feature>_<level>" (as from `pd.get_dummies`) that are 0/1 with at most one hot per row
+    become a single pandas categorical column; remaining 0/1 columns become
+    uint8, integral columns the smallest integer type and other floats float32.
+    LightGBM, XGBoost (`enable_categorical=True`) and CatBoost consume the
+    categoricals natively.
+
+    Args:
+        X: Feature frame, e.g. `load_split(...)` without the target column.
+
+    Returns:
+        A dict with `X` (the compact frame) and `report` (packed groups, column counts and bytes before/after).
+    """
+    compact, report = compact_frame(X)
+    return {"X": compact, "report": report}
@@ -1,8 +1,12 @@
 import json
 import os
+import threading
 from typing import Dict, Any, List
 from smolagents import tool
-from datasets import DatasetDict, load_from_disk
+import pandas as pd
+from datasets import DatasetDict
+from src.utils.analysis_store import analysis_store_path
+from src.utils.dataset_cache import get_dataset_cache
 
 @tool
 def save_analysis_results(results: Dict[str, Any], output_path: str) -> str:
@@ -45,8 +49,12 @@ def save_analysis_results(results: Dict[str, Any], output_path: str) -> str:
 
     serialisable = _stringify(results)
 
-    with open(abs_path, "w") as f:
+    # Write to a private temp file first so concurrent runs never see a
+    # half-written analysis.
+    tmp_path = f"{abs_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
         json.dump(serialisable, f, indent=2, default=str)
+    os.replace(tmp_path, abs_path)
 
     return f"Results saved to {abs_path}"
 
@@ -74,6 +82,23 @@ def analysis_present(path: str) -> bool:
     """
     return os.path.exists(path)
 
+@tool
+def analysis_path(dataset_path: str) -> str:
+    """Return where the analysis of a dataset is cached.
+
+    The path is derived from a content hash of the dataset's Arrow files and
+    the analysis schema version, so it changes automatically when the data
+    changes and never collides with the analysis of another dataset.
+
+    Args:
+        dataset_path: Directory of the dataset saved with `save_to_disk()`,
+            e.g. ``'datasets/diabetes-readmission'``.
+
+    Returns:
+        Relative path of the ``dataset_analysis.json`` file for this dataset.
+    """
+    return analysis_store_path(dataset_path)
+
 @tool
 def list_files(directory: str) -> List[str]:
     """List files in a directory.
@@ -90,13 +115,34 @@ def list_files(directory: str) -> List[str]:
 def load_dataset(path: str) -> DatasetDict:
     """Load a HuggingFace DatasetDict that was previously saved to disk.
 
+    Handles are memory-mapped and cached for the whole process, so loading the
+    same unchanged dataset again is free and returns the same object.
+
     Args:
         path: Directory where the dataset was stored via `datasets.DatasetDict.save_to_disk()`.
 
     Returns:
         The loaded `DatasetDict` instance.
     """
-    return load_from_disk(path)
+    return get_dataset_cache().get(path)
+
+@tool
+def load_split(path: str, split: str) -> pd.DataFrame:
+    """Return one split of a saved DatasetDict as a pandas DataFrame.
+
+    Use this instead of `load_dataset(path)[split].to_pandas()`: the frame is
+    built once per process from the memory-mapped Arrow data and reused by
+    every later call. Treat it as read-only; adding or dropping columns is
+    fine, but call `.copy()` before modifying values in place.
+
+    Args:
+        path: Directory where the dataset was stored via `datasets.DatasetDict.save_to_disk()`.
+        split: Name of the split, e.g. ``'train'`` or ``'test'``.
+
+    Returns:
+        The split as a `pandas.DataFrame`.
+    """
+    return get_dataset_cache().frame(path, split)
 
 @tool
 def set_seed(seed: int = 42) -> str:
@@ -0,0 +1,205 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from datasets import Dataset, DatasetDict, concatenate_datasets
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "arrow",
+    ".arrow": "arrow",
+    ".ipc": "arrow",
+}
+BATCH_SIZE = 64 * 1024
+CSV_BLOCK_SIZE = 16 << 20
+STAGING_DIR = ".ingest"
+
+
+def iter_record_batches(path: str, batch_size: int = BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    """Stream a CSV, Parquet, Feather or Arrow IPC file as record batches.
+
+    Only one batch (or CSV block) is materialised at a time, so files larger
+    than RAM can be read.
+    """
+    kind = SUPPORTED_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if kind == "csv":
+        reader = pa_csv.open_csv(path, read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE))
+        yield from reader
+    elif kind == "parquet":
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+    elif kind == "arrow":
+        source = pa.memory_map(path)
+        try:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+        except pa.ArrowInvalid:
+            source.seek(0)
+            yield from pa.ipc.open_stream(source)
+    else:
+        raise ValueError(f"Unsupported file type: {path}")
+
+
+def convert_to_arrow(src: str, dest: str) -> int:
+    """Rewrite ``src`` as an Arrow IPC stream at ``dest``, batch by batch.
+
+    Returns:
+        The number of rows written.
+    """
+    num_rows = 0
+    writer = None
+    try:
+        with pa.OSFile(dest, "wb") as sink:
+            for batch in iter_record_batches(src):
+                if writer is None:
+                    writer = pa.ipc.new_stream(sink, batch.schema)
+                writer.write_batch(batch)
+                num_rows += batch.num_rows
+            if writer is None:
+                raise ValueError(f"No rows found in {src}")
+            writer.close()
+    except Exception:
+        if os.path.exists(dest):
+            os.remove(dest)
+        raise
+    return num_rows
+
+
+# "test"/"valid*" as a whole word of the file name: test.csv, train_test.csv and
+# validation-2.csv, but not latest.csv, contest.csv or invalid_rows.csv.
+_TEST_NAME = re.compile(r"(^|[_\-.\s])(test|valid[a-z]*)($|[_\-.\s])")
+
+_ingest_locks: Dict[str, threading.Lock] = {}
+_ingest_locks_guard = threading.Lock()
+
+
+def _split_name(filename: str) -> str:
+    """Map a file name onto a split: ``test``/``valid*`` files go to ``test``."""
+    stem = os.path.splitext(filename)[0].lower()
+    return "test" if _TEST_NAME.search(stem) else "train"
+
+
+def _ingest_lock(directory: str) -> threading.Lock:
+    with _ingest_locks_guard:
+        return _ingest_locks.setdefault(os.path.abspath(directory), threading.Lock())
+
+
+def tabular_files(directory: str) -> List[str]:
+    """Supported data files directly inside ``directory``, sorted by name."""
+    return sorted(
+        name for name in os.listdir(directory)
+        if not name.startswith(".") and os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+    )
+
+
+def _concatenate(parts: List[Dataset]) -> Dataset:
+    features = parts[0].features
+    parts = [p if p.features == features else p.cast(features) for p in parts]
+    return parts[0] if len(parts) == 1 else concatenate_datasets(parts)
+
+
+def ingest_upload(
+    directory: str,
+    test_size: float = 0.2,
+    seed: int = 42,
+    target_column: Optional[str] = None,
+    num_proc: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Convert the tabular files in an upload directory into a ``DatasetDict``.
+
+    Each CSV/Parquet/Feather/Arrow file is streamed into an Arrow IPC file in
+    parallel, opened memory-mapped, and grouped into ``train``/``test`` splits
+    by file name. If no test file was uploaded, ``train`` is split randomly,
+    stratified on ``target_column`` when given (and every class has at least
+    two rows). The result is written next to the raw files with
+    ``save_to_disk`` so that ``load_dataset(directory)`` opens it without
+    copying.
+
+    Ingests of the same directory run one at a time; re-running on an already
+    ingested directory is a no-op.
+
+    Returns:
+        The dataset path, rows per split and column names.
+    """
+    with _ingest_lock(directory):
+        return _ingest(directory, test_size, seed, target_column, num_proc)
+
+
+def _ingest(directory: str, test_size: float, seed: int, target_column: Optional[str],
+            num_proc: Optional[int]) -> Dict[str, Any]:
+    dict_path = os.path.join(directory, "dataset_dict.json")
+    if os.path.exists(dict_path):
+        logger.info(f"{directory} already ingested")
+        return _describe(directory, DatasetDict.load_from_disk(directory))
+
+    files = tabular_files(directory)
+    if not files:
+        raise ValueError(f"No supported data files ({', '.join(sorted(SUPPORTED_EXTENSIONS))}) in {directory}")
+
+    staging = tempfile.mkdtemp(prefix=STAGING_DIR, dir=directory)
+    try:
+        targets: List[Tuple[str, str]] = [
+            (os.path.join(directory, name), os.path.join(staging, f"{i:05d}.arrow"))
+            for i, name in enumerate(files)
+        ]
+        workers = num_proc or min(len(targets), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(lambda t: convert_to_arrow(*t), targets))
+        logger.info(f"Converted {len(files)} file(s), {sum(rows)} rows, from {directory}")
+
+        grouped: Dict[str, List[Dataset]] = {}
+        for name, (_, arrow_path) in zip(files, targets):
+            grouped.setdefault(_split_name(name), []).append(Dataset.from_file(arrow_path))
+        splits = {split: _concatenate(parts) for split, parts in grouped.items()}
+
+        if "test" not in splits:
+            splits = _holdout(splits["train"], test_size, seed, target_column)
+        elif "train" not in splits:
+            raise ValueError(f"Only test files found in {directory}")
+
+        dataset_dict = DatasetDict({"train": splits["train"], "test": splits["test"]})
+        dataset_dict.save_to_disk(directory, num_proc=num_proc)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    return _describe(directory, DatasetDict.load_from_disk(directory))
+
+
+def _holdout(train: Dataset, test_size: float, seed: int, target_column: Optional[str]) -> Dict[str, Dataset]:
+    """Hold out ``test_size`` of the rows, stratified on ``target_column`` when possible."""
+    if target_column is None:
+        return train.train_test_split(test_size=test_size, seed=seed)
+    if target_column not in train.column_names:
+        raise ValueError(f"Target column '{target_column}' not found; columns are {train.column_names[:20]}")
+    import numpy as np
+    from sklearn.model_selection import train_test_split
+
+    labels = train.with_format("arrow")[target_column].to_numpy(zero_copy_only=False)
+    try:
+        train_rows, test_rows = train_test_split(np.arange(train.num_rows), test_size=test_size,
+                                                 random_state=seed, stratify=labels)
+    except ValueError as e:
+        # e.g. a class with a single row, or a continuous target
+        logger.warning(f"Not stratifying the hold-out on '{target_column}': {str(e)}")
+        return train.train_test_split(test_size=test_size, seed=seed)
+    return {"train": train.select(train_rows), "test": train.select(test_rows)}
+
+
+def _describe(directory: str, dataset_dict: DatasetDict) -> Dict[str, Any]:
+    return {
+        "dataset_path": directory,
+        "splits": {name: split.num_rows for name, split in dataset_dict.items()},
+        "columns": dataset_dict["train"].column_names,
+    }
@@ -0,0 +1,163 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_DATA_WORKERS = 2
+DATA_JOB_KINDS = ("ingest", "score")
+DEFAULT_MAX_PENDING = 64
+DEFAULT_JOB_TTL_SECONDS = 24 * 60 * 60
+
+
+_current_job: ContextVar[Optional["Job"]] = ContextVar("ml_agent_job", default=None)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+@dataclass
+class Job:
+    """Book-keeping record for a single queued job."""
+
+    id: str
+    kind: str
+    status: str = "queued"  # queued | running | succeeded | failed
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    trace: Optional[Dict[str, Any]] = None  # per-run tracing summary, for agent runs
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "trace": self.trace,
+        }
+
+
+class JobQueue:
+    """Bounded thread pool that runs blocking jobs off the event loop.
+
+    At most ``max_workers`` jobs run at the same time; up to ``max_pending``
+    further jobs wait in the queue before :class:`QueueFullError` is raised.
+    Jobs whose kind is in ``data_kinds`` (ingest and scoring) run on a separate
+    pool of ``data_workers`` threads with its own pending limit, so they neither
+    wait behind agent runs nor take their slots.
+    Finished jobs are kept for ``ttl_seconds`` so clients can poll them.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        ttl_seconds: float = DEFAULT_JOB_TTL_SECONDS,
+        data_workers: int = DEFAULT_MAX_DATA_WORKERS,
+        data_kinds: Tuple[str, ...] = DATA_JOB_KINDS,
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.data_workers = data_workers
+        self.data_kinds = tuple(data_kinds)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ml-agent-job")
+        self._data_executor = ThreadPoolExecutor(max_workers=data_workers, thread_name_prefix="ml-agent-data-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, **kwargs) -> Job:
+        """Queue ``fn(*args, **kwargs)`` and return its job record immediately."""
+        data = kind in self.data_kinds
+        with self._lock:
+            self._evict_expired()
+            if self._count("queued", data) >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({self.max_pending} jobs pending)")
+            job = Job(id=str(uuid.uuid4()), kind=kind)
+            self._jobs[job.id] = job
+        executor = self._data_executor if data else self._executor
+        executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._count("queued", False),
+                "running": self._count("running", False),
+                "max_data_workers": self.data_workers,
+                "data_queued": self._count("queued", True),
+                "data_running": self._count("running", True),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._data_executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job: Job, fn: Callable[..., Any], args, kwargs) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        token = _current_job.set(job)
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = "succeeded"
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            _current_job.reset(token)
+            job.finished_at = time.time()
+
+    def _count(self, status: str, data: bool) -> int:
+        return sum(
+            1 for job in self._jobs.values()
+            if job.status == status and (job.kind in self.data_kinds) == data
+        )
+
+    def _evict_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+def current_job() -> Optional[Job]:
+    """The job running in this thread, if any."""
+    return _current_job.get()
+
+
+def create_job_queue() -> JobQueue:
+    """Build a :class:`JobQueue` sized from the environment.
+
+    ``ML_AGENT_MAX_CONCURRENT_JOBS`` sets how many agent runs execute at once,
+    ``ML_AGENT_MAX_CONCURRENT_DATA_JOBS`` how many ingest and scoring jobs, and
+    ``ML_AGENT_MAX_PENDING_JOBS`` how many may wait behind each.
+    """
+    return JobQueue(
+        max_workers=int(os.getenv("ML_AGENT_MAX_CONCURRENT_JOBS", DEFAULT_MAX_WORKERS)),
+        max_pending=int(os.getenv("ML_AGENT_MAX_PENDING_JOBS", DEFAULT_MAX_PENDING)),
+        data_workers=int(os.getenv("ML_AGENT_MAX_CONCURRENT_DATA_JOBS", DEFAULT_MAX_DATA_WORKERS)),
+    )
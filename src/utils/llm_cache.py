@@ -0,0 +1,304 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from smolagents.models import ChatMessage
+from smolagents.monitoring import TokenUsage
+
+from src.utils import tracing
+from src.utils.context_budget import PromptCachingLiteLLMModel
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ROOT = "llm_cache"
+DEFAULT_MAX_BYTES = 512 << 20
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+MODES = ("readwrite", "record", "replay", "off")
+
+# Connection details never change the response, so they stay out of the key.
+_UNKEYED = {"api_key", "api_base", "client"}
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a call has no recorded response."""
+
+
+def cache_key(completion_kwargs: Dict[str, Any]) -> str:
+    """Hash of the model id, the full message list and every sampling parameter."""
+    keyed = {k: v for k, v in completion_kwargs.items() if k not in _UNKEYED and v is not None}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def stream_key(completion_kwargs: Dict[str, Any]) -> str:
+    """Hash of the first (system) message, which is fixed per agent kind."""
+    messages = completion_kwargs.get("messages") or [{}]
+    return hashlib.sha256(json.dumps(messages[0], sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class LLMCache:
+    """On-disk cache of chat completions.
+
+    Each response is a small JSON file under ``<root>/<key[:2]>/<key>.json``,
+    written atomically so concurrent runs and worker processes can share the
+    directory. Entries older than ``ttl`` seconds are treated as misses, and
+    the least recently used ones are removed once the cache exceeds
+    ``max_bytes``.
+    """
+
+    def __init__(self, root: str = LLM_CACHE_ROOT, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._bytes: Optional[int] = None  # running total, established by the first eviction scan
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        if self.ttl and time.time() - entry.get("created_at", 0) > self.ttl:
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(path)  # recency for LRU eviction
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({**entry, "created_at": time.time()}, default=str).encode()
+        fd, staging = tempfile.mkstemp(prefix=".", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(staging, path)
+        except BaseException:
+            self._remove(staging)
+            raise
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += len(data)
+            over = self._bytes is None or self._bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        entries: List[Tuple[float, str, int]] = []
+        now = time.time()
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.startswith("."):
+                    if now - stat.st_mtime > 3600:
+                        self._remove(path)  # staging file of a crashed writer
+                elif self.ttl and now - stat.st_mtime > self.ttl:
+                    self._remove(path)  # neither written nor read within the TTL
+                else:
+                    entries.append((stat.st_mtime, path, stat.st_size))
+        total = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        with self._lock:
+            self._bytes = total
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+class Cassette:
+    """An ordered recording of every completion of a run, for offline replay.
+
+    Recording appends one JSON line per call. On replay a call gets the
+    recorded response with the same key when there is one; otherwise the
+    next unused response recorded for the same agent (identified by its
+    system prompt), in order. That keeps a replay going when a prompt differs
+    in some incidental detail, such as a timing printed by a tool. Each such
+    fallback is counted in ``fallbacks`` and logged as a warning; with
+    ``strict`` there is no fallback and the call misses instead.
+    """
+
+    def __init__(self, path: str, strict: bool = False):
+        self.path = path
+        self.strict = strict
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+        self._streams: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._by_key: Dict[str, Tuple[str, int]] = {}
+        self._next: Dict[str, int] = defaultdict(int)
+        self._recording = False
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        stream = self._streams[entry["stream"]]
+        self._by_key.setdefault(entry["key"], (entry["stream"], len(stream)))
+        stream.append(entry)
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            if not self._recording:
+                # A recording replaces whatever the file held before.
+                self._streams.clear()
+                self._by_key.clear()
+                self._next.clear()
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a" if self._recording else "w") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+            self._recording = True
+            self._add(entry)
+
+    def replay(self, key: str, stream: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._by_key:
+                stream, index = self._by_key[key]
+            else:
+                index = self._next[stream]
+                if self.strict or index >= len(self._streams[stream]):
+                    return None
+                self.fallbacks += 1
+                logger.warning(f"No recording of LLM call {key[:12]}, replaying the next response of agent {stream} "
+                               f"instead ({self.fallbacks} fallback(s) so far)")
+            self._next[stream] = max(self._next[stream], index + 1)
+            return self._streams[stream][index]
+
+
+class CachedLiteLLMModel(PromptCachingLiteLLMModel):
+    """:class:`LiteLLMModel` that answers repeated calls from an :class:`LLMCache`.
+
+    ``mode`` is one of:
+
+    - ``readwrite``: serve hits, call the API on a miss and store the answer;
+    - ``record``: always call the API, refreshing the cache (and the cassette);
+    - ``replay``: never call the API; a call with no recorded response raises
+      :class:`CacheMiss`;
+    - ``off``: no response cache (provider prompt caching still applies).
+
+    Answers from the cache report the token usage of the original call, so a
+    replayed run shows the same figures as the run it was recorded from.
+    """
+
+    def __init__(self, *args, cache: Optional[LLMCache] = None, mode: str = "readwrite",
+                 cassette: Optional[Cassette] = None, **kwargs):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}', expected one of {MODES}")
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+        self.mode = mode
+        self.cassette = cassette
+
+    def generate(self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs) -> ChatMessage:
+        if self.mode == "off" or self.cache is None:
+            return super().generate(messages, stop_sequences, response_format, tools_to_call_from, **kwargs)
+        completion_kwargs = self._prepare_completion_kwargs(
+            messages=messages,
+            stop_sequences=stop_sequences,
+            response_format=response_format,
+            tools_to_call_from=tools_to_call_from,
+            model=self.model_id,
+            convert_images_to_image_urls=True,
+            custom_role_conversions=self.custom_role_conversions,
+            **kwargs,
+        )
+        key, stream = cache_key(completion_kwargs), stream_key(completion_kwargs)
+
+        entry = None
+        if self.mode == "replay" and self.cassette is not None:
+            entry = self.cassette.replay(key, stream)
+        if entry is None and self.mode in ("readwrite", "replay"):
+            entry = self.cache.get(key)
+        if entry is not None:
+            with tracing.span("llm.request", kind=tracing.SPAN_KIND_CLIENT, **{"gen_ai.request.model": self.model_id}) as span:
+                message = self._from_entry(entry)
+                if span is not None:
+                    if entry.get("key", key) != key:
+                        span.set(**{"llm.cassette_fallback": True})
+                    span.set(**{"llm.response_cache": "hit", "gen_ai.usage.input_tokens": self._last_input_token_count,
+                                "gen_ai.usage.output_tokens": self._last_output_token_count})
+            return message
+        if self.mode == "replay":
+            raise CacheMiss(f"No recorded LLM response for call {key[:12]} (agent {stream})")
+
+        response = super().generate(messages, stop_sequences, response_format, tools_to_call_from, **kwargs)
+        entry = {
+            "model": self.model_id,
+            "message": response.raw.choices[0].message.model_dump(include={"role", "content", "tool_calls"}),
+            "usage": {"input_tokens": self._last_input_token_count, "output_tokens": self._last_output_token_count},
+        }
+        self.cache.put(key, entry)
+        if self.mode == "record" and self.cassette is not None:
+            self.cassette.record({"key": key, "stream": stream, **entry})
+        return response
+
+    def _from_entry(self, entry: Dict[str, Any]) -> ChatMessage:
+        usage = entry.get("usage") or {}
+        self._last_input_token_count = usage.get("input_tokens", 0)
+        self._last_output_token_count = usage.get("output_tokens", 0)
+        message = {k: v for k, v in entry["message"].items() if v is not None}
+        return ChatMessage.from_dict(
+            message,
+            token_usage=TokenUsage(input_tokens=self._last_input_token_count, output_tokens=self._last_output_token_count),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_llm_cache() -> LLMCache:
+    """Return the process-wide cache under ``ML_AGENT_LLM_CACHE_DIR``."""
+    return LLMCache(
+        root=os.getenv("ML_AGENT_LLM_CACHE_DIR", LLM_CACHE_ROOT),
+        max_bytes=int(os.getenv("ML_AGENT_LLM_CACHE_BYTES", DEFAULT_MAX_BYTES)),
+        ttl=float(os.getenv("ML_AGENT_LLM_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_cassette(path: str, strict: bool = False) -> Cassette:
+    return Cassette(path, strict=strict)
+
+
+def cache_settings() -> Tuple[str, Optional[Cassette]]:
+    """The cache mode (``ML_AGENT_LLM_CACHE``) and cassette (``ML_AGENT_LLM_CASSETTE``) of this process;
+    ``ML_AGENT_LLM_CASSETTE_STRICT=1`` replays exact matches only."""
+    mode = os.getenv("ML_AGENT_LLM_CACHE", "readwrite").lower()
+    path = os.getenv("ML_AGENT_LLM_CASSETTE")
+    strict = os.getenv("ML_AGENT_LLM_CASSETTE_STRICT", "0").lower() in ("1", "on", "true")
+    return mode, get_cassette(os.path.abspath(path), strict) if path else None
@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+from smolagents import tool
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_ROOT = "models/registry"
+MANIFEST = "manifest.json"
+ARTIFACT = "model.joblib"
+
+
+class ModelNotFound(KeyError):
+    pass
+
+
+def _safe_name(name: str) -> str:
+    cleaned = re.sub(r"[^0-9A-Za-z._-]+", "-", name).strip(".-")
+    if not cleaned:
+        raise ValueError(f"Invalid model name: {name!r}")
+    return cleaned
+
+
+def feature_schema(X: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Column names and dtypes (with the levels of categorical columns) that requests must match."""
+    schema = []
+    for name, dtype in X.dtypes.items():
+        column: Dict[str, Any] = {"name": str(name), "dtype": str(dtype)}
+        if isinstance(dtype, pd.CategoricalDtype):
+            column["dtype"] = "category"
+            column["categories"] = [c.item() if isinstance(c, np.generic) else c for c in dtype.categories]
+        schema.append(column)
+    return schema
+
+
+def _json_safe(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class ModelRegistry:
+    """Versioned model artifacts on disk.
+
+    Each version lives in ``<root>/<name>/<version>/`` with the pickled
+    estimator and a ``manifest.json`` describing it: the feature schema it
+    expects, its metrics, the fingerprint of the frame it was trained on (and,
+    given its dataset path, the dataset's content fingerprint, which also keys
+    its stored analysis) and its classes. Tree ensembles are also exported to a flat node table
+    (:mod:`tree_compiler`) that serving uses whenever it reproduces
+    ``predict_proba`` exactly. Versions are integers counting up from 1 and
+    are published atomically, so a reader never sees a half-written one.
+    """
+
+    def __init__(self, root: str = REGISTRY_ROOT):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _model_dir(self, name: str) -> str:
+        return os.path.join(self.root, _safe_name(name))
+
+    def versions(self, name: str) -> List[int]:
+        directory = self._model_dir(name)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(v) for v in os.listdir(directory) if v.isdigit())
+
+    def register(
+        self,
+        model: Any,
+        name: str,
+        X_train: pd.DataFrame,
+        metrics: Optional[Dict[str, Any]] = None,
+        extra: Optional[Dict[str, Any]] = None,
+        dataset_path: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Store ``model`` as the next version of ``name`` and return its manifest."""
+        from src.utils.analysis_store import dataset_fingerprint
+        from src.utils.preprocessing_cache import frame_fingerprint
+
+        if not hasattr(model, "predict_proba"):
+            raise ValueError("Only classifiers with predict_proba can be registered")
+        classes = getattr(model, "classes_", None)
+        manifest = {
+            "name": _safe_name(name),
+            "estimator": type(model).__name__,
+            "features": feature_schema(X_train),
+            "classes": None if classes is None else _json_safe(list(classes)),
+            "metrics": _json_safe(metrics or {}),
+            "dataset": dataset_path,
+            "dataset_fingerprint": dataset_fingerprint(dataset_path) if dataset_path else None,
+            "training_frame_fingerprint": frame_fingerprint(X_train),
+            "train_rows": len(X_train),
+            "created_at": time.time(),
+            **_json_safe(extra or {}),
+        }
+        directory = self._model_dir(name)
+        os.makedirs(directory, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=directory)
+        try:
+            joblib.dump(model, os.path.join(staging, ARTIFACT))
+            manifest["compiled"] = self._export_compiled(model, X_train, manifest["features"], staging)
+            with self._lock:
+                version = (self.versions(name) or [0])[-1] + 1
+                while True:
+                    manifest["version"] = version
+                    with open(os.path.join(staging, MANIFEST), "w") as f:
+                        json.dump(manifest, f, indent=2, default=str)
+                    try:
+                        os.rename(staging, os.path.join(directory, str(version)))
+                        break
+                    except OSError:
+                        if not os.path.isdir(os.path.join(directory, str(version))):
+                            raise
+                        version += 1  # another process published this version first
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return manifest
+
+    @staticmethod
+    def _export_compiled(model: Any, X_train: pd.DataFrame, features: List[Dict[str, Any]], directory: str) -> Dict[str, Any]:
+        from src.utils.tree_compiler import export_compiled
+
+        try:
+            return export_compiled(model, X_train, features, directory)
+        except Exception as e:
+            # Serving falls back to predict_proba; a failed export never blocks registration.
+            logger.warning(f"Could not compile {type(model).__name__}: {str(e)}")
+            return {"used": False, "reason": str(e)}
+
+    def path(self, name: str, version: int) -> str:
+        return os.path.join(self._model_dir(name), str(version))
+
+    def resolve(self, name: str, version: Optional[int] = None) -> int:
+        versions = self.versions(name)
+        if not versions or (version is not None and version not in versions):
+            label = name if version is None else f"{name} v{version}"
+            raise ModelNotFound(f"No registered model {label}")
+        return versions[-1] if version is None else version
+
+    def manifest(self, name: str, version: Optional[int] = None) -> Dict[str, Any]:
+        version = self.resolve(name, version)
+        with open(os.path.join(self._model_dir(name), str(version), MANIFEST)) as f:
+            return json.load(f)
+
+    def load(self, name: str, version: Optional[int] = None):
+        """Return ``(model, manifest)`` for a version (the latest by default)."""
+        manifest = self.manifest(name, version)
+        model = joblib.load(os.path.join(self._model_dir(name), str(manifest["version"]), ARTIFACT))
+        return model, manifest
+
+    def list(self) -> List[Dict[str, Any]]:
+        """The latest manifest of every registered model, with its available versions."""
+        if not os.path.isdir(self.root):
+            return []
+        models = []
+        for name in sorted(os.listdir(self.root)):
+            versions = self.versions(name)
+            if versions:
+                models.append({**self.manifest(name, versions[-1]), "versions": versions})
+        return models
+
+
+@lru_cache(maxsize=None)
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide registry under ``ML_AGENT_REGISTRY_DIR``."""
+    return ModelRegistry(os.getenv("ML_AGENT_REGISTRY_DIR", REGISTRY_ROOT))
+
+
+@tool
+def register_model(model: Any, X_train: pd.DataFrame, metrics: Dict[str, Any], name: str = "diabetes-readmission",
+                   dataset_path: Optional[str] = None) -> Dict[str, Any]:
+    """Publish a fitted classifier to the model registry so it can be served by `POST /predict`.
+
+    Stores a new version with the feature schema of `X_train` (column names, dtypes and
+    categorical levels), the given metrics, a fingerprint of the training frame and the
+    content fingerprint of the dataset it came from.
+
+    Args:
+        model: Fitted estimator or pipeline with `predict_proba`, taking frames shaped like `X_train`.
+        X_train: The exact feature frame the model was fitted on (after any preprocessing done outside the model).
+        metrics: Scores to record, e.g. {"cv_auc": ..., "test_auc": ..., "test_accuracy": ...}.
+        name: Registry name of the model. Defaults to 'diabetes-readmission'.
+        dataset_path: Directory of the dataset the model was trained on, e.g. 'datasets/diabetes-readmission'.
+
+    Returns:
+        The manifest of the new version (including `name` and `version`).
+    """
+    return get_model_registry().register(model, name, X_train, metrics, dataset_path=dataset_path)
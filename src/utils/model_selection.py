@@ -0,0 +1,224 @@
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from smolagents import tool
+
+from src.utils.cross_validation import available_cores, compact_tasks, estimator_params, fit_tasks, shared_data
+
+# Families from the modeling prompt, a couple of sensible configs each.
+DEFAULT_CANDIDATES: List[Dict[str, Any]] = [
+    {"estimator": "LogisticRegression", "params": {"C": 1.0}, "scale": True},
+    {"estimator": "LogisticRegression", "params": {"C": 0.1, "class_weight": "balanced"}, "scale": True},
+    {"estimator": "RandomForest", "params": {"n_estimators": 300, "min_samples_leaf": 1}},
+    {"estimator": "RandomForest", "params": {"n_estimators": 300, "min_samples_leaf": 5, "max_features": 0.3}},
+    {"estimator": "XGBoost", "params": {"n_estimators": 300, "learning_rate": 0.1, "max_depth": 4}},
+    {"estimator": "XGBoost", "params": {"n_estimators": 600, "learning_rate": 0.05, "max_depth": 6, "subsample": 0.8}},
+    {"estimator": "LightGBM", "params": {"n_estimators": 300, "learning_rate": 0.05, "num_leaves": 31}},
+    {"estimator": "LightGBM", "params": {"n_estimators": 600, "learning_rate": 0.03, "num_leaves": 63, "subsample": 0.8, "subsample_freq": 1}},
+    {"estimator": "CatBoost", "params": {"iterations": 300, "depth": 6}},
+    {"estimator": "CatBoost", "params": {"iterations": 600, "depth": 8, "learning_rate": 0.05}},
+    {"estimator": "SVM", "params": {"C": 1.0}, "scale": True},
+    {"estimator": "MLP", "params": {"hidden_layer_sizes": [128, 64], "early_stopping": True}, "scale": True},
+]
+DEFAULT_BUDGET_SECONDS = 600.0
+
+
+def _score(result: Dict[str, Any], metric: str) -> Optional[float]:
+    return result.get(metric) if metric in ("auc", "accuracy") else None
+
+
+def _rung_sizes(n_rows: int, n_candidates: int, eta: int, min_rows: int) -> List[int]:
+    """Training-set sizes per rung, shrinking by ``eta`` from ``n_rows`` at the last rung."""
+    rungs = max(0, math.ceil(math.log(max(n_candidates, 1)) / math.log(eta)))
+    floor = min(min_rows, n_rows)
+    return sorted({max(floor, n_rows // eta ** (rungs - k)) for k in range(rungs + 1)})
+
+
+def successive_halving(
+    X: pd.DataFrame,
+    y: Any,
+    candidates: Optional[List[Dict[str, Any]]] = None,
+    budget_seconds: Optional[float] = DEFAULT_BUDGET_SECONDS,
+    budget_cpu_seconds: Optional[float] = None,
+    metric: str = "auc",
+    eta: int = 3,
+    min_rows: int = 1000,
+    validation_fraction: float = 0.2,
+    seed: int = 42,
+    preprocess: Optional[Dict[str, Any]] = None,
+    compact: bool = True,
+) -> Dict[str, Any]:
+    """Race ``candidates`` on growing row subsamples, keeping the top ``1/eta`` each rung.
+
+    All candidates are scored on one stratified holdout. Every rung trains the
+    survivors on a larger (nested) random subsample of the remaining rows, in
+    parallel on the CV worker pool, and the next rung only starts if its
+    projected cost, extrapolated from the current rung, fits in what is left
+    of the wall-clock and CPU-seconds budgets. With ``preprocess``, the raw
+    frame is encoded once (fitted on the training pool) through the
+    preprocessing cache and shared by every candidate and rung; otherwise,
+    with ``compact``, the frame is compacted once and GBDT candidates reuse
+    their native datasets across rungs.
+    """
+    from sklearn.model_selection import train_test_split
+
+    if metric not in ("auc", "accuracy"):
+        raise ValueError(f"Unknown metric '{metric}'; use 'auc' or 'accuracy'")
+    if eta < 2:
+        raise ValueError("eta must be at least 2")
+    X = X.reset_index(drop=True)
+    y = pd.Series(np.asarray(y)).reset_index(drop=True)
+    if len(X) != len(y):
+        raise ValueError(f"X has {len(X)} rows but y has {len(y)}")
+
+    started = time.perf_counter()
+    deadline = started + budget_seconds if budget_seconds is not None else None
+    specs = [dict(c) for c in (candidates or DEFAULT_CANDIDATES)]
+    for i, spec in enumerate(specs):
+        spec["id"] = i
+        spec["params"], spec["thread_param"] = estimator_params(spec["estimator"], spec.get("params"), seed)
+        spec["scale"] = bool(spec.get("scale", False))
+
+    train_idx, valid_idx = train_test_split(
+        np.arange(len(y)), test_size=validation_fraction, stratify=y, random_state=seed
+    )
+    # One shuffle, so every rung's subsample contains the previous one.
+    order = np.random.default_rng(seed).permutation(train_idx)
+    sizes = _rung_sizes(len(order), len(specs), eta, min_rows)
+
+    features = None
+    if preprocess is not None:
+        from src.utils.preprocessing_cache import get_preprocessing_cache
+
+        features = get_preprocessing_cache().get_or_fit(
+            X, np.sort(train_idx), f"holdout{validation_fraction}-seed{seed}", preprocess
+        )
+        X = X[[]]  # workers only need the labels now
+    report = None
+    if preprocess is None and compact:
+        X, report = compact_tasks(X, specs)  # routes each spec to its native or expanded data
+
+    cores = available_cores()
+    leaderboard = {s["id"]: {"estimator": s["estimator"], "params": s["params"], "scale": s["scale"],
+                             "rows": 0, "score": None, "accuracy": None, "auc": None,
+                             "eliminated_at_rung": None, "error": None} for s in specs}
+    survivors = list(specs)
+    rungs: List[Dict[str, Any]] = []
+    cpu_used = 0.0
+    exhausted = False
+
+    with shared_data(X, y, min(len(specs), cores)) as data_path:
+        for rung, rows in enumerate(sizes):
+            concurrency = min(len(survivors), cores)
+            threads = max(1, cores // concurrency)
+            tasks = []
+            for spec in survivors:
+                params = dict(spec["params"])
+                if spec["thread_param"]:
+                    params[spec["thread_param"]] = threads
+                tasks.append({"id": spec["id"], "estimator": spec["estimator"], "params": params,
+                              "threads": threads, "scale": spec["scale"],
+                              "train_idx": np.sort(order[:rows]), "valid_idx": valid_idx})
+                if features is not None:
+                    tasks[-1]["features"] = features
+                tasks[-1].update({k: spec[k] for k in ("data_key", "native", "expand") if k in spec})
+
+            rung_started = time.perf_counter()
+            results = fit_tasks(X, y, tasks, concurrency, data_path, deadline=deadline, raise_errors=False)
+            scored = []
+            for result in results:
+                entry = leaderboard[result["id"]]
+                if "error" in result:
+                    entry["error"], entry["eliminated_at_rung"] = result["error"], rung
+                    continue
+                cpu_used += result["cpu_seconds"]
+                entry.update(rows=rows, score=_score(result, metric), accuracy=result["accuracy"], auc=result["auc"])
+                scored.append(result)
+            scored.sort(key=lambda r: -np.inf if _score(r, metric) is None else _score(r, metric), reverse=True)
+            rungs.append({"rung": rung, "rows": rows, "candidates": len(tasks), "completed": len(scored),
+                          "seconds": round(time.perf_counter() - rung_started, 3)})
+            if not scored or rung == len(sizes) - 1:
+                survivors = [s for s in survivors if s["id"] in {r["id"] for r in scored}]
+                break
+
+            keep = {r["id"] for r in scored[:max(1, math.ceil(len(scored) / eta))]}
+            for result in scored:
+                if result["id"] not in keep:
+                    leaderboard[result["id"]]["eliminated_at_rung"] = rung
+            survivors = [s for s in survivors if s["id"] in keep]
+
+            # Project the next rung from this one; fit cost grows at least linearly in rows.
+            growth = sizes[rung + 1] / rows
+            kept = [r for r in scored if r["id"] in keep]
+            next_wall = growth * sum(r["fit_seconds"] for r in kept) / min(len(kept), cores)
+            next_cpu = growth * sum(r["cpu_seconds"] for r in kept)
+            elapsed = time.perf_counter() - started
+            if (budget_seconds is not None and elapsed + next_wall > budget_seconds) or (
+                budget_cpu_seconds is not None and cpu_used + next_cpu > budget_cpu_seconds
+            ):
+                exhausted = True
+                break
+
+    ranked = sorted(
+        leaderboard.values(),
+        key=lambda e: (e["rows"], -np.inf if e["score"] is None else e["score"]),
+        reverse=True,
+    )
+    best = ranked[0] if ranked and ranked[0]["score"] is not None else None
+    return {
+        "winner": None if best is None else {k: best[k] for k in ("estimator", "params", "scale", "rows", "score")},
+        "metric": metric,
+        "leaderboard": ranked,
+        "rungs": rungs,
+        "budget": {
+            "wall_seconds": round(time.perf_counter() - started, 3),
+            "cpu_seconds": round(cpu_used, 3),
+            "budget_seconds": budget_seconds,
+            "budget_cpu_seconds": budget_cpu_seconds,
+            "exhausted": exhausted,
+        },
+        "compaction": report,
+    }
+
+
+@tool
+def run_tournament(
+    X: pd.DataFrame,
+    y: Any,
+    candidates: Optional[List[Dict[str, Any]]] = None,
+    budget_seconds: float = DEFAULT_BUDGET_SECONDS,
+    budget_cpu_seconds: Optional[float] = None,
+    metric: str = "auc",
+    preprocess: Optional[Dict[str, Any]] = None,
+    compact: bool = True,
+) -> Dict[str, Any]:
+    """Pick the best model family and config by successive halving within a time budget.
+
+    All candidates start on a small row subsample; after each round only the
+    best third move on to three times as many rows, until the survivor(s) train
+    on all rows. Rounds run in parallel across cores, losers stop early, and no
+    round starts if it would overrun the budget, so racing many candidates costs
+    a fraction of fitting each one fully. Follow up with `run_cv` on the winner.
+
+    Args:
+        X: Pre-processed, numeric feature frame (string column names), or the raw frame when `preprocess` is given. Candidates that cannot fit it are eliminated, not fatal.
+        y: Target labels aligned with `X`.
+        candidates: List of {"estimator": <family or class path as in run_cv>, "params": {...}, "scale": bool}. Defaults to two configs of each of LogisticRegression, RandomForest, XGBoost, LightGBM, CatBoost plus SVM and MLP.
+        budget_seconds: Wall-clock budget for the whole tournament. Defaults to 600.
+        budget_cpu_seconds: Optional CPU-seconds budget summed over all fits.
+        metric: 'auc' (default) or 'accuracy', measured on a stratified 20% holdout.
+        preprocess: Optional preprocessing config as in `run_cv`; `X` is then the raw frame, encoded once and cached for every candidate.
+        compact: Without `preprocess`, compact the frame once as in `run_cv`. Defaults to True.
+
+    Returns:
+        A dict with `winner` ({"estimator", "params", "scale", "rows", "score"}), the full
+        `leaderboard` (rows reached, score, elimination round or error per candidate),
+        per-round `rungs`, `budget` usage and `compaction` (as in `run_cv`).
+    """
+    return successive_halving(
+        X, y, candidates=candidates, budget_seconds=budget_seconds,
+        budget_cpu_seconds=budget_cpu_seconds, metric=metric, preprocess=preprocess, compact=compact,
+    )
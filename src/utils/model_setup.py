@@ -1,7 +1,92 @@
+import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional
+
 from smolagents import LiteLLMModel
 from dotenv import load_dotenv
 
-def setup_model() -> LiteLLMModel:
-    """Initialize and configure the LLM model."""
+MODEL_ID = "claude-sonnet-4-20250514"
+DEFAULT_POOL_SIZE = 8
+
+
+@lru_cache(maxsize=None)
+def configure_process() -> None:
+    """One-time, per-process setup shared by every model instance: loads ``.env``."""
     load_dotenv()
-    return LiteLLMModel(model_id="claude-sonnet-4-20250514") 
\ No newline at end of file
+
+
+@lru_cache(maxsize=None)
+def get_http_handler():
+    """Process-wide LiteLLM HTTP handler over one keep-alive connection pool.
+
+    Every model passes it to LiteLLM as the completion's ``client``, which
+    the Anthropic handler sends requests through, so all models and agents
+    reuse warm connections. The pool holds ``ML_AGENT_HTTP_MAX_CONNECTIONS``
+    connections.
+    """
+    import httpx
+    from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+    max_connections = int(os.getenv("ML_AGENT_HTTP_MAX_CONNECTIONS", "32"))
+    timeout = httpx.Timeout(600.0, connect=10.0)
+    client = httpx.Client(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=timeout,
+    )
+    return HTTPHandler(timeout=timeout, client=client)
+
+
+def setup_model() -> LiteLLMModel:
+    """Initialize and configure the LLM model.
+
+    Calls go through the on-disk response cache unless ``ML_AGENT_LLM_CACHE``
+    is ``off``; ``record`` and ``replay`` (with ``ML_AGENT_LLM_CASSETTE``)
+    capture a whole multi-agent run and play it back offline. Anthropic
+    models also get provider-side prompt caching of the stable prefix.
+    """
+    configure_process()
+    from src.utils.context_budget import PromptCachingLiteLLMModel
+    from src.utils.llm_cache import CachedLiteLLMModel, cache_settings, get_llm_cache
+
+    mode, cassette = cache_settings()
+    if mode == "off":
+        return PromptCachingLiteLLMModel(model_id=MODEL_ID, http_handler=get_http_handler())
+    return CachedLiteLLMModel(model_id=MODEL_ID, http_handler=get_http_handler(), cache=get_llm_cache(), mode=mode, cassette=cassette)
+
+
+class ModelPool:
+    """Thread-safe free list of :class:`LiteLLMModel` clients.
+
+    A model instance tracks per-call token counts, so it is leased to one agent
+    at a time. Leasing never blocks: when no idle instance is available a new
+    one is built, and at most ``max_idle`` instances are kept for reuse.
+    Overall concurrency is bounded by the job queue, not by the pool.
+    New instances come from ``factory`` (:func:`setup_model` by default).
+    """
+
+    def __init__(self, max_idle: int = DEFAULT_POOL_SIZE, factory: Optional[Callable[[], LiteLLMModel]] = None):
+        self.max_idle = max_idle
+        self.factory = factory or setup_model
+        self._idle: List[LiteLLMModel] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self) -> Iterator[LiteLLMModel]:
+        with self._lock:
+            model = self._idle.pop() if self._idle else None
+        if model is None:
+            model = self.factory()
+        try:
+            yield model
+        finally:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(model)
+
+
+@lru_cache(maxsize=None)
+def get_model_pool() -> ModelPool:
+    """Return the process-wide model pool, sized by ``ML_AGENT_MODEL_POOL_SIZE``."""
+    return ModelPool(max_idle=int(os.getenv("ML_AGENT_MODEL_POOL_SIZE", DEFAULT_POOL_SIZE)))
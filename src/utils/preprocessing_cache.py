@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from smolagents import tool
+
+PREPROCESSING_ROOT = "preprocessing_cache"
+DEFAULT_MAX_BYTES = 8 << 30
+
+# Declarative preprocessing, so identical configs hash to the same cache key.
+DEFAULT_PREPROCESSING: Dict[str, Any] = {
+    "numeric_impute": "median",        # SimpleImputer strategy, or None to leave NaNs (GBDTs handle them)
+    "scale": False,                    # StandardScaler on numeric columns
+    "categorical_impute": "most_frequent",
+    "encode": "onehot",                # "onehot" or "ordinal"
+    "max_categories": 50,              # rarer levels are grouped into one infrequent column
+    "clean_names": True,               # feature names safe for LightGBM/XGBoost
+}
+
+Matrix = Union[np.ndarray, sp.csr_matrix]
+
+
+def frame_fingerprint(X: pd.DataFrame) -> str:
+    """Content hash of a frame: column names, dtypes and every value."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([(str(c), str(t)) for c, t in X.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def clean_feature_name(name: str) -> str:
+    return re.sub(r"[^0-9A-Za-z_]+", "_", str(name)).strip("_") or "feature"
+
+
+def build_transformer(X: pd.DataFrame, config: Dict[str, Any]):
+    """Translate a preprocessing config into an (unfitted) ``ColumnTransformer``."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+    categorical = X.select_dtypes(include=["object", "category", "string"]).columns.tolist()
+    numeric = [c for c in X.columns if c not in categorical]
+
+    numeric_steps = []
+    if config["numeric_impute"]:
+        numeric_steps.append(SimpleImputer(strategy=config["numeric_impute"]))
+    if config["scale"]:
+        numeric_steps.append(StandardScaler())
+    if config["encode"] == "onehot":
+        encoder = OneHotEncoder(handle_unknown="infrequent_if_exist", max_categories=config["max_categories"])
+    elif config["encode"] == "ordinal":
+        encoder = OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1)
+    else:
+        raise ValueError(f"Unknown encoding '{config['encode']}'; use 'onehot' or 'ordinal'")
+    categorical_steps = [SimpleImputer(strategy=config["categorical_impute"]), encoder]
+
+    return ColumnTransformer(
+        [
+            ("num", make_pipeline(*numeric_steps) if numeric_steps else "passthrough", numeric),
+            ("cat", make_pipeline(*categorical_steps), categorical),
+        ],
+        verbose_feature_names_out=False,
+    )
+
+
+def _save_matrix(directory: str, matrix: Matrix) -> Dict[str, Any]:
+    if sp.issparse(matrix):
+        matrix = sp.csr_matrix(matrix)
+        for part in ("data", "indices", "indptr"):
+            np.save(os.path.join(directory, f"{part}.npy"), getattr(matrix, part))
+        return {"format": "csr", "shape": list(matrix.shape)}
+    np.save(os.path.join(directory, "matrix.npy"), np.ascontiguousarray(matrix, dtype=np.float64))
+    return {"format": "dense", "shape": list(matrix.shape)}
+
+
+def _dir_bytes(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+class PreprocessingCache:
+    """On-disk cache of fitted preprocessing and the matrices it produces.
+
+    Entries are keyed by the data fingerprint, the fold (its id and the exact
+    rows the transformers were fitted on) and the preprocessing config. Each
+    entry holds the fitted ``ColumnTransformer`` and the transformed matrix for
+    *all* rows, saved as ``.npy`` files that are memory-mapped on load, so
+    every candidate model and every worker process shares one encoding per
+    fold. The least recently used entries are removed once the cache exceeds
+    ``max_bytes``.
+    """
+
+    def __init__(self, root: str = PREPROCESSING_ROOT, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    @staticmethod
+    def key(fingerprint: str, fold_id: str, fit_rows: np.ndarray, config: Dict[str, Any]) -> str:
+        digest = hashlib.sha256()
+        digest.update(fingerprint.encode())
+        digest.update(fold_id.encode())
+        digest.update(np.ascontiguousarray(fit_rows, dtype=np.int64).tobytes())
+        digest.update(json.dumps(config, sort_keys=True).encode())
+        return digest.hexdigest()[:32]
+
+    def get_or_fit(
+        self,
+        X: pd.DataFrame,
+        fit_rows: np.ndarray,
+        fold_id: str,
+        config: Optional[Dict[str, Any]] = None,
+        fingerprint: Optional[str] = None,
+    ) -> str:
+        """Return the entry directory for this fold, fitting and encoding on a miss."""
+        config = {**DEFAULT_PREPROCESSING, **(config or {})}
+        fingerprint = fingerprint or frame_fingerprint(X)
+        key = self.key(fingerprint, fold_id, fit_rows, config)
+        path = os.path.join(self.root, key)
+
+        with self._lock_for(key):
+            if os.path.isdir(path):
+                os.utime(path)  # recency for LRU eviction
+                return path
+            os.makedirs(self.root, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=f".{key}-", dir=self.root)
+            try:
+                transformer = build_transformer(X, config)
+                transformer.fit(X.iloc[fit_rows])
+                matrix = transformer.transform(X)
+                names = [str(n) for n in transformer.get_feature_names_out()]
+                if config["clean_names"]:
+                    names = [clean_feature_name(n) for n in names]
+                meta = _save_matrix(staging, matrix)
+                meta.update(fold_id=fold_id, config=config, fingerprint=fingerprint, feature_names=names)
+                joblib.dump(transformer, os.path.join(staging, "transformer.joblib"))
+                with open(os.path.join(staging, "meta.json"), "w") as f:
+                    json.dump(meta, f)
+                try:
+                    os.replace(staging, path)
+                except OSError:
+                    if not os.path.isdir(path):
+                        raise
+                    shutil.rmtree(staging, ignore_errors=True)  # another process got there first
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+        self._evict(keep=path)
+        return path
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _evict(self, keep: str) -> None:
+        if not os.path.isdir(self.root):
+            return
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not name.startswith(".") and os.path.isdir(path):
+                entries.append((os.stat(path).st_mtime, path, _dir_bytes(path)))
+        total = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+
+def load_entry(path: str) -> Tuple[Matrix, List[str]]:
+    """Memory-map the transformed matrix of a cache entry, with its feature names."""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["format"] == "csr":
+        parts = [np.load(os.path.join(path, f"{part}.npy"), mmap_mode="r") for part in ("data", "indices", "indptr")]
+        matrix = sp.csr_matrix(tuple(parts), shape=tuple(meta["shape"]), copy=False)
+    else:
+        matrix = np.load(os.path.join(path, "matrix.npy"), mmap_mode="r")
+    return matrix, meta["feature_names"]
+
+
+def load_transformer(path: str):
+    """The fitted ``ColumnTransformer`` of a cache entry, e.g. to encode the test split."""
+    return joblib.load(os.path.join(path, "transformer.joblib"))
+
+
+@lru_cache(maxsize=None)
+def get_preprocessing_cache() -> PreprocessingCache:
+    """Return the process-wide cache under ``ML_AGENT_PREPROCESS_CACHE_DIR``."""
+    return PreprocessingCache(
+        root=os.getenv("ML_AGENT_PREPROCESS_CACHE_DIR", PREPROCESSING_ROOT),
+        max_bytes=int(os.getenv("ML_AGENT_PREPROCESS_CACHE_BYTES", DEFAULT_MAX_BYTES)),
+    )
+
+
+@tool
+def encode_features(X: pd.DataFrame, config: Optional[Dict[str, Any]] = None, X_test: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """Impute, encode and (optionally) scale a feature frame once, reusing the cached result.
+
+    Transformers are fitted on all rows of `X` and cached by data fingerprint and
+    config, so asking again (e.g. for the final fit after `run_cv`) costs nothing.
+
+    Args:
+        X: Raw training features (categoricals as object/category columns).
+        config: Overrides for the defaults {"numeric_impute": "median", "scale": False, "categorical_impute": "most_frequent", "encode": "onehot", "max_categories": 50, "clean_names": True}. Use the same config you gave `run_cv`.
+        X_test: Optional frame with the same columns, transformed with the transformers fitted on `X`.
+
+    Returns:
+        A dict with `X` (encoded training matrix, dense or scipy CSR), `X_test` (or None),
+        `feature_names` and `transformer` (the fitted ColumnTransformer).
+    """
+    path = get_preprocessing_cache().get_or_fit(X, np.arange(len(X)), "full", config)
+    matrix, names = load_entry(path)
+    transformer = load_transformer(path)
+    return {
+        "X": matrix,
+        "X_test": None if X_test is None else transformer.transform(X_test),
+        "feature_names": names,
+        "transformer": transformer,
+    }
@@ -0,0 +1,262 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from smolagents import tool
+
+from src.utils.dataset_cache import get_dataset_cache
+
+TOP_K_VALUES = 20
+# Splits larger than this (Arrow bytes) are profiled with the streaming sketches.
+DEFAULT_MAX_IN_MEMORY_BYTES = 1 << 30
+
+
+def pandas_dtype_name(arrow_type: pa.DataType) -> str:
+    """Name the pandas dtype a column of ``arrow_type`` converts to."""
+    try:
+        return np.dtype(arrow_type.to_pandas_dtype()).name
+    except (NotImplementedError, TypeError):
+        return "object"
+
+
+def is_numeric(arrow_type: pa.DataType) -> bool:
+    return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_boolean(arrow_type)
+
+
+def missing_count(column: pa.ChunkedArray) -> int:
+    """Nulls plus, for floating columns, NaNs (pandas counts both as missing)."""
+    missing = column.null_count
+    if pa.types.is_floating(column.type):
+        missing += pc.sum(pc.is_nan(column)).as_py() or 0
+    return missing
+
+
+def json_float(value: Optional[float]) -> Optional[float]:
+    if value is None or not np.isfinite(value):
+        return None
+    return float(value)
+
+
+def value_counts(column: pa.ChunkedArray, top_k: Optional[int]) -> Dict[str, int]:
+    counts = pc.value_counts(column.drop_null())
+    pairs = sorted(
+        zip(counts.field("values").to_pylist(), counts.field("counts").to_pylist()),
+        key=lambda kv: kv[1],
+        reverse=True,
+    )
+    if top_k is not None:
+        pairs = pairs[:top_k]
+    return {str(value): int(count) for value, count in pairs}
+
+
+def _column_profile(name: str, column: pa.ChunkedArray, top_k: int) -> Dict[str, Any]:
+    profile: Dict[str, Any] = {
+        "name": name,
+        "dtype": pandas_dtype_name(column.type),
+        "missing": missing_count(column),
+    }
+    if is_numeric(column.type):
+        values = column
+        if pa.types.is_boolean(values.type):
+            values = pc.cast(values, pa.int8())
+        if pa.types.is_floating(values.type):
+            values = pc.if_else(pc.is_nan(values), None, values)
+        min_max = pc.min_max(values)
+        quartiles = pc.quantile(values, q=[0.25, 0.5, 0.75], interpolation="linear").to_pylist()
+        profile["n_unique"] = pc.count_distinct(values, mode="only_valid").as_py()
+        profile["stats"] = {
+            "mean": json_float(pc.mean(values).as_py()),
+            "std": json_float(pc.stddev(values, ddof=1).as_py()),
+            "min": json_float(min_max["min"].as_py()),
+            "p25": json_float(quartiles[0]) if quartiles else None,
+            "median": json_float(quartiles[1]) if quartiles else None,
+            "p75": json_float(quartiles[2]) if quartiles else None,
+            "max": json_float(min_max["max"].as_py()),
+        }
+    else:
+        profile["n_unique"] = pc.count_distinct(column, mode="only_valid").as_py()
+        profile["value_counts"] = value_counts(column, top_k)
+    return profile
+
+
+def numeric_values(column: pa.ChunkedArray) -> np.ndarray:
+    """A numeric column as float64, with NaN for missing values."""
+    if column.null_count == 0 and not pa.types.is_boolean(column.type):
+        return column.to_numpy().astype(np.float64, copy=False)
+    return pc.cast(column, pa.float64()).fill_null(np.nan).to_numpy()
+
+
+def _numeric_matrix(table: pa.Table, names: List[str], max_workers: Optional[int] = None) -> np.ndarray:
+    """Stack numeric columns into a float64 matrix, with NaN for missing values."""
+    # Column-major so each column is written contiguously.
+    matrix = np.empty((table.num_rows, len(names)), dtype=np.float64, order="F")
+
+    def fill(j: int) -> None:
+        matrix[:, j] = numeric_values(table.column(names[j]))
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as pool:
+        list(pool.map(fill, range(len(names))))
+    return matrix
+
+
+def pairwise_moments(matrix: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Sufficient statistics for pairwise-complete Pearson correlations.
+
+    For every column pair ``(i, j)`` this returns, over the rows where both are
+    present: the count, the sum of ``x_i``, the sum of ``x_i ** 2`` and the sum
+    of ``x_i * x_j``. All four are plain sums, so they can be accumulated batch
+    by batch and added together.
+    """
+    present = ~np.isnan(matrix)
+    filled = np.where(present, matrix, 0.0)
+    squared = filled * filled
+    mask = present.astype(np.float64)
+    p = matrix.shape[1]
+
+    # Pairs with a fully observed column j reduce to per-column totals; only
+    # columns that actually have gaps need the masked products.
+    count = np.repeat(mask.sum(axis=0)[:, None], p, axis=1)
+    sum_x = np.repeat(filled.sum(axis=0)[:, None], p, axis=1)
+    sum_xx = np.repeat(squared.sum(axis=0)[:, None], p, axis=1)
+    partial = np.flatnonzero(~present.all(axis=0))
+    if partial.size:
+        count[:, partial] = mask.T @ mask[:, partial]
+        sum_x[:, partial] = filled.T @ mask[:, partial]
+        sum_xx[:, partial] = squared.T @ mask[:, partial]
+    sum_xy = filled.T @ filled
+    return count, sum_x, sum_xx, sum_xy
+
+
+def correlation_from_moments(count, sum_x, sum_xx, sum_xy) -> np.ndarray:
+    """Pearson correlation matrix from :func:`pairwise_moments` sums."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sum_xy - sum_x * sum_x.T / count
+        var_i = sum_xx - sum_x ** 2 / count
+        corr = cov / np.sqrt(var_i * var_i.T)
+    corr[count < 2] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def correlation_matrix(matrix: np.ndarray) -> np.ndarray:
+    """Pearson correlations between columns, pairwise-complete like pandas."""
+    if not np.isnan(matrix).any():
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.atleast_2d(np.corrcoef(matrix, rowvar=False))
+    return correlation_from_moments(*pairwise_moments(matrix))
+
+
+def correlations_to_dict(names: List[str], corr: np.ndarray) -> Dict[str, Dict[str, Optional[float]]]:
+    return {
+        a: {b: json_float(corr[i, j]) for j, b in enumerate(names)}
+        for i, a in enumerate(names)
+    }
+
+
+def assemble_profile(
+    num_samples: int,
+    columns: List[Dict[str, Any]],
+    class_distribution: Dict[str, int],
+    correlations: Dict[str, Dict[str, Optional[float]]],
+    target_column: Optional[str],
+    dataset_path: Optional[str],
+    approximate: bool = False,
+) -> Dict[str, Any]:
+    """Lay out per-column results in the ``analysis_results`` schema."""
+    results: Dict[str, Any] = {
+        "num_samples": num_samples,
+        "num_features": sum(1 for c in columns if c["name"] != target_column),
+        "features": [
+            {
+                "name": c["name"],
+                "dtype": c["dtype"],
+                "pct_missing": round(100.0 * c["missing"] / num_samples, 4) if num_samples else 0.0,
+                "n_unique": c["n_unique"],
+            }
+            for c in columns
+        ],
+        "class_distribution": class_distribution,
+        "numeric_stats": {c["name"]: c["stats"] for c in columns if "stats" in c},
+        "value_counts": {c["name"]: c["value_counts"] for c in columns if "value_counts" in c},
+        "correlations": correlations,
+        "approximate": approximate,
+    }
+    if dataset_path is not None:
+        results["dataset_paths"] = {
+            "train": os.path.join(dataset_path, "train"),
+            "test": os.path.join(dataset_path, "test"),
+            "base_path": dataset_path,
+        }
+    return results
+
+
+def profile_table(
+    table: pa.Table,
+    target_column: Optional[str] = None,
+    dataset_path: Optional[str] = None,
+    top_k: int = TOP_K_VALUES,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Profile an Arrow table in one vectorised pass, one column per thread.
+
+    Arrow compute kernels and the BLAS products behind the correlation matrix
+    release the GIL, so columns are processed in parallel across cores.
+
+    Returns:
+        A dict in the ``analysis_results`` schema used by the analysis agent.
+    """
+    names = table.column_names
+    workers = max_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        columns = list(pool.map(lambda name: _column_profile(name, table.column(name), top_k), names))
+
+    numeric = [name for name in names if is_numeric(table.schema.field(name).type)]
+    correlations = correlations_to_dict(numeric, correlation_matrix(_numeric_matrix(table, numeric, workers))) if numeric else {}
+
+    class_distribution: Dict[str, int] = {}
+    if target_column is not None:
+        if target_column not in names:
+            raise KeyError(f"Target column '{target_column}' not found")
+        class_distribution = value_counts(table.column(target_column), top_k=None)
+
+    return assemble_profile(table.num_rows, columns, class_distribution, correlations, target_column, dataset_path)
+
+
+@tool
+def compute_dataset_profile(path: str, target_column: str, split: str = "train", mode: str = "auto") -> Dict[str, Any]:
+    """Compute the full exploratory profile of a dataset split in one pass.
+
+    Produces every field of the `analysis_results` schema (sample/feature
+    counts, dtypes, % missing and distinct counts, class distribution, numeric
+    mean/std/min/quartiles/max, top value counts for categoricals, and the
+    numeric correlation matrix) directly from the memory-mapped Arrow data.
+    Prefer this over writing pandas code for the same statistics.
+
+    Args:
+        path: Directory where the dataset was stored via `datasets.DatasetDict.save_to_disk()`.
+        target_column: Name of the label column, used for `class_distribution`.
+        split: Split to profile. Defaults to ``'train'``.
+        mode: ``'memory'`` for exact statistics, ``'streaming'`` for a bounded-memory
+            single pass with sketches, or ``'auto'`` (default) to stream only splits
+            larger than ``ML_AGENT_PROFILE_MAX_IN_MEMORY_BYTES``.
+
+    Returns:
+        A dict with keys `num_samples`, `num_features`, `features`,
+        `class_distribution`, `numeric_stats`, `value_counts`, `correlations`,
+        `approximate` and `dataset_paths`. When streamed, also `tolerances`,
+        `value_count_errors` (per categorical column, the most any of its
+        value counts may be low by; 0 when exact) and `class_distribution_error`.
+    """
+    if mode not in ("auto", "memory", "streaming"):
+        raise ValueError(f"Unknown profiling mode '{mode}'")
+    table = get_dataset_cache().get(path)[split].with_format("arrow")[:]
+    if mode == "auto":
+        limit = int(os.getenv("ML_AGENT_PROFILE_MAX_IN_MEMORY_BYTES", DEFAULT_MAX_IN_MEMORY_BYTES))
+        mode = "streaming" if table.nbytes > limit else "memory"
+    if mode == "streaming":
+        from src.utils.streaming_profile import iter_table_batches, profile_stream
+
+        return profile_stream(iter_table_batches(table), table.schema, target_column=target_column, dataset_path=path)
+    return profile_table(table, target_column=target_column, dataset_path=path)
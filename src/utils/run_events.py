@@ -0,0 +1,94 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+_current_run: ContextVar[Optional["RunContext"]] = ContextVar("ml_agent_run", default=None)
+
+
+class RunCancelled(Exception):
+    """Raised inside an agent run once its client has gone away."""
+
+
+class RunContext:
+    """Per-run event sink and cancellation switch shared by every agent in a run.
+
+    Agents attached to the run report each finished step through ``on_event``
+    and are interrupted together when :meth:`cancel` is called.
+    """
+
+    def __init__(self, on_event: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.on_event = on_event
+        self.cancelled = threading.Event()
+        self._agents: List[Any] = []
+        self._lock = threading.Lock()
+
+    def attach(self, agent):
+        """Register ``agent`` so its steps are streamed and it can be interrupted."""
+        from smolagents import ActionStep, PlanningStep
+
+        agent.step_callbacks.register(ActionStep, self._on_step)
+        agent.step_callbacks.register(PlanningStep, self._on_step)
+        with self._lock:
+            self._agents.append(agent)
+        return agent
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def cancel(self) -> None:
+        """Stop every attached agent at its next step boundary."""
+        self.cancelled.set()
+        with self._lock:
+            agents = list(self._agents)
+        for agent in agents:
+            agent.interrupt()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled.is_set():
+            raise RunCancelled("Run cancelled by client")
+
+    def _on_step(self, step, agent=None) -> None:
+        self.raise_if_cancelled()
+        self.emit(step_to_event(step, getattr(agent, "name", None)))
+
+
+def step_to_event(step, agent_name: Optional[str]) -> Dict[str, Any]:
+    """Flatten a smolagents memory step into a JSON-friendly event."""
+    from smolagents import PlanningStep
+
+    if isinstance(step, PlanningStep):
+        return {"type": "plan", "agent": agent_name, "plan": step.plan}
+    return {
+        "type": "step",
+        "agent": agent_name,
+        "step": step.step_number,
+        "thought": step.model_output,
+        "code": step.code_action,
+        "observation": step.observations,
+        "error": str(step.error) if step.error is not None else None,
+        "duration": step.timing.duration if step.timing is not None else None,
+    }
+
+
+def current_run() -> Optional[RunContext]:
+    return _current_run.get()
+
+
+@contextmanager
+def run_scope(run: RunContext):
+    """Make ``run`` the current run for agents created in this context."""
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def attach_to_current_run(agent):
+    """Attach ``agent`` to the current run, if there is one, and return it."""
+    run = current_run()
+    if run is not None:
+        run.attach(agent)
+    return agent
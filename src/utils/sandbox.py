@@ -0,0 +1,584 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from importlib import import_module
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SANDBOXED_AGENTS = "analysis,modeling"
+DEFAULT_WARM_WORKERS = 2
+DEFAULT_MEMORY_MB = 8192
+DEFAULT_CPU_SECONDS = 3600
+DEFAULT_STEP_TIMEOUT = 1800.0
+STARTUP_TIMEOUT = 120.0
+EXIT_TIMEOUT = 2.0
+POLL_SECONDS = 0.2
+CPU_PERIOD_US = 100_000
+# Imported by every worker before it is leased, so no step pays for them.
+PRELOAD = (
+    "numpy", "pandas", "pyarrow", "sklearn", "sklearn.ensemble", "sklearn.linear_model", "sklearn.metrics",
+    "lightgbm", "xgboost", "catboost", "datasets",
+    "src.utils.file_tools", "src.utils.profiling", "src.utils.cross_validation", "src.utils.model_selection",
+    "src.utils.preprocessing_cache", "src.utils.feature_matrix", "src.utils.model_registry",
+)
+
+ToolReference = Tuple[str, str, str]
+
+
+class SandboxError(RuntimeError):
+    """Raised when a worker cannot be started, dies, or runs past its limits."""
+
+
+def sandboxed_agents() -> List[str]:
+    """Agent kinds whose code runs in a worker, from ``ML_AGENT_SANDBOX`` (empty or ``off`` disables)."""
+    value = os.getenv("ML_AGENT_SANDBOX", DEFAULT_SANDBOXED_AGENTS).strip()
+    if value.lower() in ("", "0", "off"):
+        return []
+    return [kind.strip() for kind in value.split(",") if kind.strip()]
+
+
+@dataclass(frozen=True)
+class SandboxLimits:
+    """Resources one agent run may use in its worker; 0 means unlimited."""
+
+    memory_mb: int = DEFAULT_MEMORY_MB
+    cpu_seconds: int = DEFAULT_CPU_SECONDS
+    step_timeout: float = DEFAULT_STEP_TIMEOUT
+    cpus: float = 0.0  # cgroup CPU bandwidth in cores, only with a cgroup root
+
+    @classmethod
+    def from_env(cls) -> "SandboxLimits":
+        return cls(
+            memory_mb=int(os.getenv("ML_AGENT_SANDBOX_MEMORY_MB", DEFAULT_MEMORY_MB)),
+            cpu_seconds=int(os.getenv("ML_AGENT_SANDBOX_CPU_SECONDS", DEFAULT_CPU_SECONDS)),
+            step_timeout=float(os.getenv("ML_AGENT_SANDBOX_STEP_TIMEOUT", DEFAULT_STEP_TIMEOUT)),
+            cpus=float(os.getenv("ML_AGENT_SANDBOX_CPUS", 0)),
+        )
+
+
+def tool_reference(tool) -> Optional[ToolReference]:
+    """How a worker process can rebuild ``tool``: a module attribute, or a class to instantiate.
+
+    Returns None for tools that exist only in this process (e.g. defined in
+    a function), which cannot be sandboxed.
+    """
+    forward = getattr(tool.forward, "__wrapped__", tool.forward)
+    module = sys.modules.get(getattr(forward, "__module__", None) or "")
+    if module is not None and getattr(module, tool.name, None) is tool:
+        return "attribute", module.__name__, tool.name
+    cls = type(tool)
+    if "<locals>" not in cls.__qualname__:
+        return "class", cls.__module__, cls.__qualname__
+    return None
+
+
+# --- worker process -------------------------------------------------------
+
+def _load_tool(reference: ToolReference):
+    how, module_name, name = reference
+    target = import_module(module_name)
+    for part in name.split("."):
+        target = getattr(target, part)
+    return target if how == "attribute" else target()
+
+
+def _timed(tool, calls: List[Tuple[str, int, int, Optional[str]]]) -> None:
+    forward = tool.forward
+
+    def timed_forward(*args, **kwargs):
+        start, error = time.time_ns(), None
+        try:
+            return forward(*args, **kwargs)
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            calls.append((tool.name, start, time.time_ns(), error))
+
+    tool.forward = timed_forward
+
+
+def _apply_rlimits(memory_bytes: int, cpu_seconds: int) -> None:
+    import resource
+
+    if memory_bytes:
+        # RLIMIT_DATA counts the heap and private mappings, i.e. what the code
+        # allocates, without the address space that thread stacks and
+        # libraries merely reserve.
+        resource.setrlimit(resource.RLIMIT_DATA, (memory_bytes, memory_bytes))
+    if cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime)
+        # SIGXCPU at the soft limit, SIGKILL a little later if it is ignored.
+        resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_seconds, used + cpu_seconds + 5))
+
+
+def _portable(value: Any) -> Any:
+    try:
+        pickle.dumps(value)
+        return value
+    except Exception:
+        return repr(value)
+
+
+def _parent_to_normal_priority() -> None:
+    os.sched_setscheduler(os.getppid(), os.SCHED_OTHER, os.sched_param(0))
+
+
+def _start_cv_fork_server(idle: bool) -> None:
+    # run_cv forks its fold workers from a fork server that imports numpy,
+    # pandas and scikit-learn first. Forking one throwaway process waits until
+    # that server has finished its imports, so the run does not pay for them;
+    # a server started at idle priority is then put back to normal, since its
+    # fold workers inherit its priority.
+    from src.utils.cross_validation import get_cv_pool
+
+    get_cv_pool()
+    probe = multiprocessing.get_context("forkserver").Process(target=_parent_to_normal_priority if idle else os.getpid)
+    probe.start()
+    probe.join()
+
+
+def _stop_cv_pool() -> None:
+    # Joining the fold workers (rather than leaving them to be killed) keeps their CPU time in this process tree's accounts.
+    from src.utils.cross_validation import get_cv_pool
+
+    get_cv_pool().shutdown(wait=True, cancel_futures=True)
+
+
+def _can_leave_idle_priority() -> bool:
+    # Unprivileged processes may only return to SCHED_OTHER if RLIMIT_NICE allows nice 0.
+    import resource
+
+    soft = resource.getrlimit(resource.RLIMIT_NICE)[0]
+    return hasattr(os, "SCHED_IDLE") and (os.geteuid() == 0 or soft == resource.RLIM_INFINITY or soft >= 20)
+
+
+def _serve(conn, preload: Tuple[str, ...], background: bool = False, rlimits: Tuple[int, int] = (0, 0)) -> None:
+    """Worker main loop: import the heavy libraries, then run one agent's code step by step.
+
+    The ``(memory bytes, CPU seconds)`` rlimits are applied first, so the CV
+    fork server started below and every fold worker it forks inherit them.
+    A ``background`` worker (a replacement warming up while runs are going)
+    does its imports at idle CPU priority, so it never slows those runs down.
+    """
+    os.setsid()  # own process group, so the worker and everything it spawned are killed together
+    _apply_rlimits(*rlimits)
+    idle = background and _can_leave_idle_priority()
+    if idle:
+        os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+    for name in preload:
+        try:
+            import_module(name)
+        except Exception as e:
+            logger.warning(f"Sandbox worker could not preload {name}: {str(e)}")
+    try:
+        _start_cv_fork_server(idle)
+    except Exception as e:
+        logger.warning(f"Sandbox worker could not start the CV fork server: {str(e)}")
+    if idle:
+        os.sched_setscheduler(0, os.SCHED_OTHER, os.sched_param(0))
+    from smolagents.local_python_executor import LocalPythonExecutor
+
+    executor = None
+    calls: List[Tuple[str, int, int, Optional[str]]] = []
+    conn.send(("ok", os.getpid()))
+    while True:
+        try:
+            op, payload = conn.recv()
+        except (EOFError, OSError):
+            return
+        if op == "exit":
+            _stop_cv_pool()
+            return
+        try:
+            if op == "setup":
+                authorized_imports, max_print_outputs_length, references = payload
+                executor = LocalPythonExecutor(authorized_imports, max_print_outputs_length=max_print_outputs_length)
+                tools = {name: _load_tool(reference) for name, reference in references.items()}
+                for name, tool in tools.items():
+                    if name != "final_answer":
+                        _timed(tool, calls)
+                executor.send_tools(tools)
+                reply = None
+            elif op == "variables":
+                executor.send_variables(payload)
+                reply = None
+            elif op == "run":
+                calls.clear()
+                try:
+                    output = executor(payload)
+                except Exception as e:
+                    conn.send(("error", {"message": str(e), "logs": str(executor.state.get("_print_outputs", "")),
+                                         "calls": list(calls)}))
+                    continue
+                reply = {"output": _portable(output.output), "logs": output.logs,
+                         "is_final_answer": output.is_final_answer, "calls": list(calls)}
+            else:
+                raise ValueError(f"Unknown sandbox operation '{op}'")
+        except Exception as e:
+            conn.send(("failed", f"{type(e).__name__}: {e}"))
+            continue
+        conn.send(("ok", reply))
+
+
+# --- parent side ------------------------------------------------------------
+
+def _exit_reason(code: Optional[int]) -> str:
+    if code == -signal.SIGXCPU:
+        return "exceeded its CPU time limit"
+    if code == -signal.SIGKILL:
+        return "was killed (out of memory, or past its time limit)"
+    return f"exited with code {code}"
+
+
+class Worker:
+    """One sandbox process, leased to a single agent run and discarded afterwards."""
+
+    def __init__(self, context, preload: Tuple[str, ...], background: bool = False,
+                 limits: Optional[SandboxLimits] = None):
+        limits = limits or SandboxLimits(memory_mb=0, cpu_seconds=0)
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, name="ml-agent-sandbox",
+                                       args=(child, preload, background, (limits.memory_mb << 20, limits.cpu_seconds)))
+        self.process.start()
+        child.close()
+        self.ready = False
+        self.cgroup: Optional[str] = None
+        self._closing = threading.Lock()
+        self.closed = False
+
+    def wait_ready(self, timeout: float = STARTUP_TIMEOUT) -> "Worker":
+        if not self.ready:
+            self._receive(timeout)
+            self.ready = True
+        return self
+
+    def call(self, op: str, payload: Any = None, timeout: Optional[float] = None,
+             cancelled: Optional[Callable[[], bool]] = None) -> Tuple[str, Any]:
+        try:
+            self.conn.send((op, payload))
+        except (OSError, ValueError) as e:
+            raise SandboxError(f"Sandbox worker is gone: {str(e)}")
+        status, value = self._receive(timeout, cancelled)
+        if status == "failed":
+            raise SandboxError(f"Sandbox worker could not {op}: {value}")
+        return status, value
+
+    def _receive(self, timeout: Optional[float], cancelled: Optional[Callable[[], bool]] = None) -> Tuple[str, Any]:
+        deadline = time.monotonic() + timeout if timeout else None
+        while not self.conn.poll(POLL_SECONDS):
+            if not self.process.is_alive():
+                self.close()
+                raise SandboxError(f"Sandbox worker {_exit_reason(self.process.exitcode)}")
+            if cancelled is not None and cancelled():
+                self.close()
+                from src.utils.run_events import RunCancelled
+
+                raise RunCancelled("Run cancelled by client")
+            if deadline is not None and time.monotonic() > deadline:
+                self.close()
+                raise SandboxError(f"Sandbox step ran past its {timeout:.0f}s time limit and was stopped")
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            self.process.join(EXIT_TIMEOUT)
+            self.close()
+            raise SandboxError(f"Sandbox worker {_exit_reason(self.process.exitcode)}")
+
+    def limit(self, limits: SandboxLimits, cgroup_root: Optional[str]) -> None:
+        """Put the worker's whole process tree in a cgroup with the per-run limits (its rlimits are set at spawn)."""
+        if cgroup_root:
+            try:
+                self.cgroup = _join_cgroup(cgroup_root, self.process.pid, limits)
+            except OSError as e:
+                logger.warning(f"Could not put sandbox worker {self.process.pid} in a cgroup: {str(e)}")
+
+    def close(self) -> None:
+        with self._closing:
+            if not self.closed:
+                self._close()
+                self.closed = True
+
+    def _close(self) -> None:
+        if self.process.is_alive():
+            try:
+                self.conn.send(("exit", None))
+            except (OSError, ValueError):
+                pass
+            self.process.join(EXIT_TIMEOUT)
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)  # children such as CV pools
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.join(EXIT_TIMEOUT)
+        self.conn.close()
+        if self.cgroup:
+            try:
+                os.rmdir(self.cgroup)
+            except OSError:
+                pass
+            self.cgroup = None
+
+
+def _join_cgroup(root: str, pid: int, limits: SandboxLimits) -> str:
+    path = os.path.join(root, f"worker-{pid}")
+    os.makedirs(path, exist_ok=True)
+    if limits.memory_mb:
+        with open(os.path.join(path, "memory.max"), "w") as f:
+            f.write(str(limits.memory_mb << 20))
+    if limits.cpus:
+        with open(os.path.join(path, "cpu.max"), "w") as f:
+            f.write(f"{int(limits.cpus * CPU_PERIOD_US)} {CPU_PERIOD_US}")
+    with open(os.path.join(path, "cgroup.procs"), "w") as f:
+        f.write(str(pid))
+    return path
+
+
+class WorkerPool:
+    """Pre-warmed sandbox processes for agent-generated code.
+
+    ``size`` workers are kept started and idle, with ``PRELOAD`` imported.
+    Each agent run leases one for all its steps, so interpreter state
+    persists from step to step, and the worker is thrown away when the run
+    ends. Replacements are started in the background once no worker is
+    leased, so warming never competes with a running agent for the machine;
+    with ``rewarm`` false they are only started by :meth:`warm`.
+    Workers are spawned, not forked, so they share nothing with the API
+    process, and each runs in its own process group so it can be stopped
+    along with anything it started.
+    """
+
+    def __init__(self, size: int = DEFAULT_WARM_WORKERS, limits: Optional[SandboxLimits] = None,
+                 preload: Tuple[str, ...] = PRELOAD, cgroup_root: Optional[str] = None, rewarm: bool = True):
+        self.size = size
+        self.limits = limits or SandboxLimits()
+        self.preload = preload
+        self.cgroup_root = cgroup_root
+        self.rewarm = rewarm
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: List[Worker] = []
+        self._starting = 0
+        self._leased = 0
+        self._live: "weakref.WeakSet[Worker]" = weakref.WeakSet()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _spawn(self, background: bool = False) -> Worker:
+        worker = Worker(self._context, self.preload, background, self.limits)
+        with self._cond:
+            self._live.add(worker)
+        return worker
+
+    def _warm_one(self) -> None:
+        try:
+            worker = self._spawn(background=True).wait_ready()
+        except Exception as e:
+            logger.warning(f"Could not start a sandbox worker: {str(e)}")
+            worker = None
+        with self._cond:
+            self._starting -= 1
+            if worker is not None and not self._closed:
+                self._idle.append(worker)
+                worker = None
+            self._cond.notify_all()
+        if worker is not None:
+            worker.close()
+
+    def warm(self) -> None:
+        """Start workers in the background until ``size`` are idle or starting."""
+        with self._cond:
+            missing = 0 if self._closed else self.size - len(self._idle) - self._starting
+            self._starting += max(0, missing)
+        for _ in range(missing):
+            threading.Thread(target=self._warm_one, name="ml-agent-sandbox-warm", daemon=True).start()
+
+    def wait_warm(self, timeout: Optional[float] = None) -> bool:
+        """Block until ``size`` workers are idle (or none are starting any more)."""
+        self.warm()
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self._idle) >= self.size or not self._starting, timeout)
+
+    def lease(self) -> Worker:
+        """An idle worker with the per-run limits applied (a new one if none is idle)."""
+        worker = None
+        with self._cond:
+            if self._closed:
+                raise SandboxError("The sandbox worker pool is shut down")
+            while self._idle and worker is None:
+                worker = self._idle.pop()
+                if not worker.process.is_alive():
+                    worker.close()
+                    worker = None
+            self._leased += 1
+        if worker is None:
+            worker = self._spawn()
+        try:
+            worker.wait_ready()
+            worker.limit(self.limits, self.cgroup_root)
+        except Exception:
+            self.release(worker, wait=True)
+            raise
+        return worker
+
+    def _discard(self, worker: Worker) -> None:
+        worker.close()
+        with self._cond:
+            self._leased -= 1
+            idle = not self._leased
+        if idle and self.rewarm:
+            self.warm()
+
+    def release(self, worker: Worker, wait: bool = False) -> None:
+        """Discard a leased worker, in the background unless ``wait``, and top the pool up if none is leased."""
+        if wait:
+            self._discard(worker)
+        else:
+            threading.Thread(target=self._discard, args=(worker,), name="ml-agent-sandbox-close", daemon=True).start()
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closed = True
+            workers = list(self._live)
+            self._idle.clear()
+        for worker in workers:
+            worker.close()
+
+
+@lru_cache(maxsize=None)
+def get_worker_pool() -> WorkerPool:
+    """The process-wide sandbox pool, sized by ``ML_AGENT_SANDBOX_WORKERS`` and limited by the
+    ``ML_AGENT_SANDBOX_*`` settings (see :class:`SandboxLimits`); ``ML_AGENT_SANDBOX_CGROUP`` names a
+    delegated cgroup v2 directory under which each worker gets its own cgroup, and
+    ``ML_AGENT_SANDBOX_REWARM=0`` stops replacing discarded workers in the background."""
+    pool = WorkerPool(
+        size=int(os.getenv("ML_AGENT_SANDBOX_WORKERS", DEFAULT_WARM_WORKERS)),
+        limits=SandboxLimits.from_env(),
+        cgroup_root=os.getenv("ML_AGENT_SANDBOX_CGROUP") or None,
+        rewarm=os.getenv("ML_AGENT_SANDBOX_REWARM", "1") != "0",
+    )
+    atexit.register(pool.shutdown)
+    return pool
+
+
+class SandboxExecutor:
+    """Stand-in for smolagents' ``LocalPythonExecutor`` that runs each code action in a leased worker.
+
+    The worker runs the same restricted interpreter with the same authorized
+    imports, so agents see no difference except that their code cannot take
+    the API process down with it. Tools are rebuilt in the worker from their
+    module (see :func:`tool_reference`); their calls are reported back as
+    ``tool.call`` spans. If the worker dies or a step overruns its time
+    limit, the step fails and the next one starts on a fresh worker.
+    """
+
+    def __init__(self, authorized_imports: List[str], max_print_outputs_length: Optional[int] = None,
+                 pool: Optional[WorkerPool] = None, cancelled: Optional[Callable[[], bool]] = None):
+        self.authorized_imports = authorized_imports
+        self.max_print_outputs_length = max_print_outputs_length
+        self.pool = pool or get_worker_pool()
+        self.cancelled = cancelled
+        self.state: Dict[str, Any] = {"_print_outputs": ""}  # CodeAgent reads the logs of a failed step from here
+        self._tools: Dict[str, ToolReference] = {}
+        self._variables: Dict[str, Any] = {}
+        self._worker: Optional[Worker] = None
+
+    def _ensure_worker(self) -> Worker:
+        if self._worker is None:
+            worker = self.pool.lease()
+            try:
+                worker.call("setup", (self.authorized_imports, self.max_print_outputs_length, self._tools))
+                if self._variables:
+                    worker.call("variables", self._variables)
+            except Exception:
+                self.pool.release(worker)
+                raise
+            self._worker = worker
+        return self._worker
+
+    def _call(self, op: str, payload: Any, timeout: Optional[float] = None) -> Tuple[str, Any]:
+        worker = self._ensure_worker()
+        try:
+            return worker.call(op, payload, timeout=timeout, cancelled=self.cancelled)
+        except BaseException:
+            if not worker.process.is_alive():
+                self._worker = None
+                self.pool.release(worker)
+            raise
+
+    def send_tools(self, tools: Dict[str, Any]) -> None:
+        references = {name: tool_reference(tool) for name, tool in tools.items()}
+        missing = [name for name, reference in references.items() if reference is None]
+        if missing:
+            raise SandboxError(f"Tools {missing} cannot be rebuilt in a sandbox worker")
+        self._tools = references
+        if self._worker is not None:
+            self._call("setup", (self.authorized_imports, self.max_print_outputs_length, references))
+        else:
+            self._ensure_worker()
+
+    def send_variables(self, variables: Dict[str, Any]) -> None:
+        self._variables.update(variables)
+        if self._worker is not None and variables:
+            self._call("variables", variables)
+
+    def __call__(self, code_action: str):
+        from smolagents.local_python_executor import CodeOutput, InterpreterError
+
+        from src.utils.tracing import record_span
+
+        try:
+            status, result = self._call("run", code_action, timeout=self.pool.limits.step_timeout)
+        except SandboxError as e:
+            self.state["_print_outputs"] = ""
+            raise InterpreterError(f"{e}. Variables from previous steps were lost; recompute what you need.")
+        for name, start_ns, end_ns, error in result["calls"]:
+            record_span("tool.call", start_ns, end_ns, error=error, tool=name)
+        self.state["_print_outputs"] = result["logs"]
+        if status == "error":
+            raise InterpreterError(result["message"])
+        return CodeOutput(output=result["output"], logs=result["logs"], is_final_answer=result["is_final_answer"])
+
+    def cleanup(self) -> None:
+        if self._worker is not None:
+            self.pool.release(self._worker)
+            self._worker = None
+
+
+@contextmanager
+def sandboxed(agent, kind: str) -> Iterator[Any]:
+    """Run ``agent``'s code in a sandbox worker for the duration of the block, if ``kind`` is sandboxed.
+
+    Agents whose tools cannot be rebuilt in a worker keep the in-process interpreter.
+    """
+    if kind not in sandboxed_agents():
+        yield agent
+        return
+    if any(tool_reference(tool) is None for tool in agent.tools.values()):
+        logger.warning(f"Running the {kind} agent without a sandbox: some of its tools cannot be rebuilt in a worker")
+        yield agent
+        return
+    from src.utils.run_events import current_run
+
+    run = current_run()
+    executor = SandboxExecutor(
+        agent.additional_authorized_imports,
+        max_print_outputs_length=agent.max_print_outputs_length,
+        cancelled=run.cancelled.is_set if run is not None else None,
+    )
+    agent.python_executor = executor
+    try:
+        yield agent
+    finally:
+        executor.cleanup()
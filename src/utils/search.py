@@ -0,0 +1,284 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from smolagents import Tool
+
+from src.utils import tracing
+from src.utils.llm_cache import LLMCache
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CORPUS_ROOT = "search_corpus"
+SEARCH_CACHE_ROOT = "search_cache"
+DEFAULT_CACHE_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_CACHE_BYTES = 64 << 20
+DEFAULT_MAX_RESULTS = 10
+BACKENDS = ("auto", "local", "web")
+
+# Notes are indexed in passages of about this many words, so a long document
+# ranks by its best section rather than by its overall word mix.
+PASSAGE_WORDS = 200
+SNIPPET_CHARS = 400
+TEXT_SUFFIXES = (".md", ".markdown", ".txt", ".rst")
+RECORD_SUFFIXES = (".json", ".jsonl")
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+a about an and are as at be best by can do does for from how in into is it its of on or our over that the
+their them these this those to using via vs what when which with within without
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords, with plural endings folded (``models`` -> ``model``)."""
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 4 and token.endswith(("ches", "shes", "sses", "xes")):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query: near-identical queries (case, punctuation,
+    stopwords, plurals, word order, repeated words) normalize to the same string."""
+    return " ".join(sorted(set(tokenize(query))))
+
+
+def _passages(text: str) -> List[Tuple[str, str]]:
+    """Split a note into ``(heading, passage)`` pairs along headings and blank lines."""
+    passages, heading, words = [], "", []
+
+    def flush():
+        if words:
+            passages.append((heading, " ".join(words)))
+            words.clear()
+
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if not block:
+            continue
+        if block.startswith("#"):
+            flush()
+            first, _, rest = block.partition("\n")
+            heading = first.lstrip("#").strip()
+            block = rest.strip()
+        words.extend(block.split())
+        if len(words) >= PASSAGE_WORDS:
+            flush()
+    flush()
+    return passages
+
+
+def _read_documents(root: str) -> List[Dict[str, str]]:
+    """Every searchable passage under ``root``.
+
+    Text and Markdown notes are split into passages; ``.json``/``.jsonl``
+    files hold paper records (``title`` plus ``abstract``/``summary``/``text``
+    and an optional ``url``/``link``), e.g. an arXiv metadata export.
+    """
+    documents = []
+    for directory, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            suffix = os.path.splitext(name)[1].lower()
+            try:
+                if suffix in TEXT_SUFFIXES:
+                    with open(path, encoding="utf-8", errors="replace") as f:
+                        text = f.read()
+                    title = os.path.splitext(name)[0].replace("_", " ").replace("-", " ")
+                    for heading, passage in _passages(text):
+                        documents.append({
+                            "title": f"{title} - {heading}" if heading else title,
+                            "link": os.path.relpath(path, root),
+                            "text": passage,
+                        })
+                elif suffix in RECORD_SUFFIXES:
+                    with open(path, encoding="utf-8") as f:
+                        records = [json.loads(line) for line in f if line.strip()] if suffix == ".jsonl" else json.load(f)
+                    for record in records if isinstance(records, list) else [records]:
+                        text = record.get("abstract") or record.get("summary") or record.get("text") or ""
+                        if record.get("title") or text:
+                            documents.append({
+                                "title": str(record.get("title") or name),
+                                "link": str(record.get("url") or record.get("link") or os.path.relpath(path, root)),
+                                "text": " ".join(str(text).split()),
+                            })
+            except (OSError, ValueError, AttributeError) as e:
+                logger.warning(f"Skipping search corpus file {path}: {str(e)}")
+    return documents
+
+
+def corpus_signature(root: str) -> str:
+    """Hash of the paths, sizes and modification times of the corpus files; changes whenever the corpus does."""
+    digest = hashlib.sha256()
+    for directory, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(names):
+            if name.lower().endswith(TEXT_SUFFIXES + RECORD_SUFFIXES):
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                digest.update(f"{directory}/{name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+class LocalSearchIndex:
+    """In-memory BM25 index over the passages of a directory of notes and papers.
+
+    Titles are indexed with the passage text. Building is a single pass over
+    the corpus; queries only touch the postings of their own terms.
+    """
+
+    def __init__(self, documents: List[Dict[str, str]], signature: str = ""):
+        self.documents = documents
+        self.signature = signature
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._lengths: List[int] = []
+        for doc_id, document in enumerate(documents):
+            counts = Counter(tokenize(f"{document['title']} {document['text']}"))
+            for term, count in counts.items():
+                self._postings[term].append((doc_id, count))
+            self._lengths.append(sum(counts.values()))
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    @classmethod
+    def build(cls, root: str) -> "LocalSearchIndex":
+        return cls(_read_documents(root) if os.path.isdir(root) else [], corpus_signature(root))
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: str, max_results: int = DEFAULT_MAX_RESULTS) -> List[Dict[str, Any]]:
+        """The best ``max_results`` passages for ``query``, as ``{title, link, description, score}``."""
+        scores: Dict[int, float] = defaultdict(float)
+        n = len(self.documents)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / self._average_length)
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:max_results]
+        results = []
+        for doc_id, score in ranked:
+            document = self.documents[doc_id]
+            text = document["text"]
+            results.append({
+                "title": document["title"],
+                "link": document["link"],
+                "description": text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS].rsplit(" ", 1)[0] + " ...",
+                "score": round(score, 3),
+            })
+        return results
+
+
+_index_lock = threading.Lock()
+_indexes: Dict[str, LocalSearchIndex] = {}
+
+
+def get_local_index(root: Optional[str] = None) -> LocalSearchIndex:
+    """The BM25 index of ``root`` (``ML_AGENT_SEARCH_CORPUS``), rebuilt when its files change."""
+    root = os.path.abspath(root or os.getenv("ML_AGENT_SEARCH_CORPUS", SEARCH_CORPUS_ROOT))
+    signature = corpus_signature(root)
+    with _index_lock:
+        index = _indexes.get(root)
+        if index is None or index.signature != signature:
+            index = _indexes[root] = LocalSearchIndex.build(root)
+            logger.info(f"Indexed {len(index)} passages from {root} for local search")
+        return index
+
+
+@lru_cache(maxsize=None)
+def get_search_cache() -> LLMCache:
+    """Return the process-wide search result cache under ``ML_AGENT_SEARCH_CACHE_DIR``."""
+    return LLMCache(
+        root=os.getenv("ML_AGENT_SEARCH_CACHE_DIR", SEARCH_CACHE_ROOT),
+        max_bytes=int(os.getenv("ML_AGENT_SEARCH_CACHE_BYTES", DEFAULT_CACHE_BYTES)),
+        ttl=float(os.getenv("ML_AGENT_SEARCH_CACHE_TTL", DEFAULT_CACHE_TTL_SECONDS)),
+    )
+
+
+def search_settings() -> Tuple[str, bool]:
+    """Backend (``ML_AGENT_SEARCH_BACKEND``) and whether web results are cached (``ML_AGENT_SEARCH_CACHE``)."""
+    backend = os.getenv("ML_AGENT_SEARCH_BACKEND", "auto").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown search backend '{backend}', expected one of {BACKENDS}")
+    return backend, os.getenv("ML_AGENT_SEARCH_CACHE", "on").lower() not in ("0", "off", "false")
+
+
+class SearchTool(Tool):
+    """Drop-in replacement for smolagents' ``WebSearchTool`` with a local index and a result cache.
+
+    Backends (``ML_AGENT_SEARCH_BACKEND``):
+
+    - ``local``: BM25 over the notes and papers in ``ML_AGENT_SEARCH_CORPUS``;
+      never touches the network, for air-gapped machines;
+    - ``web``: DuckDuckGo through ``WebSearchTool``;
+    - ``auto`` (default): the local index when it has matches, the web otherwise.
+
+    Web results are cached on disk by normalized query (see
+    :func:`normalize_query`), so repeated and near-identical queries are
+    answered without a request until the entry is ``ML_AGENT_SEARCH_CACHE_TTL``
+    seconds old.
+    """
+
+    name = "web_search"
+    description = ("Searches local research notes and papers, then the web, for a query and returns the top results "
+                   "formatted as markdown with titles, links, and descriptions.")
+    inputs = {"query": {"type": "string", "description": "The search query to perform."}}
+    output_type = "string"
+
+    def __init__(self, max_results: int = DEFAULT_MAX_RESULTS):
+        super().__init__()
+        self.max_results = max_results
+
+    def forward(self, query: str) -> str:
+        backend, cached = search_settings()
+        with tracing.span("search.query", **{"search.backend": backend}) as span:
+            results, source = self.search(query, backend, cached)
+            if span is not None:
+                span.set(**{"search.source": source, "search.results": len(results)})
+        if not results:
+            raise Exception("No results found! Try a less restrictive/shorter query.")
+        return "## Search Results\n\n" + "\n\n".join(
+            f"[{result['title']}]({result['link']})\n{result['description']}" for result in results
+        )
+
+    def search(self, query: str, backend: str = "auto", cached: bool = True) -> Tuple[List[Dict[str, Any]], str]:
+        """Results for ``query`` and where they came from (``local``, ``cache`` or ``web``)."""
+        if backend in ("auto", "local"):
+            results = get_local_index().search(query, self.max_results)
+            if results or backend == "local":
+                return results, "local"
+
+        key = hashlib.sha256(f"{self.max_results}:{normalize_query(query)}".encode()).hexdigest()
+        if cached:
+            entry = get_search_cache().get(key)
+            if entry is not None:
+                return entry["results"], "cache"
+        from smolagents import WebSearchTool
+
+        results = WebSearchTool(max_results=self.max_results).search(query)[:self.max_results]
+        if cached and results:
+            get_search_cache().put(key, {"query": query, "results": results})
+        return results, "web"
@@ -0,0 +1,411 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.model_registry import ModelRegistry, get_model_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 256
+# 0 = no deliberate wait: a batch is whatever queued up while the previous one ran,
+# so an idle server answers immediately and a busy one batches automatically.
+DEFAULT_MAX_WAIT_MS = 0.0
+MAX_SERVED_MODELS = 8
+# How long the latest registered version of a model is trusted before the
+# registry is looked at again, so /predict does not hit the disk per request.
+LATEST_VERSION_TTL = 1.0
+
+# Queued behind every pending request to stop a batcher once they are scored.
+_CLOSE = object()
+
+
+class InvalidRequest(ValueError):
+    pass
+
+
+class BatcherClosed(RuntimeError):
+    """Raised by a batcher that was evicted before the request reached it."""
+
+
+class ServedModel:
+    """A registered model held in memory, turning JSON rows into its training frame layout."""
+
+    def __init__(self, model: Any, manifest: Dict[str, Any], compiled=None):
+        self.model = model
+        self.manifest = manifest
+        self.compiled = compiled
+        # Batches up to this size go through the compiled kernel; larger ones are faster natively.
+        self.compiled_max_rows = (manifest.get("compiled") or {}).get("max_rows", 0) if compiled is not None else 0
+        self.features = manifest["features"]
+        self.names = [f["name"] for f in self.features]
+        self.classes = manifest.get("classes")
+        self._numeric = [j for j, f in enumerate(self.features) if f["dtype"] != "category"]
+        self._codes = {j: {c: i for i, c in enumerate(f["categories"])}
+                       for j, f in enumerate(self.features) if f["dtype"] == "category"}
+
+    def validate(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            raise InvalidRequest("No instances to score")
+        for i, row in enumerate(rows):
+            if not isinstance(row, dict):
+                raise InvalidRequest(f"Instance {i} is not an object")
+            missing = [name for name in self.names if name not in row]
+            if missing:
+                raise InvalidRequest(f"Instance {i} is missing features: {missing[:10]}")
+
+    def frame(self, rows: List[Dict[str, Any]]) -> pd.DataFrame:
+        columns = {}
+        for feature in self.features:
+            name, dtype = feature["name"], feature["dtype"]
+            values = [row[name] for row in rows]
+            if dtype == "category":
+                columns[name] = pd.Categorical(values, categories=feature["categories"])
+            elif dtype in ("object", "str", "string"):
+                columns[name] = np.asarray(values, dtype=object)
+            else:
+                try:
+                    columns[name] = np.asarray(values, dtype=dtype)
+                except (TypeError, ValueError):
+                    # e.g. a null in an integer column; floats keep it as NaN
+                    columns[name] = np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+        return pd.DataFrame(columns)
+
+    def frame_from_table(self, table) -> pd.DataFrame:
+        """Select and cast the model's features from an Arrow table, in schema order.
+
+        Input columns match a feature exactly or after the same cleaning as
+        ``preprocessing_cache.clean_feature_name``; a categorical feature can
+        also be rebuilt from its one-hot columns (``<feature>_<level>``).
+        """
+        from src.utils.preprocessing_cache import clean_feature_name
+
+        available = {name: name for name in table.column_names}
+        cleaned = {clean_feature_name(name): name for name in table.column_names}
+        columns, missing = {}, []
+        for feature in self.features:
+            name = feature["name"]
+            source = available.get(name) or cleaned.get(clean_feature_name(name))
+            if source is not None:
+                columns[name] = self._cast(feature, table.column(source).to_pandas())
+            elif feature["dtype"] == "category" and self._has_one_hot(feature, available):
+                columns[name] = self._pack(feature, table)
+            else:
+                missing.append(name)
+        if missing:
+            raise InvalidRequest(f"Input is missing features: {missing[:10]}")
+        return pd.DataFrame(columns)
+
+    @staticmethod
+    def _cast(feature: Dict[str, Any], values: pd.Series):
+        dtype = feature["dtype"]
+        if dtype == "category":
+            return pd.Categorical(values, categories=feature["categories"])
+        if dtype in ("object", "str", "string") or str(values.dtype) == dtype:
+            return values.to_numpy()
+        try:
+            return values.to_numpy(dtype=dtype)
+        except (TypeError, ValueError):
+            return values.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    @staticmethod
+    def _one_hot_names(feature: Dict[str, Any]) -> List[List[str]]:
+        from src.utils.feature_matrix import ONE_HOT_SEPARATORS
+
+        return [[f"{feature['name']}{sep}{level}" for level in feature["categories"]] for sep in ONE_HOT_SEPARATORS]
+
+    def _has_one_hot(self, feature: Dict[str, Any], available: Dict[str, str]) -> bool:
+        return any(all(name in available for name in names) for names in self._one_hot_names(feature))
+
+    def _pack(self, feature: Dict[str, Any], table) -> pd.Categorical:
+        names = next(n for n in self._one_hot_names(feature) if all(name in table.column_names for name in n))
+        block = np.column_stack([table.column(name).to_numpy(zero_copy_only=False) for name in names]).astype(np.uint8)
+        codes = np.where(block.any(axis=1), block.argmax(axis=1), -1)
+        return pd.Categorical.from_codes(codes, categories=feature["categories"])
+
+    def matrix(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        """JSON rows straight to the compiled model's float64 input, skipping pandas."""
+        matrix = np.empty((len(rows), len(self.features)), dtype=np.float64)
+        names = [self.names[j] for j in self._numeric]
+        matrix[:, self._numeric] = np.array([[row[name] for name in names] for row in rows], dtype=np.float64)
+        for j, codes in self._codes.items():
+            name = self.names[j]
+            matrix[:, j] = [codes.get(row[name], np.nan) for row in rows]
+        return matrix
+
+    def predict_proba(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        if len(rows) <= self.compiled_max_rows:
+            return np.asarray(self.compiled.predict_proba(self.matrix(rows)), dtype=np.float64)
+        return self.predict_frame(self.frame(rows))
+
+    def predict_frame(self, frame: pd.DataFrame) -> np.ndarray:
+        if len(frame) <= self.compiled_max_rows:
+            from src.utils.tree_compiler import to_matrix
+
+            return np.asarray(self.compiled.predict_proba(to_matrix(frame, self.features)), dtype=np.float64)
+        return np.asarray(self.model.predict_proba(frame), dtype=np.float64)
+
+
+def load_served(registry: ModelRegistry, name: str, version: int) -> ServedModel:
+    """Load a registered version with its compiled tree kernel, when it has one."""
+    from src.utils.tree_compiler import load_compiled
+
+    model, manifest = registry.load(name, version)
+    return ServedModel(model, manifest, load_compiled(registry.path(name, manifest["version"])))
+
+
+class MicroBatcher:
+    """Coalesce concurrent requests for one model into vectorised ``predict_proba`` calls.
+
+    A single consumer task takes the first queued request, adds every request
+    already waiting (up to ``max_batch`` rows, optionally waiting up to
+    ``max_wait_ms`` for more) and scores them in one call on a dedicated
+    thread, so the event loop never blocks on the model. :meth:`close` may be
+    called from any thread; requests already queued are still answered.
+    """
+
+    def __init__(self, served: ServedModel, max_batch: int = DEFAULT_MAX_BATCH, max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.served = served
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="predict")
+        self.batches = 0
+        self.rows = 0
+
+    async def predict(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        self.served.validate(rows)
+        if self._closed:
+            raise BatcherClosed("The model was unloaded")
+        loop = asyncio.get_running_loop()
+        if self._consumer is None or self._consumer.done():
+            self._queue = asyncio.Queue()
+            self._loop = loop
+            self._consumer = loop.create_task(self._consume())
+        future = loop.create_future()
+        self._queue.put_nowait((rows, future))
+        return await future
+
+    async def _next(self, deadline: float):
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                return None
+            try:
+                return await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+    async def _consume(self) -> None:
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            first = await self._queue.get()
+            if first is _CLOSE:
+                break
+            batch = [first]
+            size = len(first[0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                item = await self._next(deadline)
+                if item is None or item is _CLOSE:
+                    closing = item is _CLOSE
+                    break
+                batch.append(item)
+                size += len(item[0])
+            batch = [(rows, future) for rows, future in batch if not future.cancelled()]
+            if batch:
+                await loop.run_in_executor(self._executor, self._score, batch, loop)
+        self._executor.shutdown(wait=False)
+
+    def _score(self, batch: List[Tuple[List[Dict[str, Any]], asyncio.Future]], loop) -> None:
+        rows = [row for request_rows, _ in batch for row in request_rows]
+        try:
+            proba = self.served.predict_proba(rows)
+        except Exception as e:
+            if len(batch) == 1:
+                loop.call_soon_threadsafe(_set_exception, batch[0][1], e)
+                return
+            # Score requests one by one so a malformed one fails alone.
+            for request in batch:
+                self._score([request], loop)
+            return
+        self.batches += 1
+        self.rows += len(rows)
+        offset = 0
+        for request_rows, future in batch:
+            part = proba[offset:offset + len(request_rows)]
+            offset += len(request_rows)
+            loop.call_soon_threadsafe(_set_result, future, part)
+
+    def close(self) -> None:
+        """Stop accepting requests and shut down once the queued ones are scored."""
+        loop, consumer = self._loop, self._consumer
+        if consumer is None or consumer.done() or loop.is_closed():
+            self._closed = True
+            self._executor.shutdown(wait=False)
+            return
+        try:
+            loop.call_soon_threadsafe(self._stop)
+        except RuntimeError:  # the loop closed meanwhile
+            self._closed = True
+            self._executor.shutdown(wait=False)
+
+    def _stop(self) -> None:
+        self._closed = True
+        self._queue.put_nowait(_CLOSE)
+
+
+def _set_result(future: asyncio.Future, value: Any) -> None:
+    if not future.done():
+        future.set_result(value)
+
+
+def _set_exception(future: asyncio.Future, error: BaseException) -> None:
+    if not future.done():
+        future.set_exception(error)
+
+
+class ModelServer:
+    """Warm models from the registry, each behind its own :class:`MicroBatcher`.
+
+    Models are loaded on first use (or by :meth:`preload`) and kept in memory;
+    the least recently used is dropped once more than ``max_models`` are held.
+    Loading happens outside the lock, once per model however many requests
+    wait for it. A request without a version is served by the latest
+    registered one, as seen at most ``LATEST_VERSION_TTL`` seconds ago.
+    """
+
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        max_models: int = MAX_SERVED_MODELS,
+    ):
+        self.registry = registry
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.max_models = max_models
+        self._batchers: "OrderedDict[Tuple[str, int], MicroBatcher]" = OrderedDict()
+        self._loading: Dict[Tuple[str, int], Future] = {}
+        self._latest: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, name: str, version: Optional[int]) -> int:
+        if version is not None:
+            return self.registry.resolve(name, version)
+        version = self.registry.resolve(name)
+        with self._lock:
+            self._latest[name] = (version, time.monotonic() + LATEST_VERSION_TTL)
+        return version
+
+    def batcher(self, name: str, version: Optional[int] = None) -> MicroBatcher:
+        key = (name, self._resolve(name, version))
+        with self._lock:
+            batcher = self._batchers.get(key)
+            if batcher is not None:
+                self._batchers.move_to_end(key)
+                return batcher
+            loading = self._loading.get(key)
+            if loading is None:
+                loading = self._loading[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return loading.result()
+
+        try:
+            served = load_served(self.registry, *key)
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(key, None)
+            loading.set_exception(e)
+            raise
+        batcher = MicroBatcher(served, self.max_batch, self.max_wait_ms)
+        evicted = []
+        with self._lock:
+            self._loading.pop(key, None)
+            self._batchers[key] = batcher
+            while len(self._batchers) > self.max_models:
+                evicted.append(self._batchers.popitem(last=False)[1])
+        loading.set_result(batcher)
+        logger.info(f"Loaded model {key[0]} v{key[1]} for serving (compiled={served.compiled is not None})")
+        for old in evicted:
+            old.close()
+        return batcher
+
+    def preload(self, names: List[str]) -> None:
+        for name in names:
+            self.batcher(name)
+
+    async def predict(self, name: str, rows: List[Dict[str, Any]], version: Optional[int] = None) -> Dict[str, Any]:
+        for attempt in range(2):
+            batcher = self._batchers_fast(name, version)
+            if batcher is None:
+                # Resolving reads the registry and loading unpickles the model: keep both off the event loop.
+                batcher = await asyncio.get_running_loop().run_in_executor(None, self.batcher, name, version)
+            try:
+                proba = await batcher.predict(rows)
+                break
+            except BatcherClosed:
+                if attempt:
+                    raise
+        served = batcher.served
+        classes = served.classes
+        labels = None if classes is None else [classes[i] for i in proba.argmax(axis=1)]
+        return {
+            "model": served.manifest["name"],
+            "version": served.manifest["version"],
+            "classes": classes,
+            "probabilities": proba.tolist(),
+            "predictions": labels,
+        }
+
+    def _batchers_fast(self, name: str, version: Optional[int]) -> Optional[MicroBatcher]:
+        """The batcher for a loaded model without touching the disk, or ``None``."""
+        with self._lock:
+            if version is None:
+                latest = self._latest.get(name)
+                if latest is None or latest[1] < time.monotonic():
+                    return None
+                version = latest[0]
+            batcher = self._batchers.get((name, version))
+            if batcher is not None:
+                self._batchers.move_to_end((name, version))
+            return batcher
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"model": name, "version": version, "batches": b.batches, "rows": b.rows}
+                    for (name, version), b in self._batchers.items()]
+
+    def close(self) -> None:
+        with self._lock:
+            for batcher in self._batchers.values():
+                batcher.close()
+            self._batchers.clear()
+
+
+@lru_cache(maxsize=None)
+def get_model_server() -> ModelServer:
+    """Process-wide server; batching is tuned by ``ML_AGENT_PREDICT_MAX_BATCH`` / ``ML_AGENT_PREDICT_MAX_WAIT_MS``."""
+    return ModelServer(
+        get_model_registry(),
+        max_batch=int(os.getenv("ML_AGENT_PREDICT_MAX_BATCH", DEFAULT_MAX_BATCH)),
+        max_wait_ms=float(os.getenv("ML_AGENT_PREDICT_MAX_WAIT_MS", DEFAULT_MAX_WAIT_MS)),
+    )
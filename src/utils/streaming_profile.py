@@ -0,0 +1,248 @@
+import warnings
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.utils.profiling import (
+    TOP_K_VALUES,
+    assemble_profile,
+    correlation_from_moments,
+    correlations_to_dict,
+    is_numeric,
+    json_float,
+    missing_count,
+    numeric_values,
+    pairwise_moments,
+    pandas_dtype_name,
+)
+from src.utils.sketches import HyperLogLog, RunningMoments, TDigest, TopK
+
+DEFAULT_BATCH_ROWS = 64 * 1024
+# Numeric columns with at most this many distinct values keep exact counts,
+# so quartiles of flags and codes are exact rather than t-digest estimates.
+EXACT_VALUES_LIMIT = 1024
+
+# Documented agreement with the in-memory profile (profiling.profile_table).
+TOLERANCES = {
+    "num_samples, pct_missing, min, max": "exact",
+    "mean, std, correlations": "exact up to floating-point rounding (~1e-9 relative)",
+    "n_unique": "HyperLogLog estimate, ~0.8% relative standard error (exact-ish below ~40k distinct)",
+    "p25, median, p75": "exact for columns with <= 1024 distinct values, "
+                        "otherwise a t-digest estimate with typically < 1% rank error",
+    "value_counts, class_distribution": "exact while a column has <= 1024 distinct values; otherwise each "
+                                        "count may be low by at most value_count_errors[column] "
+                                        "(class_distribution_error for the target)",
+}
+
+
+class _ColumnSketch:
+    def __init__(self, name: str, arrow_type: pa.DataType):
+        self.name = name
+        self.arrow_type = arrow_type
+        self.numeric = is_numeric(arrow_type)
+        self.missing = 0
+        self.distinct = HyperLogLog()
+        if self.numeric:
+            self.moments = RunningMoments()
+            self.digest = TDigest()
+            self.exact: Optional[Dict[float, int]] = {}
+        else:
+            self.top = TopK()
+
+    def update(self, column: pa.ChunkedArray) -> None:
+        self.missing += missing_count(column)
+        if self.numeric:
+            values = numeric_values(column)
+            self.moments.update(values)
+            self.digest.update(values)
+            # Hash each distinct value once per batch rather than every row.
+            counts = pc.value_counts(pa.array(values[~np.isnan(values)]))
+            uniques = counts.field("values").to_numpy()
+            self.distinct.update(uniques)
+            if self.exact is not None:
+                self._add_exact(dict(zip(uniques.tolist(), counts.field("counts").to_pylist())))
+        else:
+            counts = pc.value_counts(column.drop_null())
+            values = counts.field("values").to_pylist()
+            self.top.update_counts(values, counts.field("counts").to_pylist())
+            self.distinct.update(np.asarray(values, dtype=object))
+
+    def merge(self, other: "_ColumnSketch") -> None:
+        self.missing += other.missing
+        self.distinct.merge(other.distinct)
+        if self.numeric:
+            self.moments.merge(other.moments)
+            self.digest.merge(other.digest)
+            self._add_exact(other.exact)
+        else:
+            self.top.merge(other.top)
+
+    def _add_exact(self, counts: Optional[Dict[float, int]]) -> None:
+        if self.exact is None:
+            return
+        if counts is None or len(counts) > EXACT_VALUES_LIMIT:
+            self.exact = None
+            return
+        for value, count in counts.items():
+            self.exact[value] = self.exact.get(value, 0) + count
+        if len(self.exact) > EXACT_VALUES_LIMIT:
+            self.exact = None
+
+    def _quantile(self, q: float) -> Optional[float]:
+        if self.exact is None:
+            return self.digest.quantile(q)
+        if not self.exact:
+            return None
+        values = np.array(sorted(self.exact))
+        ends = np.cumsum([self.exact[v] for v in values])
+        rank = q * (ends[-1] - 1)
+        # Linear interpolation between the order statistics around ``rank``.
+        below = values[np.searchsorted(ends, np.floor(rank), side="right")]
+        above = values[np.searchsorted(ends, np.ceil(rank), side="right")]
+        return float(below + (above - below) * (rank - np.floor(rank)))
+
+    def finish(self, top_k: int) -> Dict[str, Any]:
+        profile: Dict[str, Any] = {
+            "name": self.name,
+            "dtype": pandas_dtype_name(self.arrow_type),
+            "missing": self.missing,
+            "n_unique": self.distinct.estimate(),
+        }
+        if self.numeric:
+            m = self.moments
+            profile["stats"] = {
+                "mean": json_float(m.mean) if m.count else None,
+                "std": json_float(m.std),
+                "min": json_float(m.min) if m.count else None,
+                "p25": json_float(self._quantile(0.25)),
+                "median": json_float(self._quantile(0.5)),
+                "p75": json_float(self._quantile(0.75)),
+                "max": json_float(m.max) if m.count else None,
+            }
+        else:
+            profile["value_counts"] = {str(v): c for v, c in self.top.top(top_k).items()}
+        return profile
+
+
+class _CorrelationAccumulator:
+    """Running pairwise-complete moments; memory is O(columns ** 2)."""
+
+    def __init__(self, names: List[str]):
+        self.names = names
+        self.shift: Optional[np.ndarray] = None
+        self.moments: Optional[List[np.ndarray]] = None
+
+    def update(self, table: pa.Table) -> None:
+        if not self.names:
+            return
+        matrix = np.empty((table.num_rows, len(self.names)), dtype=np.float64, order="F")
+        for j, name in enumerate(self.names):
+            matrix[:, j] = numeric_values(table.column(name))
+        if self.shift is None:
+            # Centre on the first batch's means so the sums don't cancel
+            # catastrophically; correlations are shift-invariant.
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+                self.shift = np.nan_to_num(np.nanmean(matrix, axis=0))
+        batch = pairwise_moments(matrix - self.shift)
+        self.moments = list(batch) if self.moments is None else [a + b for a, b in zip(self.moments, batch)]
+
+    def merge(self, other: "_CorrelationAccumulator") -> None:
+        if other.moments is None:
+            return
+        if self.moments is None:
+            self.shift, self.moments = other.shift, [m.copy() for m in other.moments]
+            return
+        # Re-express the other side's sums around this side's shift.
+        count, sum_x, sum_xx, sum_xy = other.moments
+        d = (other.shift - self.shift)[:, None]
+        sum_xy = sum_xy + d * sum_x.T + sum_x * d.T + count * d * d.T
+        sum_xx = sum_xx + 2 * d * sum_x + count * d * d
+        sum_x = sum_x + count * d
+        self.moments = [a + b for a, b in zip(self.moments, (count, sum_x, sum_xx, sum_xy))]
+
+    def correlations(self) -> Dict[str, Dict[str, Optional[float]]]:
+        if self.moments is None:
+            return {}
+        return correlations_to_dict(self.names, correlation_from_moments(*self.moments))
+
+
+class StreamingProfiler:
+    """Single-pass, bounded-memory profiler over record batches.
+
+    Feed batches with :meth:`update` (or combine profilers built on different
+    shards with :meth:`merge`), then call :meth:`result` for a dict in the same
+    ``analysis_results`` schema as :func:`profiling.profile_table`, flagged
+    ``"approximate": True`` and carrying the ``tolerances`` it meets, with
+    the Misra-Gries error bound of every value count.
+    """
+
+    def __init__(self, schema: pa.Schema, target_column: Optional[str] = None):
+        if target_column is not None and target_column not in schema.names:
+            raise KeyError(f"Target column '{target_column}' not found")
+        self.schema = schema
+        self.target_column = target_column
+        self.num_rows = 0
+        self.columns = [_ColumnSketch(field.name, field.type) for field in schema]
+        self.correlations = _CorrelationAccumulator(
+            [field.name for field in schema if is_numeric(field.type)]
+        )
+        self.classes = TopK(capacity=1 << 16)
+
+    def update(self, batch: Union[pa.RecordBatch, pa.Table]) -> None:
+        table = pa.Table.from_batches([batch]) if isinstance(batch, pa.RecordBatch) else batch
+        self.num_rows += table.num_rows
+        for sketch in self.columns:
+            sketch.update(table.column(sketch.name))
+        self.correlations.update(table)
+        if self.target_column is not None:
+            counts = pc.value_counts(table.column(self.target_column).drop_null())
+            self.classes.update_counts(counts.field("values").to_pylist(), counts.field("counts").to_pylist())
+
+    def merge(self, other: "StreamingProfiler") -> None:
+        self.num_rows += other.num_rows
+        for mine, theirs in zip(self.columns, other.columns):
+            mine.merge(theirs)
+        self.correlations.merge(other.correlations)
+        self.classes.merge(other.classes)
+
+    def result(self, dataset_path: Optional[str] = None, top_k: int = TOP_K_VALUES) -> Dict[str, Any]:
+        class_distribution = (
+            {str(v): c for v, c in self.classes.top().items()} if self.target_column is not None else {}
+        )
+        results = assemble_profile(
+            self.num_rows,
+            [sketch.finish(top_k) for sketch in self.columns],
+            class_distribution,
+            self.correlations.correlations(),
+            self.target_column,
+            dataset_path,
+            approximate=True,
+        )
+        results["value_count_errors"] = {sketch.name: sketch.top.error for sketch in self.columns if not sketch.numeric}
+        if self.target_column is not None:
+            results["class_distribution_error"] = self.classes.error
+        results["tolerances"] = TOLERANCES
+        return results
+
+
+def iter_table_batches(table: pa.Table, rows: int = DEFAULT_BATCH_ROWS) -> Iterator[pa.Table]:
+    """Zero-copy row slices of a (typically memory-mapped) table."""
+    for offset in range(0, table.num_rows, rows):
+        yield table.slice(offset, rows)
+
+
+def profile_stream(
+    batches: Iterable[Union[pa.RecordBatch, pa.Table]],
+    schema: pa.Schema,
+    target_column: Optional[str] = None,
+    dataset_path: Optional[str] = None,
+    top_k: int = TOP_K_VALUES,
+) -> Dict[str, Any]:
+    """Profile a stream of record batches in one pass with bounded memory."""
+    profiler = StreamingProfiler(schema, target_column)
+    for batch in batches:
+        profiler.update(batch)
+    return profiler.result(dataset_path=dataset_path, top_k=top_k)
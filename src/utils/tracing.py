@@ -0,0 +1,317 @@
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE = "traces/traces.jsonl"
+SERVICE_NAME = "ml-agent"
+SLOWEST_SPANS = 5
+
+# OTLP enums
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_tracer: ContextVar[Optional["Tracer"]] = ContextVar("ml_agent_tracer", default=None)
+_span: ContextVar[Optional["Span"]] = ContextVar("ml_agent_span", default=None)
+
+
+@dataclass
+class Span:
+    """One timed operation of a run, shaped after an OpenTelemetry span."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    kind: int = SPAN_KIND_INTERNAL
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def seconds(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes) -> None:
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_OK},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Tracer:
+    """Collects the spans of one run (one trace), from any thread of the run."""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def start(self, name: str, parent: Optional[Span], kind: int = SPAN_KIND_INTERNAL, **attributes) -> Span:
+        span = Span(name, self.trace_id, secrets.token_hex(8), parent.span_id if parent else None, time.time_ns(), kind=kind)
+        span.set(**attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def add_step(self, step, agent_name: Optional[str], parent: Optional[Span]) -> None:
+        """Record a finished agent step and adopt the spans that ran inside it.
+
+        smolagents only reports a step once it is over, so its LLM request and
+        tool calls were opened under the agent's span; they move under the
+        step whose time range contains them.
+        """
+        if step.timing is None or step.timing.end_time is None:
+            return
+        span = self.start("agent.step", parent, agent=agent_name, step=step.step_number)
+        span.start_ns, span.end_ns = int(step.timing.start_time * 1e9), int(step.timing.end_time * 1e9)
+        usage = step.token_usage
+        span.set(**{
+            "gen_ai.usage.input_tokens": usage.input_tokens if usage else None,
+            "gen_ai.usage.output_tokens": usage.output_tokens if usage else None,
+        })
+        if step.error is not None:
+            span.error = str(step.error)
+        parent_id = parent.span_id if parent else None
+        with self._lock:
+            for other in self.spans:
+                if (other is not span and other.parent_id == parent_id and other.name != "agent.step"
+                        and span.start_ns <= other.start_ns and (other.end_ns or span.end_ns) <= span.end_ns):
+                    other.parent_id = span.span_id
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """The trace as an OTLP/JSON ``ExportTraceServiceRequest``."""
+        with self._lock:
+            spans = [span.to_otlp() for span in self.spans]
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }]
+        }
+
+    def _agent_of(self, span: Span, by_id: Dict[str, Span]) -> Optional[str]:
+        while span is not None:
+            if span.name == "agent.run":
+                return span.attributes.get("agent")
+            span = by_id.get(span.parent_id)
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        """Where the time, tokens and cost of the run went, per agent, tool and LLM call."""
+        with self._lock:
+            spans = list(self.spans)
+        by_id = {span.span_id: span for span in spans}
+        roots = [span for span in spans if span.parent_id is None]
+        llm = {"calls": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0, "cached_input_tokens": 0,
+               "response_cache_hits": 0, "retries": 0, "cost_usd": 0.0, "errors": 0}
+        agents: Dict[str, Dict[str, Any]] = {}
+        tools: Dict[str, Dict[str, Any]] = {}
+        code = {"calls": 0, "seconds": 0.0, "errors": 0}
+
+        def agent_entry(name: Optional[str]) -> Dict[str, Any]:
+            return agents.setdefault(name, {"runs": 0, "steps": 0, "seconds": 0.0, "llm_calls": 0,
+                                            "input_tokens": 0, "output_tokens": 0})
+
+        for span in spans:
+            a = span.attributes
+            if span.name == "agent.run":
+                entry = agent_entry(a.get("agent"))
+                entry["runs"] += 1
+                entry["seconds"] += span.seconds
+            elif span.name == "agent.step":
+                agent_entry(a.get("agent"))["steps"] += 1
+            elif span.name == "llm.request":
+                llm["calls"] += 1
+                llm["seconds"] += span.seconds
+                llm["input_tokens"] += a.get("gen_ai.usage.input_tokens", 0)
+                llm["output_tokens"] += a.get("gen_ai.usage.output_tokens", 0)
+                llm["cached_input_tokens"] += a.get("llm.cached_input_tokens", 0)
+                llm["response_cache_hits"] += a.get("llm.response_cache") == "hit"
+                llm["retries"] += a.get("llm.retries", 0)
+                llm["cost_usd"] += a.get("llm.cost_usd", 0.0)
+                llm["errors"] += span.error is not None
+                name = self._agent_of(span, by_id)
+                if name is not None:
+                    agent = agent_entry(name)
+                    agent["llm_calls"] += 1
+                    agent["input_tokens"] += a.get("gen_ai.usage.input_tokens", 0)
+                    agent["output_tokens"] += a.get("gen_ai.usage.output_tokens", 0)
+            elif span.name == "tool.call":
+                entry = tools.setdefault(a.get("tool"), {"calls": 0, "seconds": 0.0, "errors": 0})
+                entry["calls"] += 1
+                entry["seconds"] += span.seconds
+                entry["errors"] += span.error is not None
+            elif span.name == "code.execute":
+                code["calls"] += 1
+                code["seconds"] += span.seconds
+                code["errors"] += span.error is not None
+        leaves = [span for span in spans if span.name in ("llm.request", "tool.call", "code.execute")]
+        slowest = sorted(leaves, key=lambda span: span.seconds, reverse=True)[:SLOWEST_SPANS]
+        return {
+            "trace_id": self.trace_id,
+            "seconds": sum(span.seconds for span in roots),
+            "spans": len(spans),
+            "llm": llm,
+            "agents": agents,
+            "tools": tools,
+            "code_execution": code,
+            "slowest": [{"name": span.name, "seconds": span.seconds, "agent": self._agent_of(span, by_id),
+                         **({"tool": span.attributes["tool"]} if "tool" in span.attributes else {})} for span in slowest],
+        }
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _tracer.get()
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes) -> Iterator[Optional[Span]]:
+    """Time the block as a child of the current span; a no-op outside a traced run."""
+    tracer = _tracer.get()
+    if tracer is None:
+        yield None
+        return
+    current = tracer.start(name, _span.get(), kind=kind, **attributes)
+    token = _span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _span.reset(token)
+        current.end_ns = time.time_ns()
+
+
+def record_span(name: str, start_ns: int, end_ns: int, error: Optional[str] = None,
+                kind: int = SPAN_KIND_INTERNAL, **attributes) -> Optional[Span]:
+    """Add an operation that already finished (e.g. one timed in a worker process) under the current span."""
+    tracer = _tracer.get()
+    if tracer is None:
+        return None
+    recorded = tracer.start(name, _span.get(), kind=kind, **attributes)
+    recorded.start_ns, recorded.end_ns, recorded.error = start_ns, end_ns, error
+    return recorded
+
+
+def export(tracer: Tracer, path: Optional[str] = None) -> Optional[str]:
+    """Append the trace as one OTLP/JSON line to ``ML_AGENT_TRACE_FILE`` (empty disables export)."""
+    path = os.getenv("ML_AGENT_TRACE_FILE", TRACE_FILE) if path is None else path
+    if not path:
+        return None
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    line = json.dumps(tracer.to_otlp(), default=str) + "\n"
+    with _export_lock, open(path, "a") as f:
+        f.write(line)
+    return path
+
+
+_export_lock = threading.Lock()
+
+
+@contextmanager
+def trace_run(name: str, **attributes) -> Iterator[Tracer]:
+    """Trace everything run in this block (and in contexts copied from it) as one trace.
+
+    The trace is exported when the block exits, whether or not it raised.
+    """
+    tracer = Tracer()
+    token = _tracer.set(tracer)
+    try:
+        with span(name, **attributes):
+            yield tracer
+    finally:
+        _tracer.reset(token)
+        try:
+            export(tracer)
+        except OSError as e:
+            logger.warning(f"Could not export trace {tracer.trace_id}: {str(e)}")
+
+
+class _TracedExecutor:
+    """Proxy timing each code snippet an agent executes."""
+
+    def __init__(self, executor):
+        self._executor = executor
+
+    def __call__(self, code_action: str, *args, **kwargs):
+        with span("code.execute", **{"code.lines": code_action.count("\n") + 1}):
+            return self._executor(code_action, *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._executor, name)
+
+
+_tool_lock = threading.Lock()
+
+
+def _trace_tool(tool) -> None:
+    with _tool_lock:
+        if getattr(tool, "_traced", False):
+            return
+        tool._traced = True
+    forward = tool.forward
+
+    @functools.wraps(forward)
+    def traced_forward(*args, **kwargs):
+        with span("tool.call", tool=tool.name):
+            return forward(*args, **kwargs)
+
+    # Tools are module-level singletons shared by every agent, so they are wrapped once
+    # and only record spans when called inside a traced run.
+    tool.forward = traced_forward
+
+
+def instrument_agent(agent, kind: str):
+    """Trace the steps, tool calls and code execution of ``agent``."""
+    from smolagents import ActionStep
+
+    for tool in agent.tools.values():
+        _trace_tool(tool)
+    if not isinstance(agent.python_executor, _TracedExecutor):
+        agent.python_executor = _TracedExecutor(agent.python_executor)
+
+    def on_step(step, agent=None) -> None:
+        tracer = _tracer.get()
+        if tracer is not None:
+            tracer.add_step(step, kind, _span.get())
+
+    agent.step_callbacks.register(ActionStep, on_step)
+    return agent
@@ -0,0 +1,557 @@
+import ctypes
+import ctypes.util
+import json
+import math
+import os
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+COMPILED_ARTIFACT = "compiled.npz"
+VERIFY_ROWS = 2000
+# Batch sizes timed against predict_proba to find where the kernel stops winning.
+CROSSOVER_ROWS = (1, 4, 16, 64, 256, 1024)
+# Batches with at most this many (row, node) cells decide every node at once.
+ALL_NODES_CELLS = 1 << 18
+
+# Per-node handling of missing values (LightGBM's MissingType; everything else uses NAN).
+MISSING_NAN = 0     # NaN goes the default direction
+MISSING_AS_ZERO = 1  # NaN is compared as 0.0
+MISSING_ZERO = 2    # NaN and (near-)zero go the default direction
+LIGHTGBM_ZERO = 1e-35
+
+
+class UnsupportedModel(ValueError):
+    pass
+
+
+# The libraries call the C library's exp/expf; NumPy's vectorised versions can
+# differ in the last bit, so the link functions go through libm per element.
+_math_exp = np.frompyfunc(math.exp, 1, 1)
+
+
+def _exp(x: np.ndarray) -> np.ndarray:
+    return _math_exp(np.asarray(x, dtype=np.float64)).astype(np.float64)
+
+
+def _load_libm_float(name: str):
+    path = ctypes.util.find_library("m")
+    if path is None:
+        return None
+    function = getattr(ctypes.CDLL(path), name)
+    function.restype, function.argtypes = ctypes.c_float, [ctypes.c_float]
+    return np.frompyfunc(function, 1, 1)
+
+
+_libm_expf = _load_libm_float("expf")
+_libm_logf = _load_libm_float("logf")
+
+
+def _expf(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    if _libm_expf is None:
+        return np.exp(x)  # verification decides whether this is close enough to use
+    return _libm_expf(x).astype(np.float32)
+
+
+@dataclass
+class CompiledEnsemble:
+    """A tree ensemble flattened into node arrays, evaluated with vectorised NumPy.
+
+    All trees share one node table. Internal nodes send a row left when its
+    feature value is below the threshold (``<`` or ``<=``, as the library
+    does), when a categorical value is in the node's category set, or when
+    the value is missing and ``default_left`` is set; leaves (``feature ==
+    -1``) hold one value per output. Per-tree leaf values are added up in
+    tree order (or averaged, for forests) on top of ``base``, and the
+    library's link function turns the result into probabilities.
+    """
+
+    feature: np.ndarray        # int32 (nodes,), -1 for leaves
+    threshold: np.ndarray      # float64 (nodes,)
+    left: np.ndarray           # int32 (nodes,)
+    right: np.ndarray          # int32 (nodes,)
+    default_left: np.ndarray   # bool (nodes,)
+    missing: np.ndarray        # int8 (nodes,), MISSING_*
+    category_set: np.ndarray   # int32 (nodes,), row of `categories`, -1 for numeric splits
+    categories: np.ndarray     # bool (sets, max category + 1)
+    value: np.ndarray          # (nodes, outputs), float32 or float64 as the library accumulates
+    roots: np.ndarray          # int32 (trees,)
+    tree_output: np.ndarray    # int32 (trees,), output column each tree adds to
+    base: np.ndarray           # (outputs,) initial score
+    scale: float               # raw score = scale * sum + base (CatBoost)
+    depth: int
+    strict: bool               # `x < t` (XGBoost) instead of `x <= t`
+    float32_inputs: bool       # features are rounded to float32 before comparing
+    average: bool              # forests: mean of per-tree probabilities
+    base_first: bool           # start the sum from `base` (XGBoost) rather than adding it last
+    link: str                  # "sigmoid" | "softmax" | "identity"; "*32" variants work in float32
+    n_features: int
+    n_classes: int
+    source: str
+
+    def __post_init__(self):
+        # Where NaN goes at each node: the default direction, or (MISSING_AS_ZERO)
+        # wherever 0.0 would go.
+        zero_left = 0.0 < self.threshold if self.strict else 0.0 <= self.threshold
+        categorical = self.category_set >= 0
+        if categorical.any():
+            zero_left = np.where(categorical, self.categories[np.maximum(self.category_set, 0), 0], zero_left)
+        self._nan_left = np.where(self.missing == MISSING_AS_ZERO, zero_left, self.default_left)
+        self._categorical = bool(categorical.any())
+        self._zero_missing = bool((self.missing == MISSING_ZERO).any())
+
+    def _go_left(self, x: np.ndarray, node: np.ndarray) -> np.ndarray:
+        """Direction taken at ``node`` by feature values ``x`` (same shapes)."""
+        threshold = self.threshold[node]
+        go_left = x < threshold if self.strict else x <= threshold
+        if self._categorical:
+            at = np.nonzero(self.category_set[node] >= 0)
+            if at[0].size:
+                codes = np.nan_to_num(x[at], nan=-1.0).astype(np.int64)
+                known = (codes >= 0) & (codes < self.categories.shape[1])
+                go_left[at] = self.categories[self.category_set[node[at]], np.where(known, codes, 0)] & known
+        if self._zero_missing:
+            at = np.nonzero((np.abs(x) <= LIGHTGBM_ZERO) & (self.missing[node] == MISSING_ZERO))
+            go_left[at] = self.default_left[node[at]]
+        nan = np.isnan(x)
+        if nan.any():
+            go_left[nan] = self._nan_left[node[nan]]
+        return go_left
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node of every (row, tree), as an int32 array of shape (rows, trees).
+
+        Small batches decide every node for every row up front and then only
+        follow pointers, which keeps the per-level NumPy calls to a minimum;
+        larger ones decide just the node each (row, tree) is at, level by level.
+        """
+        X = np.asarray(X, dtype=np.float32 if self.float32_inputs else np.float64)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        if X.shape[0] * len(self.feature) <= ALL_NODES_CELLS:
+            all_nodes = np.arange(len(self.feature))
+            go_left = self._go_left(X[:, np.maximum(self.feature, 0)], np.broadcast_to(all_nodes, (X.shape[0], len(all_nodes))))
+            for _ in range(self.depth):
+                node = np.where(go_left[rows, node], self.left[node], self.right[node])
+            return node
+        # Flat (row, tree) pairs still on an internal node; paths that reach a
+        # leaf drop out, so deep but unbalanced trees cost their average depth.
+        flat = node.reshape(-1)
+        offset = np.repeat(np.arange(X.shape[0]) * X.shape[1], len(self.roots))
+        values = X.reshape(-1)
+        active = np.arange(flat.size)
+        while active.size:
+            at = flat[active]
+            feature = self.feature[at]
+            internal = feature >= 0
+            active, at = active[internal], at[internal]
+            go_left = self._go_left(values[offset[active] + feature[internal]], at)
+            flat[active] = np.where(go_left, self.left[at], self.right[at])
+        return node
+
+    def predict_raw(self, X: np.ndarray) -> np.ndarray:
+        leaves = self.leaves(X)
+        if (self.tree_output < 0).all():
+            # Every leaf holds a value per output (forests).
+            per_tree = [np.ascontiguousarray(self.value[leaves].transpose(1, 0, 2))]
+            outputs = [slice(None)]
+        else:
+            outputs = range(self.value.shape[1])
+            per_tree = [np.ascontiguousarray(self.value[leaves[:, self.tree_output == k], k].T) for k in outputs]
+        raw = np.empty((leaves.shape[0], self.value.shape[1]), dtype=self.value.dtype)
+        for k, values in zip(outputs, per_tree):
+            if self.base_first:
+                # Boosting starts from the base score and adds each tree to it.
+                start = np.broadcast_to(np.asarray(self.base[k], dtype=values.dtype), values.shape[1:])
+                values = np.concatenate([start[None], values])
+            # Reducing (trees, rows) over axis 0 adds the trees one by one, in
+            # order, as the libraries do; pairwise summation would round differently.
+            total = np.add.reduce(values, axis=0, dtype=self.value.dtype)
+            if self.average:
+                total = total / len(self.roots)
+            raw[:, k] = total if self.base_first else self.scale * total + self.base[k]
+        return raw
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        raw = self.predict_raw(X)
+        if self.link == "identity":
+            return raw
+        if self.link in ("sigmoid", "sigmoid32"):
+            exp = _expf if self.link == "sigmoid32" else _exp
+            one = raw.dtype.type(1)
+            p = one / (one + exp(-raw[:, 0]))
+            return np.column_stack([one - p, p])
+        exp = _expf if self.link == "softmax32" else _exp
+        e = exp(raw - raw.max(axis=1, keepdims=True))
+        # XGBoost accumulates the normaliser in double and divides in float.
+        total = np.add.reduce(e.astype(np.float64), axis=1, keepdims=True)
+        return e / total.astype(e.dtype)
+
+    def save(self, path: str) -> None:
+        arrays = {f.name: getattr(self, f.name) for f in fields(self) if isinstance(getattr(self, f.name), np.ndarray)}
+        meta = {f.name: getattr(self, f.name) for f in fields(self) if f.name not in arrays}
+        np.savez(path, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledEnsemble":
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode())
+            return cls(**meta, **{name: data[name] for name in data.files if name != "meta"})
+
+
+class _NodeTable:
+    """Accumulates nodes while walking each library's tree format."""
+
+    def __init__(self, n_outputs: int, value_dtype):
+        self.n_outputs = n_outputs
+        self.value_dtype = value_dtype
+        self.columns: Dict[str, List[Any]] = {name: [] for name in
+                                              ("feature", "threshold", "left", "right", "default_left", "missing", "category_set", "value")}
+        self.category_sets: List[List[int]] = []
+        self.roots: List[int] = []
+        self.tree_output: List[int] = []
+        self.depth = 0
+
+    def add(self, feature=-1, threshold=0.0, default_left=False, missing=MISSING_NAN, categories=None, value=None) -> int:
+        index = len(self.columns["feature"])
+        category_set = -1
+        if categories is not None:
+            category_set = len(self.category_sets)
+            self.category_sets.append([int(c) for c in categories])
+        leaf = np.zeros(self.n_outputs) if value is None else np.asarray(value, dtype=np.float64).reshape(-1)
+        for name, item in (("feature", feature), ("threshold", threshold), ("left", index), ("right", index),
+                           ("default_left", default_left), ("missing", missing), ("category_set", category_set),
+                           ("value", leaf)):
+            self.columns[name].append(item)
+        return index
+
+    def link(self, parent: int, left: int, right: int) -> None:
+        self.columns["left"][parent] = left
+        self.columns["right"][parent] = right
+
+    def start_tree(self, root: int, output: int, depth: int) -> None:
+        self.roots.append(root)
+        self.tree_output.append(output)
+        self.depth = max(self.depth, depth)
+
+    def build(self, **meta) -> CompiledEnsemble:
+        width = max((max(s, default=-1) for s in self.category_sets), default=-1) + 1
+        categories = np.zeros((len(self.category_sets), max(width, 1)), dtype=bool)
+        for i, members in enumerate(self.category_sets):
+            categories[i, members] = True
+        c = self.columns
+        return CompiledEnsemble(
+            feature=np.asarray(c["feature"], dtype=np.int32),
+            threshold=np.asarray(c["threshold"], dtype=np.float64),
+            left=np.asarray(c["left"], dtype=np.int32),
+            right=np.asarray(c["right"], dtype=np.int32),
+            default_left=np.asarray(c["default_left"], dtype=bool),
+            missing=np.asarray(c["missing"], dtype=np.int8),
+            category_set=np.asarray(c["category_set"], dtype=np.int32),
+            categories=categories,
+            value=np.asarray(c["value"], dtype=np.float64).astype(self.value_dtype),
+            roots=np.asarray(self.roots, dtype=np.int32),
+            tree_output=np.asarray(self.tree_output, dtype=np.int32),
+            depth=self.depth,
+            **meta,
+        )
+
+
+def _sklearn_forest(model) -> CompiledEnsemble:
+    import sklearn
+
+    # Since scikit-learn 1.4 classifier trees store class fractions, not counts.
+    stores_fractions = tuple(int(part) for part in sklearn.__version__.split(".")[:2]) >= (1, 4)
+    estimators = getattr(model, "estimators_", None) or [model]
+    n_classes = len(model.classes_)
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise UnsupportedModel("Multi-output forests are not supported")
+    table = _NodeTable(n_classes, np.float64)
+    for estimator in estimators:
+        tree = estimator.tree_
+        offset = len(table.columns["feature"])
+        missing_left = getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=bool))
+        # What DecisionTreeClassifier.predict_proba returns for each leaf.
+        value = tree.value[:, 0, :n_classes].astype(np.float64)
+        if not stores_fractions:
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+        for i in range(tree.node_count):
+            if tree.children_left[i] == -1:
+                table.add(value=value[i])
+            else:
+                node = table.add(feature=int(tree.feature[i]), threshold=float(tree.threshold[i]),
+                                 default_left=bool(missing_left[i]))
+                table.link(node, offset + int(tree.children_left[i]), offset + int(tree.children_right[i]))
+        table.start_tree(offset, -1, int(tree.max_depth))
+    return table.build(base=np.zeros(n_classes), scale=1.0, strict=False, float32_inputs=True,
+                       average=hasattr(model, "estimators_"), base_first=False, link="identity",
+                       n_features=int(model.n_features_in_), n_classes=n_classes, source=type(model).__name__)
+
+
+def _xgboost(model) -> CompiledEnsemble:
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    objective = learner["objective"]["name"]
+    gbm = learner["gradient_booster"]
+    if gbm["name"] != "gbtree":
+        raise UnsupportedModel(f"XGBoost booster '{gbm['name']}' is not supported")
+    n_classes = len(model.classes_)
+    n_outputs = 1 if n_classes == 2 else n_classes
+    base_score = np.asarray(json.loads(learner["learner_model_param"]["base_score"]), dtype=np.float32).reshape(-1)
+    if objective == "binary:logistic":
+        link = "sigmoid32"
+        # base_score is kept in probability space; XGBoost boosts from -log(1/p - 1), taken in float.
+        ratio = np.float32(1) / base_score[:1] - np.float32(1)
+        log = np.log(ratio) if _libm_logf is None else _libm_logf(ratio).astype(np.float32)
+        base = (-log).astype(np.float32)
+    elif objective in ("multi:softprob", "multi:softmax"):
+        link = "softmax32"
+        base = np.broadcast_to(base_score, (n_outputs,)).astype(np.float32)
+    else:
+        raise UnsupportedModel(f"XGBoost objective '{objective}' is not supported")
+    model_json = gbm["model"]
+    tree_info = model_json["tree_info"]
+    best = getattr(model, "best_iteration", None)
+    table = _NodeTable(n_outputs, np.float32)
+    for tree_index, tree in enumerate(model_json["trees"]):
+        if best is not None and tree_index // max(n_outputs, 1) > best:
+            break
+        offset = len(table.columns["feature"])
+        categorical = {node: (tree["categories_segments"][k], tree["categories_sizes"][k])
+                       for k, node in enumerate(tree["categories_nodes"])}
+        depth = {0: 0}
+        for i, left in enumerate(tree["left_children"]):
+            if left == -1:
+                table.add(value=[tree["split_conditions"][i]] if n_outputs == 1 else
+                          [tree["split_conditions"][i] if k == tree_info[tree_index] else 0.0 for k in range(n_outputs)])
+                continue
+            right = tree["right_children"][i]
+            depth[left] = depth[right] = depth[i] + 1
+            if tree["split_type"][i] == 1:
+                start, size = categorical[i]
+                # Categories in the set go right; store the complement's meaning by swapping children.
+                node = table.add(feature=tree["split_indices"][i], default_left=not tree["default_left"][i],
+                                 categories=tree["categories"][start:start + size])
+                table.link(node, offset + right, offset + left)
+            else:
+                node = table.add(feature=tree["split_indices"][i], threshold=float(np.float32(tree["split_conditions"][i])),
+                                 default_left=bool(tree["default_left"][i]))
+                table.link(node, offset + left, offset + right)
+        table.start_tree(offset, tree_info[tree_index] if n_outputs > 1 else 0, max(depth.values()))
+    return table.build(base=base, scale=1.0, strict=True, float32_inputs=True, average=False, base_first=True, link=link,
+                       n_features=int(learner["learner_model_param"]["num_feature"]), n_classes=n_classes,
+                       source="XGBClassifier")
+
+
+def _lightgbm(model) -> CompiledEnsemble:
+    dump = model.booster_.dump_model()
+    objective = dump["objective"].split()[0]
+    if dump.get("average_output"):
+        raise UnsupportedModel("LightGBM random-forest mode is not supported")
+    n_classes = len(model.classes_)
+    n_outputs = dump["num_tree_per_iteration"]
+    if objective == "binary":
+        link = "sigmoid"
+        sigmoid = float(dump["objective"].split("sigmoid:")[1]) if "sigmoid:" in dump["objective"] else 1.0
+        if sigmoid != 1.0:
+            raise UnsupportedModel("LightGBM sigmoid scaling other than 1 is not supported")
+    elif objective in ("multiclass", "softmax"):
+        link = "softmax"
+    else:
+        raise UnsupportedModel(f"LightGBM objective '{objective}' is not supported")
+    missing_types = {"None": MISSING_AS_ZERO, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+    table = _NodeTable(n_outputs, np.float64)
+    best = model.booster_.best_iteration
+    for tree in dump["tree_info"]:
+        if best and tree["tree_index"] // n_outputs >= best:
+            break
+        output = tree["tree_index"] % n_outputs
+
+        def walk(node: Dict[str, Any], depth: int) -> Tuple[int, int]:
+            if "leaf_value" in node or "split_feature" not in node:
+                return table.add(value=[node.get("leaf_value", 0.0) if k == output else 0.0 for k in range(n_outputs)]), depth
+            if node["decision_type"] == "==":
+                index = table.add(feature=node["split_feature"], default_left=False, missing=MISSING_NAN,
+                                  categories=[int(c) for c in str(node["threshold"]).split("||")])
+            else:
+                index = table.add(feature=node["split_feature"], threshold=float(node["threshold"]),
+                                  default_left=bool(node["default_left"]), missing=missing_types[node["missing_type"]])
+            left, left_depth = walk(node["left_child"], depth + 1)
+            right, right_depth = walk(node["right_child"], depth + 1)
+            table.link(index, left, right)
+            return index, max(left_depth, right_depth)
+
+        root, depth = walk(tree["tree_structure"], 0)
+        table.start_tree(root, output, depth)
+    return table.build(base=np.zeros(n_outputs), scale=1.0, strict=False, float32_inputs=False, average=False,
+                       base_first=False, link=link, n_features=dump["max_feature_idx"] + 1, n_classes=n_classes, source="LGBMClassifier")
+
+
+def _catboost(model) -> CompiledEnsemble:
+    import tempfile
+
+    if model.get_cat_feature_indices():
+        raise UnsupportedModel("CatBoost models with categorical features are not supported")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.json")
+        model.save_model(path, format="json")
+        with open(path) as f:
+            dump = json.load(f)
+    loss = dump["model_info"].get("params", {}).get("loss_function", {}).get("type", "Logloss")
+    n_classes = len(model.classes_)
+    if loss in ("Logloss", "CrossEntropy"):
+        link, n_outputs = "sigmoid", 1
+    elif loss == "MultiClass":
+        # CatBoost's softmax uses its own fast exp, which NumPy cannot reproduce bit for bit.
+        raise UnsupportedModel("CatBoost multiclass models are not supported")
+    else:
+        raise UnsupportedModel(f"CatBoost loss '{loss}' is not supported")
+    float_features = dump["features_info"].get("float_features", [])
+    nan_left = {f["feature_index"]: f.get("nan_value_treatment", "AsIs") != "AsTrue" for f in float_features}
+    flat_index = {f["feature_index"]: f["flat_feature_index"] for f in float_features}
+    scale, bias = dump.get("scale_and_bias", [1.0, [0.0] * n_outputs])
+    bias = np.asarray(bias if isinstance(bias, list) else [bias], dtype=np.float64)
+    table = _NodeTable(n_outputs, np.float64)
+    for tree in dump["oblivious_trees"]:
+        splits = tree["splits"]
+        depth = len(splits)
+        values = np.asarray(tree["leaf_values"], dtype=np.float64).reshape(-1, n_outputs)
+        # Level k of an oblivious tree tests splits[k]; the leaf index has bit k set
+        # when that test is true (value > border), so the bottom split is the root.
+        offset = len(table.columns["feature"])
+
+        def build(level: int, prefix: int) -> int:
+            if level < 0:
+                return table.add(value=values[prefix])
+            split = splits[level]
+            index = table.add(feature=flat_index[split["float_feature_index"]], threshold=float(np.float32(split["border"])),
+                              default_left=nan_left[split["float_feature_index"]])
+            left = build(level - 1, prefix)
+            right = build(level - 1, prefix | (1 << level))
+            table.link(index, left, right)
+            return index
+
+        if depth == 0:
+            table.add(value=values[0])
+        else:
+            build(depth - 1, 0)
+        table.start_tree(offset, -1, depth)
+    return table.build(base=bias if len(bias) == n_outputs else np.zeros(n_outputs) + bias[0], scale=float(scale),
+                       strict=False, float32_inputs=True, average=False, base_first=False, link=link,
+                       n_features=len(model.feature_names_), n_classes=n_classes, source="CatBoostClassifier")
+
+
+COMPILERS = {
+    "RandomForestClassifier": _sklearn_forest,
+    "ExtraTreesClassifier": _sklearn_forest,
+    "DecisionTreeClassifier": _sklearn_forest,
+    "XGBClassifier": _xgboost,
+    "LGBMClassifier": _lightgbm,
+    "CatBoostClassifier": _catboost,
+}
+
+
+def compile_model(model) -> CompiledEnsemble:
+    """Flatten a fitted tree-ensemble classifier into a :class:`CompiledEnsemble`."""
+    compiler = COMPILERS.get(type(model).__name__)
+    if compiler is None:
+        raise UnsupportedModel(f"No compiled path for {type(model).__name__}")
+    return compiler(model)
+
+
+def to_matrix(frame: pd.DataFrame, features: List[Dict[str, Any]]) -> np.ndarray:
+    """The model's input as float64, in schema order; categoricals as codes (NaN if unknown/missing)."""
+    matrix = np.empty((len(frame), len(features)), dtype=np.float64)
+    for j, feature in enumerate(features):
+        column = frame[feature["name"]]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes = column.cat.codes.to_numpy()
+            matrix[:, j] = np.where(codes < 0, np.nan, codes)
+        else:
+            matrix[:, j] = column.to_numpy(dtype=np.float64, na_value=np.nan)
+    return matrix
+
+
+def verify(compiled: CompiledEnsemble, model, frame: pd.DataFrame, features: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compare the compiled path with ``model.predict_proba`` on ``frame``, bit for bit."""
+    expected = np.asarray(model.predict_proba(frame))
+    actual = compiled.predict_proba(to_matrix(frame, features)).astype(expected.dtype)
+    diff = float(np.max(np.abs(actual - expected))) if expected.size else 0.0
+    return {"rows": len(frame), "exact": bool(np.array_equal(actual, expected)), "max_abs_diff": diff}
+
+
+def verification_frame(X: pd.DataFrame, rows: int = VERIFY_ROWS, seed: int = 0) -> pd.DataFrame:
+    """Training rows to verify on, plus copies with missing values to exercise default directions."""
+    sample = X.sample(min(rows, len(X)), random_state=seed) if len(X) > rows else X
+    holes = sample.copy()
+    mask = np.random.default_rng(seed).random(holes.shape) < 0.1
+    for j, name in enumerate(holes.columns):
+        if pd.api.types.is_float_dtype(holes[name]) or isinstance(holes[name].dtype, pd.CategoricalDtype):
+            holes.loc[mask[:, j], name] = np.nan
+    return pd.concat([sample, holes], ignore_index=True)
+
+
+def _best_time(function, repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def crossover(compiled: CompiledEnsemble, model, X: pd.DataFrame, features: List[Dict[str, Any]]) -> int:
+    """Largest of ``CROSSOVER_ROWS`` at which the compiled kernel beats ``predict_proba``.
+
+    The kernel wins on latency, where the libraries' per-call overhead
+    dominates; for bulk scoring their native loops are faster, so serving
+    only routes batches up to this size through it.
+    """
+    best = 0
+    for size in CROSSOVER_ROWS:
+        batch = X.iloc[:size]
+        if len(batch) < size:
+            break
+        matrix = to_matrix(batch, features)
+        if _best_time(lambda: compiled.predict_proba(matrix)) >= _best_time(lambda: model.predict_proba(batch)):
+            break
+        best = size
+    return best
+
+
+def export_compiled(model, X_train: pd.DataFrame, features: List[Dict[str, Any]], directory: str) -> Dict[str, Any]:
+    """Compile ``model``, verify it and save it to ``directory`` if it matches exactly.
+
+    Returns a report for the registry manifest: the verification result, and
+    ``used`` telling whether serving will take the compiled path.
+    """
+    try:
+        compiled = compile_model(model)
+    except UnsupportedModel as e:
+        return {"used": False, "reason": str(e)}
+    try:
+        report = verify(compiled, model, verification_frame(X_train), features)
+    except (TypeError, ValueError):
+        # The original model rejects the missing values we injected; verify on real rows only.
+        report = verify(compiled, model, X_train.iloc[:VERIFY_ROWS], features)
+    if not report["exact"]:
+        return {**report, "used": False, "reason": "compiled predictions differ from predict_proba"}
+    report["max_rows"] = crossover(compiled, model, X_train, features)
+    report["used"] = report["max_rows"] > 0
+    if not report["used"]:
+        return {**report, "reason": "predict_proba is faster even for single rows"}
+    compiled.save(os.path.join(directory, COMPILED_ARTIFACT))
+    report["nodes"] = int(len(compiled.feature))
+    report["trees"] = int(len(compiled.roots))
+    return report
+
+
+def load_compiled(directory: str) -> Optional[CompiledEnsemble]:
+    path = os.path.join(directory, COMPILED_ARTIFACT)
+    return CompiledEnsemble.load(path) if os.path.exists(path) else None
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import uuid
+import weakref
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+DATASETS_ROOT = "datasets"
+BLOB_ROOT = os.path.join(DATASETS_ROOT, ".blobs")
+MANIFEST_ROOT = os.path.join(BLOB_ROOT, "manifests")
+SESSION_ROOT = os.path.join(DATASETS_ROOT, ".uploads")
+CHUNK_SIZE = 1 << 20
+
+# One lock per resumable upload, held across the offset check and the append.
+_append_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+class UploadError(ValueError):
+    """Raised for invalid upload requests (bad names, offsets or sizes)."""
+
+
+class UploadNotFound(UploadError):
+    """Raised when a resumable upload session does not exist."""
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    """Strip any directory components from a client-supplied file name."""
+    name = os.path.basename((filename or "").replace("\\", "/"))
+    if name in ("", ".", ".."):
+        raise UploadError(f"Invalid file name: {filename!r}")
+    return name
+
+
+def _tmp_path() -> str:
+    tmp_dir = os.path.join(BLOB_ROOT, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    return os.path.join(tmp_dir, f"{uuid.uuid4()}.part")
+
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(BLOB_ROOT, digest[:2], digest)
+
+
+def commit_blob(tmp_path: str, digest: str) -> str:
+    """Move a fully written temp file into the blob store, keyed by its hash.
+
+    If an identical blob already exists the temp file is simply discarded.
+    """
+    blob_path = _blob_path(digest)
+    if os.path.exists(blob_path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(tmp_path, blob_path)
+        # Blobs are shared by every upload that links them: keep them read-only.
+        os.chmod(blob_path, 0o444)
+    return blob_path
+
+
+def _link(src: str, dest: str) -> None:
+    """Hard-link ``src`` to ``dest``, copying when the filesystem can't link."""
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def _write_chunk(f, digest, chunk: bytes) -> None:
+    f.write(chunk)
+    digest.update(chunk)
+
+
+async def store_stream(chunks: AsyncIterator[bytes]) -> Tuple[str, int]:
+    """Write an async byte stream to the blob store, hashing it on the fly.
+
+    Only one chunk is held in memory at a time; disk writes and hashing run in
+    the thread pool so the event loop stays responsive.
+
+    Returns:
+        The SHA-256 hex digest and size in bytes of the stored blob.
+    """
+    tmp_path = _tmp_path()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            async for chunk in chunks:
+                await run_in_threadpool(_write_chunk, f, digest, chunk)
+                size += len(chunk)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    await run_in_threadpool(commit_blob, tmp_path, digest.hexdigest())
+    return digest.hexdigest(), size
+
+
+async def iter_upload_file(file, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield an ``UploadFile``'s content in ``chunk_size`` pieces."""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def link_upload(entries: List[Tuple[str, str]]) -> Tuple[str, bool]:
+    """Materialise a per-upload directory for ``(filename, digest)`` entries.
+
+    Uploading exactly the same set of files again returns the directory that
+    was created the first time instead of a new one.
+
+    Returns:
+        The upload directory name (relative to ``datasets/``) and whether an
+        existing directory was reused.
+    """
+    manifest = json.dumps(sorted(entries)).encode()
+    manifest_path = os.path.join(MANIFEST_ROOT, hashlib.sha256(manifest).hexdigest())
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            upload_dir = f.read().strip()
+        if os.path.isdir(os.path.join(DATASETS_ROOT, upload_dir)):
+            return upload_dir, True
+
+    upload_dir = str(uuid.uuid4())
+    full_path = os.path.join(DATASETS_ROOT, upload_dir)
+    os.makedirs(full_path, exist_ok=True)
+    for filename, digest in entries:
+        _link(_blob_path(digest), os.path.join(full_path, filename))
+
+    os.makedirs(MANIFEST_ROOT, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        f.write(upload_dir)
+    return upload_dir, False
+
+
+# ---------------------------------------------------------------------------
+# Resumable uploads: create a session, append chunks at an offset, complete.
+# ---------------------------------------------------------------------------
+
+def _session_paths(upload_id: str) -> Tuple[str, str]:
+    try:
+        uuid.UUID(upload_id)
+    except ValueError:
+        raise UploadNotFound(f"Unknown upload: {upload_id}")
+    return (
+        os.path.join(SESSION_ROOT, f"{upload_id}.json"),
+        os.path.join(SESSION_ROOT, f"{upload_id}.part"),
+    )
+
+
+def create_session(filename: str, size: Optional[int] = None) -> Dict[str, Any]:
+    """Start a resumable upload of ``filename`` (optionally of known ``size``)."""
+    if size is not None and size < 0:
+        raise UploadError(f"Invalid size: {size}")
+    upload_id = str(uuid.uuid4())
+    meta_path, data_path = _session_paths(upload_id)
+    os.makedirs(SESSION_ROOT, exist_ok=True)
+    meta = {"upload_id": upload_id, "filename": safe_filename(filename), "size": size}
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    open(data_path, "wb").close()
+    return {**meta, "offset": 0}
+
+
+def session_status(upload_id: str) -> Dict[str, Any]:
+    """Return the session metadata and the number of bytes received so far."""
+    meta_path, data_path = _session_paths(upload_id)
+    if not os.path.exists(meta_path):
+        raise UploadNotFound(f"Unknown upload: {upload_id}")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return {**meta, "offset": os.path.getsize(data_path)}
+
+
+async def append_chunk(upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """Append a streamed request body to an upload, starting at ``offset``.
+
+    ``offset`` must equal the bytes already received, which lets a client
+    that lost its connection ask :func:`session_status` where to resume.
+    Concurrent requests for one upload are applied one at a time, and a body
+    that would go past the declared ``size`` is rejected as a whole.
+    """
+    lock = _append_locks.setdefault(upload_id, asyncio.Lock())
+    async with lock:
+        status = session_status(upload_id)
+        if offset != status["offset"]:
+            raise UploadError(f"Offset mismatch: expected {status['offset']}, got {offset}")
+        _, data_path = _session_paths(upload_id)
+        received = offset
+        with open(data_path, "ab") as f:
+            async for chunk in chunks:
+                received += len(chunk)
+                if status["size"] is not None and received > status["size"]:
+                    await run_in_threadpool(f.truncate, offset)
+                    raise UploadError(f"Upload exceeds its declared size of {status['size']} bytes")
+                await run_in_threadpool(f.write, chunk)
+        return session_status(upload_id)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def complete_session(upload_id: str) -> Dict[str, Any]:
+    """Finish an upload: hash it, move it into the blob store and link it.
+
+    Returns:
+        The upload directory, whether it was deduplicated, and the file's
+        name, SHA-256 and size.
+    """
+    status = session_status(upload_id)
+    if status["size"] is not None and status["offset"] != status["size"]:
+        raise UploadError(f"Upload incomplete: {status['offset']} of {status['size']} bytes received")
+    meta_path, data_path = _session_paths(upload_id)
+    digest = _hash_file(data_path)
+    commit_blob(data_path, digest)
+    os.remove(meta_path)
+    upload_dir, reused = link_upload([(status["filename"], digest)])
+    return {
+        "directory": upload_dir,
+        "deduplicated": reused,
+        "files": [{"filename": status["filename"], "sha256": digest, "size": status["offset"]}],
+    }
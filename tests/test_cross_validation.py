@@ -0,0 +1,115 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.utils import cross_validation
+from src.utils.cross_validation import _write_shared, cross_validate, fit_tasks, plan_parallelism, run_cv, shared_data
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(600, 5)), columns=[f"f{i}" for i in range(5)])
+    y = (X["f0"] + X["f1"] + rng.normal(scale=0.5, size=len(X)) > 0).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize("thread_param, params, n_splits, cores, expected", [
+    ("n_jobs", {}, 5, 1, (1, 1)),
+    ("n_jobs", {}, 5, 8, (5, 1)),
+    ("n_jobs", {}, 2, 8, (2, 4)),
+    ("n_jobs", {"n_jobs": 4}, 5, 8, (2, 4)),
+    ("n_jobs", {"n_jobs": -1}, 5, 8, (1, 8)),
+    ("n_jobs", {"n_jobs": 16}, 5, 8, (1, 16)),
+    (None, {}, 5, 3, (3, 1)),
+])
+def test_plan_parallelism_splits_cores(thread_param, params, n_splits, cores, expected):
+    assert plan_parallelism(thread_param, params, n_splits, cores) == expected
+
+
+def test_thread_count_follows_the_plan(data, monkeypatch):
+    monkeypatch.setattr(cross_validation, "available_cores", lambda: 4)
+    X, y = data
+    result = cross_validate(X, y, "RandomForest", {"n_estimators": 10}, n_splits=2)
+    assert result["parallelism"] == {"concurrent_folds": 2, "threads_per_fold": 2}
+    assert result["params"]["n_jobs"] == 2
+
+
+@pytest.mark.parametrize("estimator", ["LogisticRegression", "RandomForest"])
+def test_worker_pool_matches_in_process_folds(data, monkeypatch, estimator):
+    X, y = data
+    monkeypatch.setattr(cross_validation, "available_cores", lambda: 1)
+    serial = cross_validate(X, y, estimator, {"n_jobs": 1} if estimator == "RandomForest" else None, n_splits=3)
+    monkeypatch.setattr(cross_validation, "available_cores", lambda: 3)
+    pooled = cross_validate(X, y, estimator, {"n_jobs": 1} if estimator == "RandomForest" else None, n_splits=3)
+
+    assert serial["parallelism"]["concurrent_folds"] == 1
+    assert pooled["parallelism"]["concurrent_folds"] == 3
+    np.testing.assert_array_equal(serial["oof_predictions"], pooled["oof_predictions"])
+    assert serial["cv_scores"] == pooled["cv_scores"]
+    assert [f["fold"] for f in pooled["folds"]] == [0, 1, 2]
+
+
+def test_shared_arrow_file_round_trips_the_data(data, tmp_path):
+    X, y = data
+    X = X.assign(group=np.where(X["f2"] > 0, "a", "b"))
+    table = pa.ipc.open_file(pa.memory_map(_write_shared(X, y, str(tmp_path)))).read_all()
+    frame = table.to_pandas()
+    target = frame.pop(cross_validation.TARGET_COLUMN)
+    pd.testing.assert_frame_equal(frame, X)
+    np.testing.assert_array_equal(target.to_numpy(), y.to_numpy())
+
+
+def test_run_cv_tool_returns_out_of_fold_predictions(data):
+    X, y = data
+    result = run_cv(X, y, "LogisticRegression", n_splits=4)
+    assert len(result["folds"]) == 4
+    assert result["oof_predictions"].shape == (len(X),)
+    assert 0.8 < result["cv_scores"]["auc"] <= 1.0
+
+
+def _tasks(y, n_tasks=3):
+    idx = np.arange(len(y))
+    return [
+        {"id": i, "estimator": "LogisticRegression", "params": {"max_iter": 1000}, "threads": 1,
+         "train_idx": idx[idx % n_tasks != i], "valid_idx": idx[idx % n_tasks == i]}
+        for i in range(n_tasks)
+    ]
+
+
+@pytest.mark.parametrize("concurrency", [1, 2])
+def test_no_task_starts_after_the_deadline(data, concurrency):
+    X, y = data
+    with shared_data(X, y, concurrency) as data_path:
+        results = fit_tasks(X, y, _tasks(y), concurrency, data_path, deadline=time.perf_counter())
+    assert sorted(r["id"] for r in results) == [0, 1, 2]
+    assert {r["error"] for r in results} == {"skipped: budget exhausted"}
+
+
+def test_running_task_finishes_when_the_deadline_passes(data, monkeypatch):
+    X, y = data
+    deadline = time.perf_counter() + 0.2
+    fit_fold = cross_validation._fit_fold
+
+    def slow_fit_fold(*args):
+        result = fit_fold(*args)
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+        return result
+
+    monkeypatch.setattr(cross_validation, "_fit_fold", slow_fit_fold)
+    results = fit_tasks(X, y, _tasks(y), 1, deadline=deadline)
+    assert "auc" in results[0]
+    assert [r.get("error") for r in results[1:]] == ["skipped: budget exhausted"] * 2
+
+
+def test_failed_task_is_reported_when_errors_are_not_raised(data):
+    X, y = data
+    tasks = _tasks(y, 2)
+    tasks[1]["params"] = {"penalty": "bogus"}
+    with pytest.raises(Exception):
+        fit_tasks(X, y, tasks, 1)
+    results = fit_tasks(X, y, tasks, 1, raise_errors=False)
+    assert "auc" in results[0] and results[1]["error"]
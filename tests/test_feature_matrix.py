@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils import feature_matrix
+from src.utils.cross_validation import cross_validate
+from src.utils.feature_matrix import (
+    compact_frame,
+    downcast,
+    expand_categoricals,
+    one_hot_groups,
+    pack_one_hot,
+)
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 1200
+    raw = pd.DataFrame({
+        "age": rng.normal(60, 12, size=n),
+        "num_visits": rng.integers(0, 20, size=n).astype(np.float64),
+        "admission_type_id": rng.choice(["1", "2", "3"], size=n),
+        "race": rng.choice(["Asian", "Caucasian", "Other"], size=n),
+        "insulin": rng.choice(["No", "Up", "Down"], size=n),
+    })
+    frame = pd.get_dummies(raw, columns=["admission_type_id", "race", "insulin"], dtype=np.int64)
+    # 0/1 flags that are not mutually exclusive must stay separate columns.
+    frame["flag_a"] = rng.integers(0, 2, size=n)
+    frame["flag_b"] = rng.integers(0, 2, size=n)
+    y = ((frame["race_Asian"] + frame["insulin_Up"] + frame["num_visits"] / 10
+          + rng.normal(scale=0.5, size=n)) > 1.2).astype(int)
+    return frame, y
+
+
+def test_one_hot_groups_take_the_longest_exclusive_prefix(frame):
+    X, _ = frame
+    groups = one_hot_groups(X)
+    assert set(groups) == {"admission_type_id", "race", "insulin"}
+    assert groups["race"] == ["race_Asian", "race_Caucasian", "race_Other"]
+
+
+def test_existing_column_names_are_not_reused_as_groups(frame):
+    X, _ = frame
+    assert "race" not in one_hot_groups(X.assign(race=1.5))
+
+
+def test_packing_round_trips_through_expansion(frame):
+    X, _ = frame
+    packed = pack_one_hot(X, one_hot_groups(X))
+    assert list(packed.columns) == ["age", "num_visits", "admission_type_id", "race", "insulin", "flag_a", "flag_b"]
+    assert isinstance(packed["race"].dtype, pd.CategoricalDtype)
+    expanded = expand_categoricals(packed)
+    pd.testing.assert_frame_equal(expanded[X.columns].astype(np.int64), X.astype(np.int64), check_dtype=False)
+
+
+def test_rows_with_no_hot_level_become_missing():
+    X = pd.DataFrame({"color_red": [1, 0, 0], "color_blue": [0, 1, 0]})
+    packed = pack_one_hot(X, one_hot_groups(X))
+    assert packed["color"].isna().tolist() == [False, False, True]
+
+
+def test_downcast_picks_the_narrowest_dtype():
+    X = pd.DataFrame({
+        "flag": [0, 1, 1],
+        "small": [1, 100, 3],
+        "whole": [1.0, -2.0, 300.0],
+        "real": [0.5, 1.25, np.nan],
+        "name": ["a", "b", "c"],
+    })
+    dtypes = downcast(X).dtypes
+    assert dtypes["flag"] == np.uint8
+    assert dtypes["small"] == np.int8
+    assert dtypes["whole"] == np.int16
+    assert dtypes["real"] == np.float32
+    assert dtypes["name"] == X.dtypes["name"]
+
+
+def test_compact_frame_reports_the_savings(frame):
+    X, _ = frame
+    compact, report = compact_frame(X)
+    assert report["packed_groups"] == {"admission_type_id": 3, "race": 3, "insulin": 3}
+    assert (report["columns_before"], report["columns_after"]) == (X.shape[1], compact.shape[1]) == (13, 7)
+    assert report["bytes_after"] < report["bytes_before"] / 4
+
+
+NATIVE = [
+    ("LightGBM", {"n_estimators": 50}),
+    ("XGBoost", {"n_estimators": 50, "max_depth": 3}),
+    ("CatBoost", {"iterations": 50, "allow_writing_files": False}),
+]
+
+
+@pytest.mark.parametrize("estimator, params", [("LogisticRegression", {})] + NATIVE)
+def test_compact_and_native_fits_score_like_the_raw_frame(frame, estimator, params):
+    X, y = frame
+    compact = cross_validate(X, y, estimator, params, n_splits=3)
+    raw = cross_validate(X, y, estimator, params, n_splits=3, compact=False)
+    assert compact["compaction"]["columns_after"] == 7
+    assert raw["compaction"] is None
+    assert compact["oof_predictions"].shape == raw["oof_predictions"].shape
+    assert compact["cv_scores"]["auc"] == pytest.approx(raw["cv_scores"]["auc"], abs=0.02)
+
+
+@pytest.mark.parametrize("estimator, params", NATIVE)
+def test_native_datasets_are_not_reused_for_other_labels(frame, estimator, params):
+    X, y = frame
+    other = (X["age"] > 60).astype(int)
+    cross_validate(X, y, estimator, params, n_splits=3)
+    reused = cross_validate(X, other, estimator, params, n_splits=3)
+    feature_matrix._native_datasets._entries.clear()
+    fresh = cross_validate(X, other, estimator, params, n_splits=3)
+    np.testing.assert_array_equal(reused["oof_predictions"], fresh["oof_predictions"])
+    assert reused["cv_scores"]["auc"] > 0.9
@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+from datasets import load_from_disk
+
+from src.utils.ingest import _split_name, ingest_upload
+
+
+@pytest.mark.parametrize("filename", [
+    "test.csv", "TEST.parquet", "train_test.csv", "heart-test.feather", "data.test.arrow",
+    "valid.csv", "validation.csv", "validation-2.csv", "my valid rows.csv",
+])
+def test_test_and_validation_files_go_to_test(filename):
+    assert _split_name(filename) == "test"
+
+
+@pytest.mark.parametrize("filename", [
+    "train.csv", "data.parquet", "latest.csv", "contest.csv", "invalid_rows.csv",
+    "attestation.csv", "testing.csv", "protest_votes.csv",
+])
+def test_other_files_go_to_train(filename):
+    assert _split_name(filename) == "train"
+
+
+def _write(directory, name, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({"x": rng.random(rows), "y": (rng.random(rows) < 0.1).astype(int)})
+    frame.to_csv(directory / name, index=False)
+    return frame
+
+
+def test_ingest_holds_out_a_stratified_split(tmp_path):
+    frame = _write(tmp_path, "latest.csv", 1000)
+    result = ingest_upload(str(tmp_path), target_column="y")
+    assert result["splits"] == {"train": 800, "test": 200}
+    dataset = load_from_disk(str(tmp_path))
+    positives = int(frame["y"].sum())
+    assert abs(int(dataset["test"].to_pandas()["y"].sum()) - 0.2 * positives) <= 1
+    assert int(dataset["train"].to_pandas()["y"].sum()) + int(dataset["test"].to_pandas()["y"].sum()) == positives
+
+
+def test_ingest_uses_uploaded_test_files(tmp_path):
+    _write(tmp_path, "train.csv", 300)
+    _write(tmp_path, "valid.csv", 100, seed=1)
+    assert ingest_upload(str(tmp_path))["splits"] == {"train": 300, "test": 100}
+
+
+def test_concurrent_ingests_of_one_directory(tmp_path):
+    _write(tmp_path, "data.csv", 500)
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(ingest_upload(str(tmp_path)))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert all(result == results[0] for result in results)
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".ingest")]
@@ -0,0 +1,27 @@
+import threading
+
+import pytest
+
+from src.utils.job_queue import JobQueue, QueueFullError
+
+
+def test_data_jobs_do_not_wait_behind_agent_runs():
+    jobs = JobQueue(max_workers=1, max_pending=1, data_workers=1)
+    release = threading.Event()
+    try:
+        blocked = jobs.submit("model", release.wait, 10)
+        jobs.submit("model", lambda: None)
+        with pytest.raises(QueueFullError):
+            jobs.submit("model", lambda: None)
+
+        done = threading.Event()
+        ingest = jobs.submit("ingest", done.set)
+        assert done.wait(5), "ingest job waited for the agent pool"
+        assert ingest.kind == "ingest"
+        assert blocked.status == "running"
+        stats = jobs.stats()
+        assert (stats["running"], stats["queued"]) == (1, 1)
+        assert stats["max_data_workers"] == 1
+    finally:
+        release.set()
+        jobs.shutdown()
@@ -0,0 +1,100 @@
+import json
+import os
+import time
+
+import pytest
+
+from src.utils.llm_cache import Cassette, LLMCache
+
+
+def test_put_then_get(tmp_path):
+    cache = LLMCache(root=str(tmp_path))
+    cache.put("ab" * 32, {"message": {"role": "assistant", "content": "hi"}})
+    entry = cache.get("ab" * 32)
+    assert entry["message"]["content"] == "hi"
+    assert cache.get("cd" * 32) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    cache = LLMCache(root=str(tmp_path), ttl=60)
+    key = "ab" * 32
+    cache.put(key, {"message": {}})
+    path = cache._path(key)
+    with open(path) as f:
+        entry = json.load(f)
+    entry["created_at"] -= 120
+    with open(path, "w") as f:
+        json.dump(entry, f)
+    assert cache.get(key) is None
+    assert not os.path.exists(path)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    payload = {"message": {"content": "x" * 1000}}
+    cache = LLMCache(root=str(tmp_path), max_bytes=3500)
+    keys = [f"{i:02d}" * 32 for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, payload)
+        os.utime(cache._path(key), (time.time() - 100 + i, time.time() - 100 + i))
+    assert cache.get(keys[0]) is not None  # now the most recently used
+    cache.put("99" * 32, payload)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get("99" * 32) is not None
+
+
+def _cassette(tmp_path, strict=False):
+    path = tmp_path / "run.jsonl"
+    with open(path, "w") as f:
+        for i in range(3):
+            f.write(json.dumps({"key": f"k{i}", "stream": "agent", "message": {"content": str(i)}}) + "\n")
+    return Cassette(str(path), strict=strict)
+
+
+def test_cassette_falls_back_to_the_next_response_and_counts_it(tmp_path, caplog):
+    cassette = _cassette(tmp_path)
+    assert cassette.replay("k0", "agent")["key"] == "k0"
+    assert cassette.replay("changed", "agent")["key"] == "k1"
+    assert cassette.fallbacks == 1
+    assert "replaying the next response" in caplog.text
+    assert cassette.replay("k2", "agent")["key"] == "k2"
+    assert cassette.replay("more", "agent") is None
+
+
+def test_strict_cassette_only_replays_exact_keys(tmp_path):
+    cassette = _cassette(tmp_path, strict=True)
+    assert cassette.replay("changed", "agent") is None
+    assert cassette.replay("k1", "agent")["key"] == "k1"
+    assert cassette.fallbacks == 0
+
+
+def test_requests_go_through_the_shared_http_handler(tmp_path, monkeypatch):
+    # Keep litellm from refreshing its cost map in a background thread, which
+    # races this test's imports and needs the network anyway.
+    monkeypatch.setenv("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+    import httpx
+    from litellm.llms.custom_httpx.http_handler import HTTPHandler
+    from smolagents.models import ChatMessage, MessageRole
+
+    from src.utils.llm_cache import CachedLiteLLMModel
+
+    requests = []
+
+    def respond(request):
+        requests.append(request.url.path)
+        return httpx.Response(200, json={
+            "id": "msg_1", "type": "message", "role": "assistant", "model": "claude-sonnet-4-20250514",
+            "content": [{"type": "text", "text": "hi"}], "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": 3, "output_tokens": 1},
+        })
+
+    handler = HTTPHandler(client=httpx.Client(transport=httpx.MockTransport(respond)))
+    model = CachedLiteLLMModel(
+        model_id="claude-sonnet-4-20250514", api_key="test", http_handler=handler, cache=LLMCache(root=str(tmp_path)),
+    )
+    messages = [ChatMessage(role=MessageRole.USER, content=[{"type": "text", "text": "hello"}])]
+    assert model.generate(messages).content == "hi"
+    # The handler is not part of the cache key, so the same call is answered from disk.
+    assert model.generate(messages).content == "hi"
+    assert requests == ["/v1/messages"]
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.model_selection import _rung_sizes, successive_halving
+
+CANDIDATES = [
+    {"estimator": "sklearn.dummy.DummyClassifier", "params": {"strategy": "prior"}},
+    {"estimator": "LogisticRegression", "params": {"C": 1.0}, "scale": True},
+    {"estimator": "LogisticRegression", "params": {"penalty": "bogus"}},
+]
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(1500, 4)), columns=["a", "b", "c", "d"])
+    y = (X["a"] - X["b"] + rng.normal(scale=0.5, size=len(X)) > 0).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize("n_rows, n_candidates, eta, min_rows, expected", [
+    (9000, 9, 3, 1000, [1000, 3000, 9000]),
+    (9000, 12, 3, 500, [500, 1000, 3000, 9000]),
+    (9000, 9, 3, 2000, [2000, 3000, 9000]),
+    (500, 12, 3, 1000, [500]),
+    (9000, 1, 3, 1000, [9000]),
+])
+def test_rung_sizes_grow_by_eta_to_all_rows(n_rows, n_candidates, eta, min_rows, expected):
+    assert _rung_sizes(n_rows, n_candidates, eta, min_rows) == expected
+
+
+def test_best_candidate_wins_and_failures_are_eliminated(data):
+    X, y = data
+    result = successive_halving(X, y, CANDIDATES, budget_seconds=None, min_rows=100)
+
+    assert result["winner"]["estimator"] == "LogisticRegression"
+    assert result["winner"]["rows"] == 1200
+    assert [r["rows"] for r in result["rungs"]] == [400, 1200]
+    by_params = {str(e["params"].get("strategy", e["params"].get("penalty"))): e for e in result["leaderboard"]}
+    assert by_params["prior"]["eliminated_at_rung"] == 0
+    assert by_params["prior"]["score"] == 0.5
+    assert by_params["bogus"]["eliminated_at_rung"] == 0
+    assert by_params["bogus"]["error"]
+    assert not result["budget"]["exhausted"]
+
+
+def test_no_rung_starts_after_the_wall_clock_budget(data):
+    X, y = data
+    result = successive_halving(X, y, CANDIDATES, budget_seconds=0, min_rows=100)
+    assert result["winner"] is None
+    assert {e["error"] for e in result["leaderboard"]} == {"skipped: budget exhausted"}
+
+
+def test_cpu_budget_stops_before_the_next_rung(data):
+    X, y = data
+    result = successive_halving(X, y, CANDIDATES[:2], budget_seconds=None, budget_cpu_seconds=1e-9, min_rows=100)
+    assert result["budget"]["exhausted"]
+    assert len(result["rungs"]) == 1
+    assert result["winner"]["rows"] == result["rungs"][0]["rows"]
+
+
+def test_unknown_metric_is_rejected(data):
+    X, y = data
+    with pytest.raises(ValueError):
+        successive_halving(X, y, CANDIDATES, metric="f1")
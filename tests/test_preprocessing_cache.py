@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils import preprocessing_cache
+from src.utils.cross_validation import cross_validate
+from src.utils.preprocessing_cache import (
+    PreprocessingCache,
+    encode_features,
+    frame_fingerprint,
+    load_entry,
+    load_transformer,
+)
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 400
+    age = rng.normal(50, 10, size=n)
+    age[::17] = np.nan
+    return pd.DataFrame({
+        "age": age,
+        "visits": rng.integers(0, 9, size=n),
+        "admission type": rng.choice(["emergency", "urgent", "elective", None], size=n),
+        "race": pd.Categorical(rng.choice(["a", "b", "c"], size=n)),
+    })
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("ML_AGENT_PREPROCESS_CACHE_DIR", str(tmp_path / "cache"))
+    preprocessing_cache.get_preprocessing_cache.cache_clear()
+    yield preprocessing_cache.get_preprocessing_cache()
+    preprocessing_cache.get_preprocessing_cache.cache_clear()
+
+
+def _entries(cache):
+    return sorted(name for name in os.listdir(cache.root) if not name.startswith("."))
+
+
+def test_fingerprint_tracks_values_and_dtypes(frame):
+    assert frame_fingerprint(frame) == frame_fingerprint(frame.copy())
+    changed = frame.copy()
+    changed.loc[3, "visits"] += 1
+    assert frame_fingerprint(changed) != frame_fingerprint(frame)
+    assert frame_fingerprint(frame.astype({"visits": "float64"})) != frame_fingerprint(frame)
+
+
+def test_encode_features_matches_a_fresh_fit_and_is_reused(frame, cache):
+    from sklearn.compose import ColumnTransformer
+
+    first = encode_features(frame, X_test=frame.iloc[:10])
+    second = encode_features(frame)
+    assert len(_entries(cache)) == 1
+
+    transformer = preprocessing_cache.build_transformer(frame, preprocessing_cache.DEFAULT_PREPROCESSING)
+    expected = transformer.fit_transform(frame)
+    np.testing.assert_allclose(np.asarray(first["X"]), expected)
+    np.testing.assert_allclose(np.asarray(second["X"]), expected)
+    np.testing.assert_allclose(first["X_test"], expected[:10])
+    assert isinstance(first["transformer"], ColumnTransformer)
+    assert not np.isnan(np.asarray(first["X"])).any()
+    assert "admission_type_urgent" in first["feature_names"]
+    assert all(" " not in name for name in first["feature_names"])
+
+
+def test_config_is_part_of_the_key(frame, cache):
+    onehot = encode_features(frame)
+    ordinal = encode_features(frame, config={"encode": "ordinal"})
+    assert len(_entries(cache)) == 2
+    assert ordinal["X"].shape[1] == frame.shape[1] < onehot["X"].shape[1]
+
+
+def test_transformers_are_fitted_on_the_fold_rows_only(frame, tmp_path):
+    cache = PreprocessingCache(root=str(tmp_path))
+    rows = np.arange(100)
+    path = cache.get_or_fit(frame, rows, "fold-0", {"scale": True})
+    matrix, names = load_entry(path)
+    assert matrix.shape[0] == len(frame)
+    scaler = load_transformer(path).named_transformers_["num"][-1]
+    np.testing.assert_allclose(scaler.mean_[1], frame["visits"].iloc[:100].mean())
+    assert cache.get_or_fit(frame, rows, "fold-0", {"scale": True}) == path
+    assert cache.get_or_fit(frame, np.arange(1, 101), "fold-0", {"scale": True}) != path
+
+
+def test_least_recently_used_entries_are_evicted(frame, tmp_path):
+    cache = PreprocessingCache(root=str(tmp_path), max_bytes=1)
+    first = cache.get_or_fit(frame, np.arange(100), "a")
+    second = cache.get_or_fit(frame, np.arange(200), "b")
+    assert not os.path.exists(first) and os.path.isdir(second)
+
+
+def test_cross_validation_reuses_the_encoded_folds(frame, cache):
+    y = (frame["visits"] > 4).astype(int)
+    first = cross_validate(frame, y, "LogisticRegression", n_splits=3, preprocess={})
+    entries = _entries(cache)
+    assert len(entries) == 3
+    second = cross_validate(frame, y, "RandomForest", {"n_estimators": 20}, n_splits=3, preprocess={})
+    assert _entries(cache) == entries
+    assert first["preprocessing"]["entries"] == second["preprocessing"]["entries"]
+    assert second["cv_scores"]["auc"] > 0.9
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.utils.profiling import profile_table
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 5_000
+    values = rng.normal(size=n)
+    values[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        "x": values,
+        "y": 2 * np.nan_to_num(values) + rng.normal(size=n),
+        "count": rng.integers(0, 50, size=n),
+        "color": rng.choice(["red", "green", "blue", None], size=n),
+        "label": rng.integers(0, 2, size=n),
+    })
+
+
+def test_profile_matches_pandas(frame):
+    profile = profile_table(pa.Table.from_pandas(frame, preserve_index=False), target_column="label")
+
+    assert profile["num_samples"] == len(frame)
+    assert profile["num_features"] == frame.shape[1] - 1
+    for column in ("x", "y", "count"):
+        stats = profile["numeric_stats"][column]
+        assert stats["mean"] == pytest.approx(frame[column].mean(), rel=1e-12)
+        assert stats["std"] == pytest.approx(frame[column].std(), rel=1e-12)
+        assert (stats["min"], stats["max"]) == (frame[column].min(), frame[column].max())
+    missing = {f["name"]: f["pct_missing"] for f in profile["features"]}
+    assert missing["x"] == round(100.0 * frame["x"].isna().mean(), 4)
+    assert missing["color"] == round(100.0 * frame["color"].isna().mean(), 4)
+    assert profile["value_counts"]["color"] == frame["color"].value_counts().to_dict()
+    assert profile["class_distribution"] == {str(k): v for k, v in frame["label"].value_counts().items()}
+
+
+def test_correlations_are_pairwise_complete_like_pandas(frame):
+    profile = profile_table(pa.Table.from_pandas(frame, preserve_index=False))
+    expected = frame[["x", "y", "count", "label"]].corr()
+    for a in expected.columns:
+        for b in expected.columns:
+            assert profile["correlations"][a][b] == pytest.approx(expected.loc[a, b], abs=1e-12)
+
+
+def test_unknown_target_column_is_rejected(frame):
+    with pytest.raises(KeyError):
+        profile_table(pa.Table.from_pandas(frame, preserve_index=False), target_column="missing")
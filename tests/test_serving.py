@@ -0,0 +1,105 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from src.utils.model_registry import ModelNotFound, ModelRegistry
+from src.utils.serving import ModelServer
+
+
+@pytest.fixture
+def registry(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({"a": rng.normal(size=200), "b": rng.normal(size=200)})
+    y = (X["a"] > 0).astype(int)
+    registry = ModelRegistry(root=str(tmp_path / "registry"))
+    for name in ("first", "second"):
+        registry.register(LogisticRegression().fit(X, y), name, X)
+    return registry
+
+
+class CountingRegistry:
+    """Counts how often each model is loaded from disk."""
+
+    def __init__(self, registry):
+        self._registry = registry
+        self.loads = []
+
+    def __getattr__(self, name):
+        return getattr(self._registry, name)
+
+    def load(self, name, version=None):
+        self.loads.append((name, version))
+        return self._registry.load(name, version)
+
+
+ROW = {"a": 1.0, "b": 0.0}
+
+
+def test_predict_matches_the_registered_model(registry):
+    async def run():
+        server = ModelServer(registry)
+        try:
+            return await server.predict("first", [ROW, {"a": -1.0, "b": 0.0}])
+        finally:
+            server.close()
+
+    result = asyncio.run(run())
+    model, _ = registry.load("first")
+    expected = model.predict_proba(pd.DataFrame([ROW, {"a": -1.0, "b": 0.0}]))
+    assert result["version"] == 1
+    assert np.allclose(result["probabilities"], expected)
+    assert result["predictions"] == [1, 0]
+
+
+def test_concurrent_requests_load_a_model_once(registry):
+    counting = CountingRegistry(registry)
+
+    async def run():
+        server = ModelServer(counting)
+        try:
+            return await asyncio.gather(*[server.predict("first", [ROW]) for _ in range(8)])
+        finally:
+            server.close()
+
+    results = asyncio.run(run())
+    assert len(results) == 8
+    assert counting.loads == [("first", 1)]
+
+
+def test_evicted_model_answers_its_queued_requests_and_reloads(registry):
+    counting = CountingRegistry(registry)
+
+    async def run():
+        server = ModelServer(counting, max_models=1)
+        try:
+            await server.predict("first", [ROW])
+            queued = [asyncio.create_task(server.predict("first", [ROW])) for _ in range(20)]
+            await asyncio.sleep(0)
+            # Loading another model from a worker thread evicts "first" while requests wait on it.
+            await asyncio.get_running_loop().run_in_executor(None, server.batcher, "second", None)
+            answered = await asyncio.wait_for(asyncio.gather(*queued), timeout=10)
+            assert [s["model"] for s in server.stats()] == ["second"]
+            again = await server.predict("first", [ROW])
+            return answered, again
+        finally:
+            server.close()
+
+    answered, again = asyncio.run(run())
+    assert all(result["model"] == "first" for result in answered)
+    assert again["model"] == "first"
+    assert counting.loads.count(("first", 1)) == 2
+
+
+def test_unknown_model(registry):
+    async def run():
+        server = ModelServer(registry)
+        try:
+            await server.predict("missing", [ROW])
+        finally:
+            server.close()
+
+    with pytest.raises(ModelNotFound):
+        asyncio.run(run())
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.utils.profiling import profile_table
+from src.utils.sketches import HyperLogLog, RunningMoments, TDigest
+from src.utils.streaming_profile import iter_table_batches, profile_stream
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    values = rng.lognormal(size=n)
+    values[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame({
+        "x": values,
+        "y": 3 * np.nan_to_num(values) + rng.normal(size=n),
+        "code": rng.integers(0, 7, size=n),
+        "color": rng.choice(["red", "green", "blue"], size=n),
+        "label": rng.integers(0, 2, size=n),
+    })
+
+
+@pytest.mark.parametrize("batch", [1, 7, 1000, 50_000])
+def test_running_moments_match_pandas_for_any_batching(frame, batch):
+    moments = RunningMoments()
+    values = frame["x"].to_numpy()
+    for start in range(0, len(values), batch):
+        moments.update(values[start:start + batch])
+    assert moments.count == frame["x"].count()
+    assert moments.mean == pytest.approx(frame["x"].mean(), rel=1e-9)
+    assert moments.std == pytest.approx(frame["x"].std(), rel=1e-9)
+    assert (moments.min, moments.max) == (frame["x"].min(), frame["x"].max())
+
+
+def test_running_moments_merge_equals_single_pass(frame):
+    values = frame["y"].to_numpy()
+    left, right, whole = RunningMoments(), RunningMoments(), RunningMoments()
+    left.update(values[:123])
+    right.update(values[123:])
+    left.merge(right)
+    whole.update(values)
+    assert left.count == whole.count
+    assert left.mean == pytest.approx(whole.mean, rel=1e-12)
+    assert left.std == pytest.approx(whole.std, rel=1e-9)
+
+
+@pytest.mark.parametrize("distinct", [10, 5_000, 200_000])
+def test_hyperloglog_estimate_within_error(distinct):
+    sketch = HyperLogLog()
+    sketch.update(np.arange(distinct, dtype=np.float64))
+    # ~0.8% standard error at precision 14; allow four sigma.
+    assert abs(sketch.estimate() - distinct) <= max(1, 0.035 * distinct)
+
+
+def test_hyperloglog_merge_counts_the_union():
+    left, right = HyperLogLog(), HyperLogLog()
+    left.update(np.arange(0, 30_000, dtype=np.float64))
+    right.update(np.arange(20_000, 50_000, dtype=np.float64))
+    left.merge(right)
+    assert abs(left.estimate() - 50_000) <= 0.035 * 50_000
+
+
+def test_tdigest_quantiles_within_rank_error(frame):
+    values = frame["x"].dropna().to_numpy()
+    digest = TDigest()
+    for chunk in np.array_split(values, 17):
+        digest.update(chunk)
+    ordered = np.sort(values)
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        rank = np.searchsorted(ordered, digest.quantile(q)) / len(ordered)
+        assert abs(rank - q) < 0.01
+
+
+def test_streaming_profile_agrees_with_in_memory_profile(frame):
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    exact = profile_table(table, target_column="label")
+    approx = profile_stream(iter_table_batches(table, rows=3000), table.schema, target_column="label")
+
+    assert approx["approximate"] and not exact["approximate"]
+    assert approx["num_samples"] == exact["num_samples"] == len(frame)
+    assert approx["class_distribution"] == exact["class_distribution"]
+    for column in ("x", "y", "code"):
+        ours, theirs = approx["numeric_stats"][column], exact["numeric_stats"][column]
+        assert ours["mean"] == pytest.approx(frame[column].mean(), rel=1e-9)
+        assert ours["std"] == pytest.approx(frame[column].std(), rel=1e-9)
+        assert (ours["min"], ours["max"]) == (theirs["min"], theirs["max"])
+    # Few distinct values: quartiles are exact.
+    assert approx["numeric_stats"]["code"]["median"] == frame["code"].median()
+    assert approx["numeric_stats"]["code"]["p25"] == frame["code"].quantile(0.25)
+    assert approx["value_counts"]["color"] == exact["value_counts"]["color"]
+    assert approx["value_count_errors"] == {"color": 0}
+    assert approx["class_distribution_error"] == 0
+    assert approx["correlations"]["x"]["y"] == pytest.approx(exact["correlations"]["x"]["y"], rel=1e-9)
+    for ours, theirs in zip(approx["features"], exact["features"]):
+        assert ours["pct_missing"] == theirs["pct_missing"]
+        assert abs(ours["n_unique"] - theirs["n_unique"]) <= 0.035 * theirs["n_unique"] + 1
+
+
+def test_reported_error_bounds_high_cardinality_counts():
+    rng = np.random.default_rng(1)
+    # A few heavy hitters over a long tail of 20k rare values.
+    codes = np.where(rng.random(200_000) < 0.3, rng.integers(0, 5, 200_000), rng.integers(5, 20_000, 200_000))
+    frame = pd.DataFrame({"code": [f"c{c}" for c in codes]})
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    approx = profile_stream(iter_table_batches(table, rows=10_000), table.schema)
+
+    error = approx["value_count_errors"]["code"]
+    assert error > 0
+    truth = frame["code"].value_counts()
+    for value, count in approx["value_counts"]["code"].items():
+        assert truth[value] - error <= count <= truth[value]
+    assert set(truth.index[:5]) <= set(approx["value_counts"]["code"])
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.model_registry import feature_schema
+from src.utils.tree_compiler import CompiledEnsemble, UnsupportedModel, compile_model, verification_frame, verify
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    n = 1500
+    X = pd.DataFrame({
+        "a": rng.normal(size=n),
+        "b": rng.normal(size=n),
+        "c": rng.integers(0, 5, size=n).astype(np.float64),
+        "d": rng.random(n),
+    })
+    X.loc[rng.random(n) < 0.05, "b"] = np.nan
+    y = ((X["a"] + np.nan_to_num(X["b"]) * X["d"] + rng.normal(scale=0.5, size=n)) > 0).astype(int)
+    y3 = pd.Series(np.digitize(X["a"] + rng.normal(scale=0.3, size=n), [-0.5, 0.5]))
+    return X, y, y3
+
+
+def _models():
+    from catboost import CatBoostClassifier
+    from lightgbm import LGBMClassifier
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+    from xgboost import XGBClassifier
+
+    return {
+        "DecisionTree": lambda: DecisionTreeClassifier(max_depth=6, random_state=0),
+        "RandomForest": lambda: RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0),
+        "ExtraTrees": lambda: ExtraTreesClassifier(n_estimators=20, max_depth=6, random_state=0),
+        "XGBoost": lambda: XGBClassifier(n_estimators=30, max_depth=4),
+        "LightGBM": lambda: LGBMClassifier(n_estimators=30, num_leaves=15, verbose=-1),
+        "CatBoost": lambda: CatBoostClassifier(iterations=30, depth=4, verbose=False, allow_writing_files=False),
+    }
+
+
+@pytest.mark.parametrize("family", list(_models()))
+@pytest.mark.parametrize("target", ["y", "y3"])
+def test_compiled_predictions_match_predict_proba_exactly(data, family, target):
+    X, y, y3 = data
+    labels = y if target == "y" else y3
+    train = X if family in ("XGBoost", "LightGBM", "CatBoost") else X.fillna(0.0)
+    model = _models()[family]().fit(train, labels)
+
+    if family == "CatBoost" and target == "y3":
+        with pytest.raises(UnsupportedModel):
+            compile_model(model)
+        return
+    compiled = compile_model(model)
+    try:
+        frame = verification_frame(train, rows=500)
+        report = verify(compiled, model, frame, feature_schema(train))
+    except ValueError:
+        # scikit-learn trees built without missing values reject NaN input.
+        report = verify(compiled, model, train.iloc[:500], feature_schema(train))
+    assert report["exact"], report
+    assert report["max_abs_diff"] == 0.0
+
+
+def test_compiled_ensemble_round_trips_through_disk(data, tmp_path):
+    from xgboost import XGBClassifier
+
+    X, y, _ = data
+    model = XGBClassifier(n_estimators=10, max_depth=3).fit(X, y)
+    compiled = compile_model(model)
+    compiled.save(str(tmp_path / "compiled.npz"))
+    loaded = CompiledEnsemble.load(str(tmp_path / "compiled.npz"))
+    assert verify(loaded, model, X.iloc[:200], feature_schema(X))["exact"]
+
+
+def test_unsupported_models_are_refused(data):
+    from sklearn.linear_model import LogisticRegression
+
+    X, y, _ = data
+    with pytest.raises(UnsupportedModel):
+        compile_model(LogisticRegression().fit(X.fillna(0.0), y))